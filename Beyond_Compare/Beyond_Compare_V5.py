@@ -1,8 +1,242 @@
 #!/usr/bin/env python3
+import re
 import sys
-import difflib
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog, scrolledtext, ttk
+import tkinter.font as tkfont
+from tkinter import filedialog, messagebox, ttk
+
+from diff_core import (DIFF_ENGINES, DEFAULT_ENGINE, WHITESPACE_MODES, CONFIG_NOISE_FILTERS, CONFIG_NOISE_MASKS,
+                       DiffCancelled, DiffModel, Merge3Model, conflict_hunks, iter_opcodes, line_key, merge3)
+from file_loader import LineFile
+
+# Index pairs per tag_add call when tagging in bulk
+TAG_BATCH = 2000
+# Rows kept in the Text widget above and below the visible part of a pane
+RENDER_MARGIN = 200
+# Rows of context shown above a hunk after "Next Diff"
+HUNK_CONTEXT = 3
+# Rows fetched per step while searching
+SEARCH_CHUNK = 2000
+# How often (ms) the UI picks up opcodes from the diff worker thread
+POLL_MS = 50
+
+
+class VirtualPane:
+    """
+    Text widget that only holds the visible window of rows plus a margin.
+
+    Rows come from fetch(start, stop, inline) -> [(text, ranges)] or
+    [(text, ranges, row_tag)], where ranges are (col_start, col_end) spans to
+    highlight with tag and row_tag (if not None) is applied to the whole row.
+    Without a fetch callable the pane is a plain editable Text (text typed or
+    pasted in by hand).
+
+    Lines are not wrapped; a horizontal scrollbar reaches long lines, and
+    on_xscroll(pane) is called when the pane scrolls sideways on its own.
+    """
+
+    def __init__(self, master, tag, on_scroll=None, on_xscroll=None):
+        self.frame = tk.Frame(master)
+        self.text = tk.Text(self.frame, wrap=tk.NONE, width=50, height=30)
+        self.vbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.hbar = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.config(yscrollcommand=self._on_text_scroll, xscrollcommand=self._on_text_xscroll)
+        self.text.grid(row=0, column=0, sticky="nsew")
+        self.vbar.grid(row=0, column=1, sticky="ns")
+        self.hbar.grid(row=1, column=0, sticky="ew")
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.text.bind(seq, self._on_wheel)
+        for seq in ("<Shift-MouseWheel>", "<Shift-Button-4>", "<Shift-Button-5>"):
+            self.text.bind(seq, self._on_shift_wheel)
+
+        self.tag = tag
+        self.on_scroll = on_scroll
+        self.on_xscroll = on_xscroll
+        self.x_target = None  # offset set by scroll_x_to(), not to be echoed back to on_xscroll
+        self.fetch = None
+        self.total = 0
+        self.top = 0
+        self.win_start = 0
+        self.win_stop = 0
+        self.search_hit = None  # (row, col_start, col_end)
+        self.line_height = max(1, tkfont.Font(font=self.text.cget("font")).metrics("linespace"))
+
+    # --------------- Data source ---------------
+
+    def set_source(self, total, fetch):
+        self.total = total
+        self.fetch = fetch
+        self.search_hit = None
+        self.win_start = self.win_stop = 0
+        self.scroll_to(0, notify=False, force=True)
+
+    def set_lines(self, lines):
+        self.set_source(len(lines), lambda start, stop, inline=True: [(line, ()) for line in lines[start:stop]])
+
+    def grow(self, total):
+        # Rows were appended to the source (incremental diff): extend without jumping
+        self.total = total
+        vis = self.visible_rows()
+        if self.win_stop < min(total, self.top + vis + RENDER_MARGIN):
+            self.scroll_to(self.top, notify=False, force=True)
+        else:
+            self._update_scrollbar(vis)
+
+    def get_lines(self, lines=None):
+        # Loaded lines win; otherwise use whatever was typed into the widget
+        if lines is not None:
+            return lines
+        return self.text.get('1.0', 'end-1c').splitlines()
+
+    # --------------- Scrolling ---------------
+
+    def visible_rows(self):
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def scroll_to(self, row, notify=True, force=False):
+        if self.fetch is None:
+            return
+        vis = self.visible_rows()
+        row = max(0, min(row, max(0, self.total - vis)))
+        self.top = row
+        if force or row < self.win_start or (row + vis > self.win_stop and self.win_stop < self.total):
+            self._render(row, vis)
+        self.text.yview(f"{row - self.win_start + 1}.0")
+        self._update_scrollbar(vis)
+        if notify and self.on_scroll:
+            self.on_scroll(self)
+
+    def _render(self, row, vis):
+        start = max(0, row - RENDER_MARGIN)
+        stop = min(self.total, row + vis + RENDER_MARGIN)
+        rows = self.fetch(start, stop)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', "".join(r[0] + "\n" for r in rows))
+        indices = []
+        row_tags = {}
+        for n, r in enumerate(rows, 1):
+            for c1, c2 in r[1]:
+                indices.append(f"{n}.{c1}")
+                indices.append(f"{n}.{c2}")
+            if len(r) > 2 and r[2]:
+                row_tags.setdefault(r[2], []).extend((f"{n}.0", f"{n + 1}.0"))
+        for k in range(0, len(indices), 2 * TAG_BATCH):
+            self.text.tag_add(self.tag, *indices[k:k + 2 * TAG_BATCH])
+        for tag, spans in row_tags.items():
+            for k in range(0, len(spans), 2 * TAG_BATCH):
+                self.text.tag_add(tag, *spans[k:k + 2 * TAG_BATCH])
+        self.win_start, self.win_stop = start, stop
+        self._apply_search_tag()
+
+    def _update_scrollbar(self, vis):
+        if self.total:
+            self.vbar.set(self.top / self.total, min(1.0, (self.top + vis) / self.total))
+        else:
+            self.vbar.set(0.0, 1.0)
+
+    def _on_scrollbar(self, *args):
+        if self.fetch is None:
+            self.text.yview(*args)
+            return
+        vis = self.visible_rows()
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (vis if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def _on_wheel(self, event):
+        if self.fetch is None:
+            return None
+        if getattr(event, "num", None) == 4:
+            units = -1
+        elif getattr(event, "num", None) == 5:
+            units = 1
+        else:
+            units = -1 if event.delta > 0 else 1
+        self.scroll_to(self.top + 3 * units)
+        return "break"
+
+    def _on_shift_wheel(self, event):
+        if getattr(event, "num", None) in (4, 5):
+            units = -1 if event.num == 4 else 1
+        else:
+            units = -1 if event.delta > 0 else 1
+        self.text.xview_scroll(3 * units, "units")
+        return "break"
+
+    def x_pixels(self):
+        """Horizontal scroll offset in pixels (the same column in panes with the same font)."""
+        first, last = self.text.xview()
+        return first * self.text.winfo_width() / (last - first) if last > first else 0.0
+
+    def scroll_x_to(self, pixels):
+        first, last = self.text.xview()
+        total = self.text.winfo_width() / (last - first) if last > first else 0.0
+        self.x_target = pixels
+        self.text.xview_moveto(pixels / total if total else 0.0)
+
+    def _on_text_xscroll(self, first, last):
+        self.hbar.set(first, last)
+        target, self.x_target = self.x_target, None
+        # Reached the synced offset, or as close as a narrower pane gets (scrolled to its end)
+        if target is not None and (abs(self.x_pixels() - target) < 1 or float(last) >= 1.0):
+            return
+        if self.on_xscroll:
+            self.on_xscroll(self)
+
+    def _on_text_scroll(self, first, last):
+        if self.fetch is None:
+            self.vbar.set(first, last)
+            if self.on_scroll:
+                self.on_scroll(self)
+            return
+        # The Text moved on its own (keys, selection drag): map it back to a row
+        lines_in_widget = (self.win_stop - self.win_start) + 1
+        row = self.win_start + int(float(first) * lines_in_widget + 0.5)
+        if row != self.top:
+            self.scroll_to(row)
+
+    # --------------- Search ---------------
+
+    def _apply_search_tag(self):
+        self.text.tag_remove('search', '1.0', tk.END)
+        if self.search_hit is None:
+            return
+        row, c1, c2 = self.search_hit
+        if self.win_start <= row < self.win_stop:
+            n = row - self.win_start + 1
+            self.text.tag_add('search', f"{n}.{c1}", f"{n}.{c2}")
+
+    def find_next(self, search_text):
+        if self.fetch is None or not search_text:
+            return
+        needle = search_text.lower()
+        if self.search_hit is not None:
+            row, col = self.search_hit[0], self.search_hit[2]
+        else:
+            row, col = self.top, 0
+        # Scan to the end, then wrap around once
+        for start, stop in ((row, self.total), (0, row + 1)):
+            pos = start
+            while pos < stop:
+                chunk = self.fetch(pos, min(stop, pos + SEARCH_CHUNK), False)
+                for n, r in enumerate(chunk):
+                    at = r[0].lower().find(needle, col if pos + n == row else 0)
+                    if at >= 0:
+                        self.search_hit = (pos + n, at, at + len(search_text))
+                        self.scroll_to(pos + n - HUNK_CONTEXT)
+                        self._apply_search_tag()
+                        return
+                pos += SEARCH_CHUNK
+            col = 0
+        self.search_hit = None
+        self._apply_search_tag()
+
 
 class FileComparisonTool:
     def __init__(self, master):
@@ -12,8 +246,14 @@ class FileComparisonTool:
 
         # Initialize sync scrolling variables and a flag to avoid recursion.
         self.sync_enabled = tk.BooleanVar(value=False)
-        self.current_widget = None
         self.sync_in_progress = False
+        self.diff_engine = tk.StringVar(value=DEFAULT_ENGINE)
+        self.three_way = tk.BooleanVar(value=False)
+        # Normalization rules: applied to the diff keys only, the panes show the original text
+        self.ignore_case = tk.BooleanVar(value=False)
+        self.ignore_whitespace = tk.StringVar(value="exact")
+        self.filter_patterns = []
+        self.mask_patterns = []
 
         # Create frames for search functionality
         self.search_frame1 = tk.Frame(master)
@@ -22,11 +262,11 @@ class FileComparisonTool:
         # Create search entries and buttons
         self.search_var1 = tk.StringVar()
         self.search_var2 = tk.StringVar()
-        
+
         self.search_entry1 = ttk.Entry(self.search_frame1, textvariable=self.search_var1)
         self.search_button1 = ttk.Button(self.search_frame1, text='Find', command=lambda: self.find_text(1))
         self.next_button1 = ttk.Button(self.search_frame1, text='Next Diff', command=lambda: self.jump_to_next_diff(1))
-        
+
         self.search_entry2 = ttk.Entry(self.search_frame2, textvariable=self.search_var2)
         self.search_button2 = ttk.Button(self.search_frame2, text='Find', command=lambda: self.find_text(2))
         self.next_button2 = ttk.Button(self.search_frame2, text='Next Diff', command=lambda: self.jump_to_next_diff(2))
@@ -35,29 +275,41 @@ class FileComparisonTool:
         self.search_entry1.pack(side=tk.LEFT, padx=5)
         self.search_button1.pack(side=tk.LEFT, padx=5)
         self.next_button1.pack(side=tk.LEFT, padx=5)
-        
+
         self.search_entry2.pack(side=tk.LEFT, padx=5)
         self.search_button2.pack(side=tk.LEFT, padx=5)
         self.next_button2.pack(side=tk.LEFT, padx=5)
 
-        # Create text areas using ScrolledText
-        self.text_area1 = scrolledtext.ScrolledText(master, wrap=tk.WORD, width=50, height=30)
-        self.text_area2 = scrolledtext.ScrolledText(master, wrap=tk.WORD, width=50, height=30)
+        # Create virtualized panes (only the visible rows live in the Text widgets)
+        self.pane1 = VirtualPane(master, "removed", on_scroll=self.on_pane_scroll,
+                                 on_xscroll=self.on_pane_xscroll)
+        self.pane2 = VirtualPane(master, "added", on_scroll=self.on_pane_scroll,
+                                 on_xscroll=self.on_pane_xscroll)
+        self.pane3 = VirtualPane(master, "changed", on_scroll=self.on_pane_scroll,
+                                 on_xscroll=self.on_pane_xscroll)  # base, three-way mode only
+        self.text_area1 = self.pane1.text
+        self.text_area2 = self.pane2.text
 
         # Set tag configurations once.
         self.text_area1.tag_configure("removed", background="#ffcccc")
         self.text_area2.tag_configure("added", background="#ccffcc")
+        self.pane3.text.tag_configure("changed", background="#cce0ff")  # base text changed on either side
         self.text_area1.tag_configure("search", background="yellow")
         self.text_area2.tag_configure("search", background="yellow")
-
-        # Add mouse enter bindings for scroll sync
-        self.text_area1.bind('<Enter>', lambda e: setattr(self, 'current_widget', self.text_area1))
-        self.text_area2.bind('<Enter>', lambda e: setattr(self, 'current_widget', self.text_area2))
+        self.pane3.text.tag_configure("search", background="yellow")
+        for pane in (self.pane1, self.pane2, self.pane3):
+            pane.text.tag_configure("conflict", background="#ffe0a0")
+            pane.text.tag_raise("search")
 
         # Create control buttons
-        load_button1 = tk.Button(master, text='Load File 1', command=lambda: self.load_file(1))
-        load_button2 = tk.Button(master, text='Load File 2', command=lambda: self.load_file(2))
-        compare_button = tk.Button(master, text='Compare Files', command=self.compare_files)
+        self.load_button1 = tk.Button(master, text='Load File 1', command=lambda: self.load_file(1))
+        self.load_button2 = tk.Button(master, text='Load File 2', command=lambda: self.load_file(2))
+        self.compare_button = tk.Button(master, text='Compare Files', command=self.compare_files)
+        # Base column header (three-way mode): File 1 = ours, File 2 = theirs
+        self.base_frame = tk.Frame(master)
+        ttk.Button(self.base_frame, text='Load Base', command=lambda: self.load_file(3)).pack(side=tk.LEFT, padx=5)
+        self.export_button = ttk.Button(self.base_frame, text='Export Conflicts...', command=self.export_conflicts, state=tk.DISABLED)
+        self.export_button.pack(side=tk.LEFT, padx=5)
 
         # Create control frame for the sync scrolling checkbutton
         self.control_frame = tk.Frame(master)
@@ -68,180 +320,416 @@ class FileComparisonTool:
             command=self.toggle_sync_scroll
         )
         self.sync_button.pack(side=tk.LEFT, padx=5)
+        ttk.Label(self.control_frame, text="Diff engine:").pack(side=tk.LEFT, padx=(15, 2))
+        self.engine_box = ttk.Combobox(
+            self.control_frame,
+            textvariable=self.diff_engine,
+            values=list(DIFF_ENGINES),
+            state="readonly",
+            width=10
+        )
+        self.engine_box.pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            self.control_frame,
+            text="Three-way (base)",
+            variable=self.three_way,
+            command=self.toggle_three_way
+        ).pack(side=tk.LEFT, padx=(15, 5))
 
-        # Layout with grid
-        self.search_frame1.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
-        self.search_frame2.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-        self.text_area1.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
-        self.text_area2.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
-        load_button1.grid(row=2, column=0, padx=5, pady=5)
-        load_button2.grid(row=2, column=1, padx=5, pady=5)
-        compare_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
-        self.control_frame.grid(row=3, column=0, columnspan=2, pady=5)
+        # Progress of the background diff
+        self.progress_var = tk.DoubleVar(value=0.0)
+        self.progress = ttk.Progressbar(self.control_frame, variable=self.progress_var, maximum=100, length=200)
+        self.progress.pack(side=tk.LEFT, padx=(15, 5))
+        self.cancel_button = ttk.Button(self.control_frame, text='Cancel', command=self.cancel_compare, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.status_label = ttk.Label(self.control_frame, text="")
+        self.status_label.pack(side=tk.LEFT, padx=5)
 
-        # Configure grid weights for proper resizing
-        master.grid_columnconfigure(0, weight=1)
-        master.grid_columnconfigure(1, weight=1)
+        # Ignore rules
+        self.rules_frame = tk.Frame(master)
+        ttk.Checkbutton(self.rules_frame, text="Ignore case", variable=self.ignore_case).pack(side=tk.LEFT, padx=5)
+        ttk.Label(self.rules_frame, text="Whitespace:").pack(side=tk.LEFT, padx=(15, 2))
+        ttk.Combobox(
+            self.rules_frame,
+            textvariable=self.ignore_whitespace,
+            values=list(WHITESPACE_MODES),
+            state="readonly",
+            width=10
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.rules_frame, text='Ignore Rules...', command=self.edit_rules).pack(side=tk.LEFT, padx=(15, 5))
+        self.rules_label = ttk.Label(self.rules_frame, text="")
+        self.rules_label.pack(side=tk.LEFT, padx=5)
+
+        # Layout with grid
+        self._layout()
         master.grid_rowconfigure(1, weight=1)
 
-        # Initialize search and diff variables
+        # Initialize search and diff variables (plain-text search is used until a file is loaded)
         self.last_search_index1 = '1.0'
         self.last_search_index2 = '1.0'
-        self.diff_positions1 = []
-        self.diff_positions2 = []
-        self.current_diff_index1 = 0
-        self.current_diff_index2 = 0
+        self.lines1 = None
+        self.lines2 = None
+        self.lines3 = None
+        self.model = None
+        self.diff_thread = None
+        self.cancel_event = None
+        self.pending_close = []  # replaced LineFiles, closed once the running diff has stopped
+        self.compare_queued = False  # Compare clicked while a cancelled diff was still running
+        self.last_hunk1 = (-1, -1)  # (hunk row, pane top) of the last "Next Diff" jump
+        self.last_hunk2 = (-1, -1)
+
+    def _layout(self):
+        # Two-way: File 1 | File 2. Three-way: File 1 (ours) | Base | File 2 (theirs)
+        three = self.three_way.get()
+        right = 2 if three else 1
+        span = right + 1
+        self.search_frame1.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.search_frame2.grid(row=0, column=right, padx=5, pady=5, sticky="ew")
+        self.pane1.frame.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
+        self.pane2.frame.grid(row=1, column=right, padx=5, pady=5, sticky="nsew")
+        self.load_button1.grid(row=2, column=0, padx=5, pady=5)
+        self.load_button2.grid(row=2, column=right, padx=5, pady=5)
+        self.compare_button.grid(row=2, column=0, columnspan=span, padx=5, pady=5)
+        self.control_frame.grid(row=3, column=0, columnspan=span, pady=5)
+        self.rules_frame.grid(row=4, column=0, columnspan=span, pady=(0, 5))
+        if three:
+            self.base_frame.grid(row=0, column=1, padx=5, pady=5)
+            self.pane3.frame.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
+        else:
+            self.base_frame.grid_remove()
+            self.pane3.frame.grid_remove()
+
+        # Configure grid weights for proper resizing
+        for col in range(3):
+            self.master.grid_columnconfigure(col, weight=1 if col < span else 0)
+
+    def toggle_three_way(self):
+        self.cancel_compare()
+        self.model = None
+        self.export_button.config(state=tk.DISABLED)
+        self._show_loaded()
+        self._layout()
+
+    def _show_loaded(self):
+        # Drop aligned rows from the previous compare, show the loaded files again
+        for pane, lines in ((self.pane1, self.lines1), (self.pane2, self.lines2), (self.pane3, self.lines3)):
+            if lines is not None:
+                pane.set_lines(lines)
 
-    def sync_scroll(self, *args):
+    def _visible_panes(self):
+        return [self.pane1, self.pane3, self.pane2] if self.three_way.get() else [self.pane1, self.pane2]
+
+    def on_pane_scroll(self, pane):
         # Use a guard flag to avoid recursive callbacks.
-        if self.sync_in_progress:
+        if self.sync_in_progress or not self.sync_enabled.get():
             return
-        if self.sync_enabled.get():
-            self.sync_in_progress = True
-            # args[0] is the first argument (the fraction) passed by the text widget.
-            if self.current_widget == self.text_area1:
-                self.text_area2.yview_moveto(args[0])
-            elif self.current_widget == self.text_area2:
-                self.text_area1.yview_moveto(args[0])
+        self.sync_in_progress = True
+        try:
+            for other in self._visible_panes():
+                if other is pane:
+                    continue
+                if pane.fetch is not None and other.fetch is not None:
+                    other.scroll_to(pane.top, notify=False)
+                else:
+                    other.text.yview_moveto(pane.text.yview()[0])
+        finally:
+            self.sync_in_progress = False
+
+    def on_pane_xscroll(self, pane):
+        # Same column in every pane (sideways scrolling of long lines)
+        if self.sync_in_progress or not self.sync_enabled.get():
+            return
+        self.sync_in_progress = True
+        try:
+            pixels = pane.x_pixels()
+            for other in self._visible_panes():
+                if other is not pane:
+                    other.scroll_x_to(pixels)
+        finally:
             self.sync_in_progress = False
 
     def toggle_sync_scroll(self):
         if self.sync_enabled.get():
-            # When enabling sync scrolling, assign our custom yscrollcommand function
-            self.text_area1.config(yscrollcommand=lambda *args: self.sync_scroll(*args))
-            self.text_area2.config(yscrollcommand=lambda *args: self.sync_scroll(*args))
-        else:
-            # Restore default yscrollcommand when sync scrolling is disabled.
-            self.text_area1.config(yscrollcommand=self.text_area1.yview)
-            self.text_area2.config(yscrollcommand=self.text_area2.yview)
+            # Line the right pane up with the left one when sync is switched on
+            self.on_pane_scroll(self.pane1)
 
     def find_text(self, text_area_num):
         if text_area_num == 1:
-            text_area = self.text_area1
-            search_text = self.search_var1.get()
-            self.last_search_index1 = self.find_next(text_area, search_text, self.last_search_index1)
+            pane, search_text = self.pane1, self.search_var1.get()
+            if pane.fetch is None:
+                self.last_search_index1 = self.find_next(pane.text, search_text, self.last_search_index1)
         else:
-            text_area = self.text_area2
-            search_text = self.search_var2.get()
-            self.last_search_index2 = self.find_next(text_area, search_text, self.last_search_index2)
+            pane, search_text = self.pane2, self.search_var2.get()
+            if pane.fetch is None:
+                self.last_search_index2 = self.find_next(pane.text, search_text, self.last_search_index2)
+        if pane.fetch is not None:
+            pane.find_next(search_text)
 
     def find_next(self, text_area, search_text, last_index):
         text_area.tag_remove('search', '1.0', tk.END)
-        
+
         if search_text:
             pos = text_area.search(search_text, last_index, nocase=1, stopindex=tk.END)
             if not pos:
                 pos = text_area.search(search_text, '1.0', nocase=1, stopindex=tk.END)
                 if not pos:
                     return '1.0'
-            
+
             end_pos = f"{pos}+{len(search_text)}c"
             text_area.tag_add('search', pos, end_pos)
             text_area.see(pos)
-            
+
             return end_pos
         return '1.0'
 
     def jump_to_next_diff(self, text_area_num):
+        if self.model is None:
+            return
+        pane = self.pane1 if text_area_num == 1 else self.pane2
+        last_row, last_top = self.last_hunk1 if text_area_num == 1 else self.last_hunk2
+        # Continue from the last jump unless the pane was scrolled since
+        ref = last_row if pane.top == last_top else pane.top + HUNK_CONTEXT - 1
+        row = self.model.next_hunk(ref)
+        if row is None:
+            return
+        pane.scroll_to(row - HUNK_CONTEXT)
         if text_area_num == 1:
-            positions = self.diff_positions1
-            text_area = self.text_area1
-            if positions:
-                self.current_diff_index1 = (self.current_diff_index1 + 1) % len(positions)
-                text_area.see(positions[self.current_diff_index1])
+            self.last_hunk1 = (row, pane.top)
         else:
-            positions = self.diff_positions2
-            text_area = self.text_area2
-            if positions:
-                self.current_diff_index2 = (self.current_diff_index2 + 1) % len(positions)
-                text_area.see(positions[self.current_diff_index2])
+            self.last_hunk2 = (row, pane.top)
 
     def load_file(self, text_area_num):
         file_path = filedialog.askopenfilename()
         if file_path:
-            # You could add an encoding parameter if needed (e.g. encoding="utf-8")
-            with open(file_path, 'r') as file:
-                content = file.read()
-                if text_area_num == 1:
-                    self.text_area1.delete('1.0', tk.END)
-                    self.text_area1.insert(tk.END, content)
+            # Encoding is detected per file; lines are decoded lazily from a memory map
+            try:
+                lines = LineFile(file_path)
+            except (OSError, ValueError, LookupError) as e:
+                messagebox.showerror("Error", f"Could not load {file_path}:\n{e}")
+                return
+            self.cancel_compare()
+            self.model = None
+            self.export_button.config(state=tk.DISABLED)
+            old = {1: self.lines1, 2: self.lines2, 3: self.lines3}[text_area_num]
+            if text_area_num == 1:
+                self.lines1 = lines
+            elif text_area_num == 2:
+                self.lines2 = lines
+            else:
+                self.lines3 = lines
+            # The other panes may still show rows of the old model, which reads the old file
+            self._show_loaded()
+            if isinstance(old, LineFile) and old not in (self.lines1, self.lines2, self.lines3):
+                # A cancelled diff may still be reading it
+                if self.diff_thread is not None:
+                    self.pending_close.append(old)
                 else:
-                    self.text_area2.delete('1.0', tk.END)
-                    self.text_area2.insert(tk.END, content)
+                    old.close()
+            self.status_label.config(text=f"Loaded {len(lines):,} line(s) ({lines.encoding})")
+
+    def edit_rules(self):
+        # One regex per line; line filters drop whole lines, masks blank out matching text
+        dialog = tk.Toplevel(self.master)
+        dialog.title('Ignore Rules')
+        dialog.transient(self.master)
+        ttk.Label(dialog, text="Line filters (regex, one per line) - matching lines are ignored:").pack(anchor="w", padx=5, pady=(5, 0))
+        filters_text = tk.Text(dialog, height=6, width=80)
+        filters_text.pack(fill=tk.BOTH, expand=True, padx=5)
+        ttk.Label(dialog, text="Masks (regex, one per line) - matching text is ignored:").pack(anchor="w", padx=5, pady=(5, 0))
+        masks_text = tk.Text(dialog, height=6, width=80)
+        masks_text.pack(fill=tk.BOTH, expand=True, padx=5)
+        filters_text.insert('1.0', "\n".join(self.filter_patterns))
+        masks_text.insert('1.0', "\n".join(self.mask_patterns))
+
+        def read(widget):
+            return [p for p in widget.get('1.0', tk.END).splitlines() if p.strip()]
+
+        def add_preset():
+            for widget, patterns in ((filters_text, CONFIG_NOISE_FILTERS), (masks_text, CONFIG_NOISE_MASKS)):
+                current = read(widget)
+                widget.delete('1.0', tk.END)
+                widget.insert('1.0', "\n".join(current + [p for p in patterns if p not in current]))
+
+        def apply():
+            filters, masks = read(filters_text), read(masks_text)
+            try:
+                line_key(filters, masks)
+            except re.error as e:
+                messagebox.showerror("Error", f"Invalid regular expression:\n{e}", parent=dialog)
+                return
+            self.filter_patterns, self.mask_patterns = filters, masks
+            self.rules_label.config(text=f"{len(filters)} filter(s), {len(masks)} mask(s)" if filters or masks else "")
+            dialog.destroy()
+
+        buttons = tk.Frame(dialog)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(buttons, text='Add Config Noise Preset', command=add_preset).pack(side=tk.LEFT)
+        ttk.Button(buttons, text='Cancel', command=dialog.destroy).pack(side=tk.RIGHT)
+        ttk.Button(buttons, text='OK', command=apply).pack(side=tk.RIGHT, padx=5)
 
     def compare_files(self):
-        # Use "end-1c" so that a stray final newline isn’t included.
-        lines1 = self.text_area1.get('1.0', 'end-1c').splitlines()
-        lines2 = self.text_area2.get('1.0', 'end-1c').splitlines()
-
-        # Clear both text areas and reset difference positions/indexes
-        self.text_area1.delete('1.0', tk.END)
-        self.text_area2.delete('1.0', tk.END)
-        self.diff_positions1 = []
-        self.diff_positions2 = []
-        self.current_diff_index1 = 0
-        self.current_diff_index2 = 0
-
-        # Compare the two files line‐by‐line using SequenceMatcher
-        sm = difflib.SequenceMatcher(None, lines1, lines2)
-        for tag, i1, i2, j1, j2 in sm.get_opcodes():
-            if tag == "equal":
-                for line in lines1[i1:i2]:
-                    self.text_area1.insert(tk.END, line + "\n")
-                    self.text_area2.insert(tk.END, line + "\n")
-            elif tag == "replace":
-                n = max(i2 - i1, j2 - j1)
-                for k in range(n):
-                    old_line = lines1[i1 + k] if i1 + k < i2 else ""
-                    new_line = lines2[j1 + k] if j1 + k < j2 else ""
-                    self.diff_line_pair(old_line, new_line)
-            elif tag == "delete":
-                for line in lines1[i1:i2]:
-                    pos = self.text_area1.index(tk.END)
-                    self.diff_positions1.append(pos)
-                    self.text_area1.insert(tk.END, line, "removed")
-                    self.text_area1.insert(tk.END, "\n")
-                    self.text_area2.insert(tk.END, "\n")
-            elif tag == "insert":
-                for line in lines2[j1:j2]:
-                    pos = self.text_area2.index(tk.END)
-                    self.diff_positions2.append(pos)
-                    self.text_area1.insert(tk.END, "\n")
-                    self.text_area2.insert(tk.END, line, "added")
-                    self.text_area2.insert(tk.END, "\n")
+        if self.diff_thread is not None:
+            # A cancelled diff is still winding down: start this one when it has stopped
+            self.cancel_compare()
+            self.compare_queued = True
+            self.status_label.config(text="Cancelling the previous comparison, please wait...")
+            return
+        try:
+            key = line_key(self.filter_patterns, self.mask_patterns, self.ignore_whitespace.get(), self.ignore_case.get())
+        except re.error as e:
+            messagebox.showerror("Error", f"Invalid ignore rule:\n{e}")
+            return
+        lines1 = self.pane1.get_lines(self.lines1)
+        lines2 = self.pane2.get_lines(self.lines2)
+        self.lines1, self.lines2 = lines1, lines2
+        self.last_hunk1 = self.last_hunk2 = (-1, -1)
+        self.export_button.config(state=tk.DISABLED)
+        self.cancel_event = threading.Event()
+        results = queue.Queue()
+
+        if self.three_way.get():
+            base = self.pane3.get_lines(self.lines3)
+            self.lines3 = base
+            # Same row-fetch scheme as two-way, one cell per pane
+            model = Merge3Model(base, lines1, lines2)
+            self.pane1.set_source(0, lambda start, stop, inline=True: [r[0] for r in model.rows(start, stop)])
+            self.pane3.set_source(0, lambda start, stop, inline=True: [r[1] for r in model.rows(start, stop)])
+            self.pane2.set_source(0, lambda start, stop, inline=True: [r[2] for r in model.rows(start, stop)])
+            worker, args = self._merge3_worker, (base, lines1, lines2)
+        else:
+            # Both panes read aligned rows from the model; only the visible window is rendered.
+            # The model starts empty and grows as the worker streams opcodes back.
+            model = DiffModel(lines1, lines2)
+            self.pane1.set_source(0, lambda start, stop, inline=True: [(r[0], r[2]) for r in model.rows(start, stop, inline)])
+            self.pane2.set_source(0, lambda start, stop, inline=True: [(r[1], r[3]) for r in model.rows(start, stop, inline)])
+            worker, args = self._diff_worker, (lines1, lines2)
+        self.model = model
         # (The tag styles are already configured in __init__)
 
-    def diff_line_pair(self, old_line, new_line):
-        ta1 = self.text_area1
-        ta2 = self.text_area2
+        # Diff on a worker thread so the Tk event loop keeps running
+        self.diff_thread = threading.Thread(
+            target=worker,
+            args=args + (self.diff_engine.get(), key, results, self.cancel_event),
+            daemon=True
+        )
+        self.progress_var.set(0.0)
+        self.status_label.config(text="Comparing...")
+        self.compare_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.diff_thread.start()
+        self.master.after(POLL_MS, self._poll_diff, model, results)
+
+    @staticmethod
+    def _diff_worker(lines1, lines2, engine, key, results, cancel_event):
+        # Runs off the Tk thread: only talks to the UI through the queue
+        try:
+            for opcodes, done in iter_opcodes(lines1, lines2, engine, key, cancel=cancel_event.is_set):
+                results.put(("chunk", opcodes, done))
+            results.put(("done", None, 1.0))
+        except DiffCancelled:
+            results.put(("cancelled", None, None))
+        except Exception as e:
+            results.put(("error", e, None))
 
-        # Record the first diff position encountered for this pair, if any.
-        diff_found = False
+    @staticmethod
+    def _merge3_worker(base, ours, theirs, engine, key, results, cancel_event):
+        # Both pairwise diffs are needed before any region is known, so there is one chunk
+        try:
+            results.put(("chunk", merge3(base, ours, theirs, engine, key, cancel=cancel_event.is_set), 1.0))
+            results.put(("done", None, 1.0))
+        except DiffCancelled:
+            results.put(("cancelled", None, None))
+        except Exception as e:
+            results.put(("error", e, None))
 
-        matcher = difflib.SequenceMatcher(None, old_line, new_line)
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-            if tag == "equal":
-                segment = old_line[i1:i2]
-                ta1.insert(tk.END, segment)
-                ta2.insert(tk.END, segment)
+    def _poll_diff(self, model, results):
+        finished = None
+        grown = False
+        try:
+            while finished is None:
+                kind, payload, done = results.get_nowait()
+                if kind == "chunk":
+                    model.extend(payload)
+                    self.progress_var.set(done * 100)
+                    grown = True
+                else:
+                    finished = (kind, payload)
+        except queue.Empty:
+            pass
+
+        current = model is self.model
+        if grown and current:
+            self.pane1.grow(model.row_count)
+            self.pane2.grow(model.row_count)
+            if isinstance(model, Merge3Model):
+                self.pane3.grow(model.row_count)
+            self.status_label.config(text=f"Comparing... {len(model.hunks)} difference(s) so far")
+        if finished is None:
+            self.master.after(POLL_MS, self._poll_diff, model, results)
+            return
+
+        self.diff_thread = None
+        for lines in self.pending_close:
+            lines.close()
+        self.pending_close = []
+        self.compare_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        kind, payload = finished
+        if kind == "done":
+            if isinstance(model, Merge3Model):
+                self.status_label.config(text=f"{len(model.hunks)} change(s), {len(model.conflicts)} conflict(s)")
+                if current:
+                    self.export_button.config(state=tk.NORMAL)
             else:
-                if not diff_found:
-                    pos1 = ta1.index(tk.END)
-                    pos2 = ta2.index(tk.END)
-                    self.diff_positions1.append(pos1)
-                    self.diff_positions2.append(pos2)
-                    diff_found = True
-                if tag in ("replace", "delete"):
-                    segment_old = old_line[i1:i2]
-                    ta1.insert(tk.END, segment_old, "removed")
-                if tag in ("replace", "insert"):
-                    segment_new = new_line[j1:j2]
-                    ta2.insert(tk.END, segment_new, "added")
-        ta1.insert(tk.END, "\n")
-        ta2.insert(tk.END, "\n")
-        # (No need to re-configure the tags here since they were set earlier.)
+                self.status_label.config(text=f"{len(model.hunks)} difference(s)")
+        elif kind == "cancelled":
+            self.progress_var.set(0.0)
+            self.status_label.config(text="Comparison cancelled" + (" (partial result shown)" if current else ""))
+        elif current:
+            self.status_label.config(text="Comparison failed")
+            messagebox.showerror("Error", f"Comparison failed:\n{payload}")
+        else:
+            # A diff cancelled by loading another file; its error is of no interest
+            self.status_label.config(text="Comparison cancelled")
+        if self.compare_queued:
+            self.compare_queued = False
+            self.compare_files()
+
+    def export_conflicts(self):
+        model = self.model
+        if not isinstance(model, Merge3Model):
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            with open(file_path, "w", encoding="utf-8", newline="\n") as fh:
+                for line in conflict_hunks(model.base, model.ours, model.theirs, model.regions,
+                                           ("file 1", "base", "file 2")):
+                    fh.write(line + "\n")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write {file_path}:\n{e}")
+            return
+        self.status_label.config(text=f"Exported {len(model.conflicts)} conflict(s)")
+
+    def cancel_compare(self):
+        if self.diff_thread is not None and self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_label.config(text="Cancelling...")
+            # Compare can be clicked again; it starts once the worker has stopped
+            self.compare_button.config(state=tk.NORMAL)
 
 if __name__ == '__main__':
+    # With arguments, run the headless directory compare instead of the GUI
+    if len(sys.argv) > 1 and sys.argv[1] == "merge3":
+        from three_way import run_cli
+        sys.exit(run_cli(sys.argv[2:]))
+    if len(sys.argv) > 1:
+        from batch_compare import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
     root = tk.Tk()
     app = FileComparisonTool(root)
     root.mainloop()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Headless directory-vs-directory compare (e.g. yesterday's config backups vs today's).
+
+Files are paired by relative path. Pairs with the same size and the same streaming
+hash are skipped as identical; changed pairs are diffed in a process pool and get a
+unified and/or HTML diff. A summary.csv (plus index.html for HTML output) lists
+every pair.
+
+--ignore-* / --filter / --mask normalise the compared lines (timestamps, banners,
+whitespace) so pairs that differ only in noise count as identical.
+
+Usage:
+    python batch_compare.py LEFT_DIR RIGHT_DIR --out OUT_DIR [--format unified|html|both]
+    python Beyond_Compare_V5.py LEFT_DIR RIGHT_DIR --out OUT_DIR   (same CLI)
+"""
+import os
+import re
+import sys
+import csv
+import html
+import time
+import fnmatch
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from file_loader import LineFile
+from diff_core import (DIFF_ENGINES, DEFAULT_ENGINE, WHITESPACE_MODES, CONFIG_NOISE_FILTERS, CONFIG_NOISE_MASKS,
+                       DiffModel, diff_opcodes, grouped_opcodes, line_key, unified_diff)
+
+HASH_BLOCK = 1024 * 1024
+SUMMARY_FIELDS = ["path", "status", "size_left", "size_right", "hunks", "removed", "added", "seconds", "diff_file", "error"]
+
+HTML_STYLE = """<style>
+body { font-family: sans-serif; }
+table.diff { border-collapse: collapse; font-family: monospace; font-size: 12px; width: 100%; }
+table.diff td { padding: 0 4px; white-space: pre-wrap; vertical-align: top; }
+td.ln { color: #888; text-align: right; width: 1%; }
+td.sep { background: #eee; text-align: center; }
+span.removed { background: #ffcccc; }
+span.added { background: #ccffcc; }
+</style>"""
+
+
+def walk_files(root, patterns):
+    """
+    Relative paths (with forward slashes) of all files under root matching any pattern.
+    """
+    found = {}
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            found[rel] = full
+    return found
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.digest()
+
+
+def _html_cell(text, ranges, css):
+    if not ranges:
+        return html.escape(text)
+    parts = []
+    pos = 0
+    for c1, c2 in ranges:
+        parts.append(html.escape(text[pos:c1]))
+        parts.append(f'<span class="{css}">{html.escape(text[c1:c2])}</span>')
+        pos = c2
+    parts.append(html.escape(text[pos:]))
+    return "".join(parts)
+
+
+def html_diff(lines1, lines2, opcodes, fromfile, tofile, context=3):
+    """
+    Side-by-side HTML of the change clusters (with context lines), not the whole file.
+    """
+    out = [f"<html><head><meta charset='utf-8'><title>{html.escape(tofile)}</title>{HTML_STYLE}</head><body>",
+           f"<h3>{html.escape(fromfile)} &rarr; {html.escape(tofile)}</h3>",
+           '<table class="diff">']
+    for group in grouped_opcodes(opcodes, context):
+        model = DiffModel(lines1, lines2, group)
+        n1, n2 = group[0][1], group[0][3]
+        out.append(f'<tr><td class="sep" colspan="4">@@ -{n1 + 1} +{n2 + 1} @@</td></tr>')
+        for (tag, i1, i2, j1, j2), first in zip(model.opcodes, model.row_starts):
+            for k, (left, right, lr, rr) in enumerate(model.rows(first, first + max(i2 - i1, j2 - j1))):
+                ln1 = str(i1 + k + 1) if i1 + k < i2 else ""
+                ln2 = str(j1 + k + 1) if j1 + k < j2 else ""
+                out.append(f'<tr><td class="ln">{ln1}</td><td>{_html_cell(left, lr, "removed")}</td>'
+                           f'<td class="ln">{ln2}</td><td>{_html_cell(right, rr, "added")}</td></tr>')
+    out.append("</table></body></html>")
+    return "\n".join(out)
+
+
+def compare_pair(task):
+    """
+    Worker: compare one file pair and write its diff. Returns a summary row.
+    """
+    rel, left, right, out_dir, fmt, engine, context, key = task
+    t0 = time.perf_counter()
+    row = {"path": rel, "status": "", "size_left": "", "size_right": "", "hunks": 0,
+           "removed": 0, "added": 0, "seconds": 0.0, "diff_file": "", "error": ""}
+    try:
+        row["size_left"] = os.path.getsize(left)
+        row["size_right"] = os.path.getsize(right)
+        if row["size_left"] == row["size_right"] and file_digest(left) == file_digest(right):
+            row["status"] = "identical"
+            return row
+        with LineFile(left) as lines1, LineFile(right) as lines2:
+            opcodes = diff_opcodes(lines1, lines2, engine, key)
+            for tag, i1, i2, j1, j2 in opcodes:
+                if tag != "equal":
+                    row["hunks"] += 1
+                    row["removed"] += i2 - i1
+                    row["added"] += j2 - j1
+            if not row["hunks"]:
+                row["status"] = "identical"  # only ignored noise, line endings or encoding differ
+                return row
+            row["status"] = "changed"
+            base = os.path.join(out_dir, "diffs", *rel.split("/"))
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            written = []
+            if fmt in ("unified", "both"):
+                with open(base + ".diff", "w", encoding="utf-8", newline="\n") as fh:
+                    fh.writelines(unified_diff(lines1, lines2, opcodes, "a/" + rel, "b/" + rel, context))
+                written.append(base + ".diff")
+            if fmt in ("html", "both"):
+                with open(base + ".html", "w", encoding="utf-8") as fh:
+                    fh.write(html_diff(lines1, lines2, opcodes, "a/" + rel, "b/" + rel, context))
+                written.append(base + ".html")
+        row["diff_file"] = ";".join(os.path.relpath(w, out_dir).replace(os.sep, "/") for w in written)
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = str(e)
+    finally:
+        row["seconds"] = round(time.perf_counter() - t0, 3)
+    return row
+
+
+def write_index(out_dir, rows, left_root, right_root):
+    with open(os.path.join(out_dir, "summary.csv"), "w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    changed = [r for r in rows if r["status"] not in ("identical",)]
+    out = [f"<html><head><meta charset='utf-8'><title>Directory compare</title>{HTML_STYLE}</head><body>",
+           f"<h3>{html.escape(left_root)} &rarr; {html.escape(right_root)}</h3>",
+           f"<p>{len(rows)} file(s), {len(rows) - len(changed)} identical, {len(changed)} listed below.</p>",
+           '<table class="diff"><tr><th>Path</th><th>Status</th><th>Hunks</th><th>-</th><th>+</th></tr>']
+    for r in changed:
+        links = [f'<a href="{html.escape(d)}">{html.escape(r["path"])}</a>' for d in r["diff_file"].split(";") if d.endswith(".html")]
+        name = links[0] if links else html.escape(r["path"])
+        status = html.escape(r["status"] + (f": {r['error']}" if r["error"] else ""))
+        out.append(f"<tr><td>{name}</td><td>{status}</td><td>{r['hunks']}</td><td>{r['removed']}</td><td>{r['added']}</td></tr>")
+    out.append("</table></body></html>")
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as fh:
+        fh.write("\n".join(out))
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two directory trees file by file (headless).")
+    parser.add_argument("left", help="Left/old directory (e.g. yesterday's backups).")
+    parser.add_argument("right", help="Right/new directory (e.g. today's backups).")
+    parser.add_argument("--out", required=True, help="Output directory for summary and per-file diffs.")
+    parser.add_argument("--format", choices=["unified", "html", "both"], default="unified", help="Per-file diff format.")
+    parser.add_argument("--engine", choices=list(DIFF_ENGINES), default=DEFAULT_ENGINE, help="Line diff engine.")
+    parser.add_argument("--context", type=int, default=3, help="Context lines around each change.")
+    parser.add_argument("--include", nargs="+", default=[], help="Only compare file names matching these globs (e.g. *.cfg *.txt).")
+    parser.add_argument("--ignore-case", action="store_true", help="Compare lines case-insensitively.")
+    parser.add_argument("--ignore-whitespace", choices=list(WHITESPACE_MODES), default="exact", help="Whitespace differences to ignore.")
+    parser.add_argument("--filter", action="append", default=[], metavar="REGEX", help="Ignore lines matching REGEX (repeatable).")
+    parser.add_argument("--mask", action="append", default=[], metavar="REGEX", help="Ignore text matching REGEX within lines (repeatable).")
+    parser.add_argument("--ignore-config-noise", action="store_true", help="Add the built-in filters/masks for config banners and timestamps.")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+    filters, masks = list(args.filter), list(args.mask)
+    if args.ignore_config_noise:
+        filters += CONFIG_NOISE_FILTERS
+        masks += CONFIG_NOISE_MASKS
+    try:
+        key = line_key(filters, masks, args.ignore_whitespace, args.ignore_case)
+    except re.error as e:
+        parser.error(f"invalid --filter/--mask pattern: {e}")
+
+    for d in (args.left, args.right):
+        if not os.path.isdir(d):
+            print(f"Not a directory: {d}", file=sys.stderr)
+            return 2
+    os.makedirs(args.out, exist_ok=True)
+    t0 = time.perf_counter()
+
+    left_files = walk_files(args.left, args.include)
+    right_files = walk_files(args.right, args.include)
+    rows = []
+    tasks = []
+    for rel in sorted(set(left_files) | set(right_files)):
+        if rel not in right_files:
+            rows.append(dict({f: "" for f in SUMMARY_FIELDS}, path=rel, status="only_left"))
+        elif rel not in left_files:
+            rows.append(dict({f: "" for f in SUMMARY_FIELDS}, path=rel, status="only_right"))
+        else:
+            size = os.path.getsize(left_files[rel]) + os.path.getsize(right_files[rel])
+            tasks.append((size, (rel, left_files[rel], right_files[rel], args.out, args.format, args.engine, args.context, key)))
+    # Largest pairs first so one big file does not end up alone at the tail
+    tasks.sort(key=lambda t: t[0], reverse=True)
+
+    workers = args.workers or os.cpu_count() or 1
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(compare_pair, task) for _size, task in tasks]
+        for fut in as_completed(futures):
+            row = fut.result()
+            rows.append(row)
+            done += 1
+            if row["status"] in ("changed", "error"):
+                print(f"[{done}/{len(tasks)}] {row['status']}: {row['path']}" + (f" ({row['error']})" if row["error"] else ""))
+
+    rows.sort(key=lambda r: r["path"])
+    write_index(args.out, rows, args.left, args.right)
+    counts = {}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    summary = ", ".join(f"{v} {k}" for k, v in sorted(counts.items()))
+    print(f"Compared {len(rows)} path(s) in {time.perf_counter() - t0:.1f}s: {summary}")
+    print(f"Summary: {os.path.join(args.out, 'summary.csv')}")
+    return 1 if counts.get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+"""
+GUI-independent line diff engines for the Beyond_Compare tools.
+
+Lines are interned to integers once, the common prefix/suffix is stripped, and
+the remaining region is diffed by the selected engine. Every engine returns
+opcodes in the same format as difflib.SequenceMatcher.get_opcodes(), so the
+existing renderers work unchanged.
+"""
+import re
+import difflib
+from functools import lru_cache
+from bisect import bisect_left, bisect_right
+
+# Once a Myers search passes this many edit steps, split at the furthest-reaching
+# forward point instead of insisting on an optimal path (as GNU diff does), so very
+# different inputs stay near-linear instead of going quadratic.
+MYERS_MAX_D = 256
+# iter_opcodes() yields once at least this many lines (both sides) are settled
+CHUNK_LINES = 5000
+# Intra-line diff: above this many tokens (either side) or below this similarity the
+# changed middle of the line is highlighted as a whole instead of token by token
+INTRALINE_MAX_TOKENS = 1500
+INTRALINE_MIN_RATIO = 0.3
+INTRALINE_CACHE = 4096
+# Only pairs up to this many characters (both lines) are cached, so huge lines are not kept alive
+INTRALINE_CACHE_MAX_CHARS = 4096
+_TOKEN_RE = re.compile(r"\w+|\s+|[^\w\s]")
+
+
+class DiffCancelled(Exception):
+    """Raised inside a diff when its cancel callback returns True."""
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel():
+        raise DiffCancelled()
+
+
+def hash_lines(lines1, lines2, key=None):
+    """
+    Map every line to a small integer id (equal lines -> equal ids).
+    key, if given, is applied to each line first so lines can be compared on a
+    normalised form while the caller keeps displaying the original text.
+    Lines loaded as file_loader.LineFile in the same encoding are hashed from
+    their raw bytes, without decoding them.
+    """
+    return hash_many((lines1, lines2), key)
+
+
+def hash_many(sequences, key=None):
+    """
+    hash_lines() for any number of line sequences sharing one id table, e.g.
+    base/ours/theirs for a three-way compare. Returns one id list per sequence.
+    """
+    ids = {}
+    setdefault = ids.setdefault
+    first = sequences[0]
+    if key is None and hasattr(first, "raw_comparable") and all(first.raw_comparable(s) for s in sequences[1:]):
+        return [[setdefault(line, len(ids)) for line in seq.raw_lines()] for seq in sequences]
+    if key is None:
+        return [[setdefault(line, len(ids)) for line in seq] for seq in sequences]
+    # Config files repeat lines a lot ("!", " shutdown"), so normalise each distinct line once
+    keys = {}
+
+    def norm(line):
+        k = keys.get(line)
+        if k is None:
+            k = keys[line] = key(line)
+        return k
+
+    return [[setdefault(norm(line), len(ids)) for line in seq] for seq in sequences]
+
+
+WHITESPACE_MODES = ("exact", "trailing", "changes", "all")
+# Placeholders that cannot occur in decoded text lines
+MASK_TOKEN = "\x00"
+FILTERED_KEY = "\x00filtered\x00"
+
+# Starting point for device config backups: banners and timestamps that change on every save
+CONFIG_NOISE_FILTERS = [
+    r"^\s*[!#]?\s*Last configuration change",
+    r"^\s*[!#]?\s*NVRAM config last updated",
+    r"^\s*[!#]?\s*No configuration change since last restart",
+    r"^\s*ntp clock-period",
+]
+CONFIG_NOISE_MASKS = [
+    r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?",
+    r"\b\d{1,2}:\d{2}:\d{2}(\.\d+)?\b",
+    r"\b(Mon|Tue|Wed|Thu|Fri|Sat|Sun)\w* (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w* +\d{1,2}\b( \d{4})?",
+]
+
+
+class LineNormalizer:
+    """
+    Comparison key for one line, used as the key of hash_lines()/iter_opcodes().
+
+    - filters: regexes; a line matching any of them is unimportant and compares
+      equal to every other filtered line
+    - masks: regexes; each match is replaced by one placeholder, so a timestamp or
+      counter compares equal whatever its value
+    - whitespace: "exact", "trailing" (ignore trailing), "changes" (ignore
+      leading/trailing, collapse runs) or "all" (ignore all whitespace)
+    - ignore_case: compare casefolded text
+
+    Only the keys are normalised; callers keep showing the original lines. The
+    object is picklable, so it can be handed to worker processes.
+    """
+
+    def __init__(self, filters=(), masks=(), whitespace="exact", ignore_case=False):
+        if whitespace not in WHITESPACE_MODES:
+            raise ValueError(f"Unknown whitespace mode: {whitespace} (choose from {', '.join(WHITESPACE_MODES)})")
+        # re.error propagates so callers can report the bad pattern
+        self.filters = [re.compile(p) for p in filters if p]
+        self.masks = [re.compile(p) for p in masks if p]
+        self.whitespace = whitespace
+        self.ignore_case = ignore_case
+
+    @property
+    def active(self):
+        return bool(self.filters or self.masks or self.ignore_case or self.whitespace != "exact")
+
+    def __call__(self, line):
+        for rx in self.filters:
+            if rx.search(line):
+                return FILTERED_KEY
+        for rx in self.masks:
+            line = rx.sub(MASK_TOKEN, line)
+        if self.whitespace == "trailing":
+            line = line.rstrip()
+        elif self.whitespace == "changes":
+            line = " ".join(line.split())
+        elif self.whitespace == "all":
+            line = "".join(line.split())
+        if self.ignore_case:
+            line = line.casefold()
+        return line
+
+
+def line_key(filters=(), masks=(), whitespace="exact", ignore_case=False):
+    """
+    A LineNormalizer for these rules, or None when nothing is ignored (so the
+    diff keeps its fast path of hashing the raw lines).
+    """
+    normalizer = LineNormalizer(filters, masks, whitespace, ignore_case)
+    return normalizer if normalizer.active else None
+
+
+def _strip_common(a, b, alo, ahi, blo, bhi, blocks):
+    # Record the common prefix/suffix of the region as matches and return the rest
+    start = alo
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        alo += 1
+        blo += 1
+    if alo > start:
+        blocks.append((start, blo - (alo - start), alo - start))
+    end = ahi
+    while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+    if end > ahi:
+        blocks.append((ahi, bhi, end - ahi))
+    return alo, ahi, blo, bhi
+
+
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_d):
+    """
+    Linear-space Myers: return (x0, y0, x1, y1), the middle snake of an optimal
+    edit path relative to (alo, blo). When the distance exceeds max_d an empty
+    snake at the furthest-reaching forward point is returned instead.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, max_d)
+    off = limit + 1
+    vf = [0] * (2 * limit + 3)
+    vb = [0] * (2 * limit + 3)
+    for d in range(limit + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[off + k - 1] < vf[off + k + 1]):
+                x = vf[off + k + 1]
+            else:
+                x = vf[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[off + k] = x
+            kr = delta - k
+            if odd and -(d - 1) <= kr <= d - 1 and x + vb[off + kr] >= n:
+                return x0, y0, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[off + k - 1] < vb[off + k + 1]):
+                x = vb[off + k + 1]
+            else:
+                x = vb[off + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[off + k] = x
+            kf = delta - k
+            if not odd and -d <= kf <= d and x + vf[off + kf] >= n:
+                return n - x, m - y, n - x0, m - y0
+    best = None
+    for k in range(-limit, limit + 1, 2):
+        x = min(vf[off + k], n)
+        y = x - k
+        if 0 <= y <= m and (best is None or x + y > best[0] + best[1]):
+            best = (x, y)
+    x, y = best
+    return x, y, x, y
+
+
+def _myers_region(a, b, alo, ahi, blo, bhi, blocks, cancel=None):
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        _check_cancel(cancel)
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _strip_common(a, b, alo, ahi, blo, bhi, blocks)
+        if alo >= ahi or blo >= bhi:
+            continue
+        x0, y0, x1, y1 = _middle_snake(a, alo, ahi, b, blo, bhi, MYERS_MAX_D)
+        if x1 > x0:
+            blocks.append((alo + x0, blo + y0, x1 - x0))
+        stack.append((alo, alo + x0, blo, blo + y0))
+        stack.append((alo + x1, ahi, blo + y1, bhi))
+
+
+def myers_blocks(a, b):
+    blocks = []
+    _myers_region(a, b, 0, len(a), 0, len(b), blocks)
+    return blocks
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    # Lines that occur exactly once on each side, in b order, then their longest
+    # increasing subsequence by position in a (patience sorting).
+    seen_a = {}
+    for i in range(alo, ahi):
+        v = a[i]
+        seen_a[v] = -1 if v in seen_a else i
+    seen_b = {}
+    for j in range(blo, bhi):
+        v = b[j]
+        if seen_a.get(v, -1) >= 0:
+            seen_b[v] = -1 if v in seen_b else j
+    pairs = [(seen_a[v], j) for v, j in seen_b.items() if j >= 0]
+    if not pairs:
+        return []
+    pairs.sort(key=lambda p: p[1])
+
+    tails = []      # tails[k] = index into pairs of the smallest tail of an LIS of length k+1
+    tail_vals = []  # a-positions of those tails, kept sorted for bisect
+    prev = [-1] * len(pairs)
+    for idx, (i, _j) in enumerate(pairs):
+        k = bisect_left(tail_vals, i)
+        if k:
+            prev[idx] = tails[k - 1]
+        if k == len(tails):
+            tails.append(idx)
+            tail_vals.append(i)
+        else:
+            tails[k] = idx
+            tail_vals[k] = i
+    out = []
+    idx = tails[-1] if tails else -1
+    while idx >= 0:
+        out.append(pairs[idx])
+        idx = prev[idx]
+    out.reverse()
+    return out
+
+
+def _patience_region(a, b, alo, ahi, blo, bhi, blocks, cancel=None):
+    """
+    Patience diff: anchor on lines unique to both sides, recurse between the
+    anchors and fall back to Myers where no unique anchors remain.
+    """
+    stack = [(alo, ahi, blo, bhi)]
+    while stack:
+        _check_cancel(cancel)
+        alo, ahi, blo, bhi = stack.pop()
+        alo, ahi, blo, bhi = _strip_common(a, b, alo, ahi, blo, bhi, blocks)
+        if alo >= ahi or blo >= bhi:
+            continue
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            _myers_region(a, b, alo, ahi, blo, bhi, blocks, cancel)
+            continue
+        pi, pj = alo, blo
+        for i, j in anchors:
+            stack.append((pi, i, pj, j))
+            blocks.append((i, j, 1))
+            pi, pj = i + 1, j + 1
+        stack.append((pi, ahi, pj, bhi))
+
+
+def patience_blocks(a, b):
+    blocks = []
+    _patience_region(a, b, 0, len(a), 0, len(b), blocks)
+    return blocks
+
+
+def _merge_blocks(blocks):
+    blocks.sort()
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            mi, mj, msize = merged[-1]
+            merged[-1] = (mi, mj, msize + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def opcodes_from_blocks(blocks, n, m, i=0, j=0):
+    """
+    Turn sorted matching blocks into SequenceMatcher-style opcodes covering
+    a[i:n] and b[j:m].
+    """
+    opcodes = []
+    for ai, bj, size in list(blocks) + [(n, m, 0)]:
+        tag = ""
+        if i < ai and j < bj:
+            tag = "replace"
+        elif i < ai:
+            tag = "delete"
+        elif j < bj:
+            tag = "insert"
+        if tag:
+            opcodes.append((tag, i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            opcodes.append(("equal", ai, i, bj, j))
+    return opcodes
+
+
+def _difflib_opcodes(lines1, lines2, key=None):
+    if key is not None:
+        lines1 = [key(line) for line in lines1]
+        lines2 = [key(line) for line in lines2]
+    else:
+        lines1, lines2 = list(lines1), list(lines2)
+    return difflib.SequenceMatcher(None, lines1, lines2).get_opcodes()
+
+
+DIFF_ENGINES = {
+    "patience": _patience_region,
+    "myers": _myers_region,
+    "difflib": None,  # legacy SequenceMatcher, kept for comparison
+}
+DEFAULT_ENGINE = "patience"
+
+
+def iter_opcodes(lines1, lines2, engine=DEFAULT_ENGINE, key=None, cancel=None, chunk_lines=CHUNK_LINES):
+    """
+    Diff two lists of lines, yielding (opcodes, progress) as regions settle, in
+    order; progress runs from 0.0 to 1.0. Top-level unique anchors split the work
+    into independent regions, so a viewer can show the first hunks long before
+    the diff is done. cancel is polled regularly; DiffCancelled is raised once it
+    returns True.
+    """
+    if engine not in DIFF_ENGINES:
+        raise ValueError(f"Unknown diff engine: {engine} (choose from {', '.join(DIFF_ENGINES)})")
+    if engine == "difflib":
+        yield _difflib_opcodes(lines1, lines2, key), 1.0
+        return
+    a, b = hash_lines(lines1, lines2, key)
+    yield from _iter_hashed_opcodes(a, b, engine, cancel, chunk_lines)
+
+
+def _iter_hashed_opcodes(a, b, engine, cancel=None, chunk_lines=CHUNK_LINES):
+    # iter_opcodes() on lines already mapped to ids
+    if engine == "difflib":
+        yield difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes(), 1.0
+        return
+    n, m = len(a), len(b)
+    region = DIFF_ENGINES[engine]
+    _check_cancel(cancel)
+
+    edges = []
+    alo, ahi, blo, bhi = _strip_common(a, b, 0, n, 0, m, edges)
+    prefix = [blk for blk in edges if blk[0] == 0 and alo > 0]
+    suffix = [blk for blk in edges if blk not in prefix]
+    anchors = []
+    if engine == "patience" and alo < ahi and blo < bhi:
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+
+    pending = list(prefix)
+    pos_i = pos_j = 0
+
+    def emit(final):
+        # Hold back the last block so equal runs spanning two chunks still merge
+        nonlocal pending, pos_i, pos_j
+        blocks = _merge_blocks(pending)
+        if final:
+            ops = opcodes_from_blocks(blocks, n, m, pos_i, pos_j)
+            pending = []
+            pos_i, pos_j = n, m
+            return ops, 1.0
+        else:
+            last = blocks.pop()
+            ops = opcodes_from_blocks(blocks, last[0], last[1], pos_i, pos_j)
+            pending = [last]
+            pos_i, pos_j = last[0], last[1]
+        return ops, (pos_i + pos_j) / max(1, n + m)
+
+    pi, pj = alo, blo
+    for i, j in anchors + [(ahi, bhi)]:
+        region(a, b, pi, i, pj, j, pending, cancel)
+        if i < ahi:
+            pending.append((i, j, 1))
+        pi, pj = i + 1, j + 1
+        if pending and (i - pos_i) + (j - pos_j) >= chunk_lines and i < ahi:
+            ops, done = emit(False)
+            if ops:
+                yield ops, done
+    pending.extend(suffix)
+    yield emit(True)
+
+
+def diff_opcodes(lines1, lines2, engine=DEFAULT_ENGINE, key=None):
+    """
+    Diff two lists of lines and return SequenceMatcher-style opcodes.
+    """
+    opcodes = []
+    for chunk, _done in iter_opcodes(lines1, lines2, engine, key):
+        opcodes.extend(chunk)
+    return opcodes
+
+
+def _tokens(text):
+    return [m.start() for m in _TOKEN_RE.finditer(text)] + [len(text)]
+
+
+def _add_span(spans, c1, c2):
+    if c2 <= c1:
+        return
+    if spans and spans[-1][1] == c1:
+        spans[-1] = (spans[-1][0], c2)
+    else:
+        spans.append((c1, c2))
+
+
+def diff_line_pair(old_line, new_line):
+    """
+    Changed (col_start, col_end) spans of one replaced line pair, as
+    (old_spans, new_spans).
+
+    Works on word/whitespace/punctuation tokens rather than characters, after
+    stripping the common prefix and suffix. Very long or very dissimilar pairs
+    get their whole changed middle highlighted instead. Results for pairs up to
+    INTRALINE_CACHE_MAX_CHARS are cached, since the same pair tends to be
+    re-rendered while scrolling and repeats in configs.
+    """
+    if len(old_line) + len(new_line) <= INTRALINE_CACHE_MAX_CHARS:
+        return _cached_line_pair(old_line, new_line)
+    return _diff_line_pair(old_line, new_line)
+
+
+def _diff_line_pair(old_line, new_line):
+    n1, n2 = len(old_line), len(new_line)
+    pre = 0
+    limit = min(n1, n2)
+    while pre < limit and old_line[pre] == new_line[pre]:
+        pre += 1
+    suf = 0
+    limit -= pre
+    while suf < limit and old_line[n1 - 1 - suf] == new_line[n2 - 1 - suf]:
+        suf += 1
+    # Snap to word boundaries so a changed word is highlighted whole
+    while pre > 0 and old_line[pre - 1].isalnum() and (
+            (pre < n1 and old_line[pre].isalnum()) or (pre < n2 and new_line[pre].isalnum())):
+        pre -= 1
+    while suf > 0 and old_line[n1 - suf].isalnum() and (
+            (suf < n1 - pre and old_line[n1 - 1 - suf].isalnum()) or (suf < n2 - pre and new_line[n2 - 1 - suf].isalnum())):
+        suf -= 1
+    mid1, mid2 = old_line[pre:n1 - suf], new_line[pre:n2 - suf]
+    whole = (((pre, n1 - suf),) if mid1 else (), ((pre, n2 - suf),) if mid2 else ())
+    if not mid1 or not mid2:
+        return whole
+
+    starts1, starts2 = _tokens(mid1), _tokens(mid2)
+    if max(len(starts1), len(starts2)) - 1 > INTRALINE_MAX_TOKENS:
+        return whole
+    toks1 = [mid1[starts1[k]:starts1[k + 1]] for k in range(len(starts1) - 1)]
+    toks2 = [mid2[starts2[k]:starts2[k + 1]] for k in range(len(starts2) - 1)]
+    matcher = difflib.SequenceMatcher(None, toks1, toks2, autojunk=False)
+    if matcher.quick_ratio() < INTRALINE_MIN_RATIO:
+        return whole
+    old_spans, new_spans = [], []
+    matched = 0
+    for tag, a1, a2, b1, b2 in matcher.get_opcodes():
+        if tag == "equal":
+            matched += starts1[a2] - starts1[a1]
+            continue
+        _add_span(old_spans, pre + starts1[a1], pre + starts1[a2])
+        _add_span(new_spans, pre + starts2[b1], pre + starts2[b2])
+    # Mostly rewritten lines read better as one block than as confetti
+    if 2 * (matched + pre + suf) < INTRALINE_MIN_RATIO * (n1 + n2):
+        return whole
+    return tuple(old_spans), tuple(new_spans)
+
+
+_cached_line_pair = lru_cache(maxsize=INTRALINE_CACHE)(_diff_line_pair)
+
+
+class DiffModel:
+    """
+    Compact index over line opcodes: aligned rows are produced on demand, so a
+    viewer only pays for the rows it actually shows.
+
+    Aligned rows follow the two-pane layout: equal lines side by side, replaced
+    lines paired (the shorter side padded with blank rows), deleted lines next to
+    a blank row and inserted lines next to a blank row.
+    """
+
+    def __init__(self, lines1, lines2, opcodes=()):
+        self.lines1 = lines1
+        self.lines2 = lines2
+        self.opcodes = []
+        self.row_starts = []  # first aligned row of each opcode
+        self.hunks = []       # first aligned row of each non-equal opcode
+        self.row_count = 0
+        self.extend(opcodes)
+
+    def extend(self, opcodes):
+        """
+        Append the next opcodes (in order), e.g. a chunk from iter_opcodes().
+        """
+        row = self.row_count
+        for op in opcodes:
+            tag, i1, i2, j1, j2 = op
+            self.opcodes.append(op)
+            self.row_starts.append(row)
+            if tag != "equal":
+                self.hunks.append(row)
+            row += max(i2 - i1, j2 - j1)
+        self.row_count = row
+
+    def next_hunk(self, row):
+        """
+        First hunk row after row, wrapping to the first hunk; None if identical.
+        """
+        if not self.hunks:
+            return None
+        k = bisect_right(self.hunks, row)
+        return self.hunks[k] if k < len(self.hunks) else self.hunks[0]
+
+    def rows(self, start, stop, inline=True):
+        """
+        Aligned rows start..stop-1 as (left, right, left_ranges, right_ranges);
+        ranges are (col_start, col_end) spans of removed/added text. With
+        inline=False the (comparatively costly) intra-line ranges are skipped.
+        """
+        out = []
+        start = max(0, start)
+        stop = min(self.row_count, stop)
+        if start >= stop:
+            return out
+        idx = bisect_right(self.row_starts, start) - 1
+        row = start
+        lines1, lines2 = self.lines1, self.lines2
+        while row < stop:
+            tag, i1, i2, j1, j2 = self.opcodes[idx]
+            first = self.row_starts[idx]
+            last = min(stop, first + max(i2 - i1, j2 - j1))
+            for k in range(row - first, last - first):
+                if tag == "equal":
+                    out.append((lines1[i1 + k], lines2[j1 + k], (), ()))
+                    continue
+                old_line = lines1[i1 + k] if i1 + k < i2 else ""
+                new_line = lines2[j1 + k] if j1 + k < j2 else ""
+                if tag == "replace" and inline:
+                    left, right = diff_line_pair(old_line, new_line)
+                    out.append((old_line, new_line, left, right))
+                else:
+                    out.append((old_line, new_line,
+                                [(0, len(old_line))] if old_line else [],
+                                [(0, len(new_line))] if new_line else []))
+            row = last
+            idx += 1
+        return out
+
+
+def grouped_opcodes(opcodes, context=3):
+    """
+    Split opcodes into change clusters with up to context equal lines around
+    each (same grouping as SequenceMatcher.get_grouped_opcodes()).
+    """
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _unified_range(start, stop):
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start if not length else start + 1},{length}"
+
+
+def unified_diff(lines1, lines2, opcodes, fromfile="", tofile="", context=3):
+    """
+    Unified diff lines (newline-terminated) built from precomputed opcodes, so
+    no second SequenceMatcher pass is needed.
+    """
+    started = False
+    for group in grouped_opcodes(opcodes, context):
+        if not started:
+            started = True
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_unified_range(first[1], last[2])} +{_unified_range(first[3], last[4])} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in lines1[i1:i2]:
+                    yield " " + line + "\n"
+                continue
+            if tag in ("replace", "delete"):
+                for line in lines1[i1:i2]:
+                    yield "-" + line + "\n"
+            if tag in ("replace", "insert"):
+                for line in lines2[j1:j2]:
+                    yield "+" + line + "\n"
+
+
+# --------------- Three-way compare ---------------
+
+MERGE3_KINDS = ("unchanged", "ours", "theirs", "both", "conflict")
+
+
+def _equal_blocks(opcodes):
+    return [(i1, j1, i2 - i1) for tag, i1, i2, j1, j2 in opcodes if tag == "equal"]
+
+
+def merge3(base, ours, theirs, engine=DEFAULT_ENGINE, key=None, cancel=None):
+    """
+    Three-way compare of ours and theirs against their common base.
+
+    All three are hashed once into a shared id table and both pairwise diffs
+    (base->ours, base->theirs) run on the ids. Returns regions
+    (kind, b1, b2, o1, o2, t1, t2) covering all three inputs in order, kind being:
+      unchanged - same in all three
+      ours      - changed only in ours (take ours)
+      theirs    - changed only in theirs (take theirs)
+      both      - changed identically on both sides
+      conflict  - changed differently on both sides
+    """
+    if engine not in DIFF_ENGINES:
+        raise ValueError(f"Unknown diff engine: {engine} (choose from {', '.join(DIFF_ENGINES)})")
+    z, a, b = hash_many((base, ours, theirs), key)
+    ops_a, ops_b = [], []
+    for chunk, _done in _iter_hashed_opcodes(z, a, engine, cancel):
+        ops_a.extend(chunk)
+    for chunk, _done in _iter_hashed_opcodes(z, b, engine, cancel):
+        ops_b.extend(chunk)
+
+    # Base ranges that both sides kept unchanged split the inputs into stable regions
+    am, bm = _equal_blocks(ops_a), _equal_blocks(ops_b)
+    sync = []
+    ia = ib = 0
+    while ia < len(am) and ib < len(bm):
+        abase, amatch, alen = am[ia]
+        bbase, bmatch, blen = bm[ib]
+        lo, hi = max(abase, bbase), min(abase + alen, bbase + blen)
+        if lo < hi:
+            sync.append((lo, hi, amatch + lo - abase, bmatch + lo - bbase))
+        if abase + alen < bbase + blen:
+            ia += 1
+        else:
+            ib += 1
+    sync.append((len(z), len(z), len(a), len(b)))
+
+    regions = []
+    iz = io = it = 0
+    for zlo, zhi, olo, tlo in sync:
+        if olo > io or tlo > it or zlo > iz:
+            changed_o = z[iz:zlo] != a[io:olo]
+            changed_t = z[iz:zlo] != b[it:tlo]
+            if changed_o and changed_t:
+                kind = "both" if a[io:olo] == b[it:tlo] else "conflict"
+            elif changed_o:
+                kind = "ours"
+            elif changed_t:
+                kind = "theirs"
+            else:
+                kind = "unchanged"
+            regions.append((kind, iz, zlo, io, olo, it, tlo))
+        length = zhi - zlo
+        if length:
+            regions.append(("unchanged", zlo, zhi, olo, olo + length, tlo, tlo + length))
+        iz, io, it = zhi, olo + length, tlo + length
+    # Merge neighbouring unchanged regions
+    merged = []
+    for r in regions:
+        if merged and r[0] == "unchanged" and merged[-1][0] == "unchanged":
+            prev = merged.pop()
+            r = ("unchanged", prev[1], r[2], prev[3], r[4], prev[5], r[6])
+        merged.append(r)
+    return merged
+
+
+def merge3_lines(base, ours, theirs, regions, labels=("ours", "base", "theirs")):
+    """
+    Merged text (lines without newlines): non-conflicting changes from either side
+    are taken, conflicts are written with diff3-style markers.
+    """
+    for kind, b1, b2, o1, o2, t1, t2 in regions:
+        if kind in ("unchanged", "ours", "both"):
+            yield from ours[o1:o2]
+        elif kind == "theirs":
+            yield from theirs[t1:t2]
+        else:
+            yield f"<<<<<<< {labels[0]}"
+            yield from ours[o1:o2]
+            yield f"||||||| {labels[1]}"
+            yield from base[b1:b2]
+            yield "======="
+            yield from theirs[t1:t2]
+            yield f">>>>>>> {labels[2]}"
+
+
+def _merge3_range(start, stop):
+    if stop - start == 1:
+        return f"{stop}"
+    return f"{start + 1}-{stop}" if stop > start else f"empty after line {start}"
+
+
+def conflict_hunks(base, ours, theirs, regions, labels=("ours", "base", "theirs")):
+    """
+    Only the conflict regions, each with its line ranges in all three inputs
+    (lines without newlines), for review or export.
+    """
+    number = 0
+    for kind, b1, b2, o1, o2, t1, t2 in regions:
+        if kind != "conflict":
+            continue
+        number += 1
+        yield (f"@@ conflict {number}: {labels[0]} {_merge3_range(o1, o2)}, "
+               f"{labels[1]} {_merge3_range(b1, b2)}, {labels[2]} {_merge3_range(t1, t2)} @@")
+        for label, lines, lo, hi in ((labels[0], ours, o1, o2), (labels[1], base, b1, b2), (labels[2], theirs, t1, t2)):
+            yield f"--- {label}"
+            for line in lines[lo:hi]:
+                yield "  " + line
+        yield ""
+
+
+class Merge3Model:
+    """
+    DiffModel counterpart for merge3() regions: aligned rows for three panes
+    (ours, base, theirs), each region padded to its tallest side.
+    """
+
+    def __init__(self, base, ours, theirs, regions=()):
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+        self.regions = []
+        self.row_starts = []
+        self.hunks = []      # first row of every changed region
+        self.conflicts = []  # first row of every conflict
+        self.row_count = 0
+        self.extend(regions)
+
+    def extend(self, regions):
+        row = self.row_count
+        for r in regions:
+            kind, b1, b2, o1, o2, t1, t2 = r
+            self.regions.append(r)
+            self.row_starts.append(row)
+            if kind != "unchanged":
+                self.hunks.append(row)
+            if kind == "conflict":
+                self.conflicts.append(row)
+            row += max(b2 - b1, o2 - o1, t2 - t1)
+        self.row_count = row
+
+    def next_hunk(self, row):
+        if not self.hunks:
+            return None
+        k = bisect_right(self.hunks, row)
+        return self.hunks[k] if k < len(self.hunks) else self.hunks[0]
+
+    def rows(self, start, stop, inline=True):
+        """
+        Aligned rows as ((ours, ranges, tag), (base, ranges, tag), (theirs, ranges, tag)).
+        Changed lines are highlighted whole; tag is "conflict" on conflict rows.
+        inline is accepted for VirtualPane compatibility.
+        """
+        out = []
+        start = max(0, start)
+        stop = min(self.row_count, stop)
+        if start >= stop:
+            return out
+        idx = bisect_right(self.row_starts, start) - 1
+        row = start
+        while row < stop:
+            kind, b1, b2, o1, o2, t1, t2 = self.regions[idx]
+            first = self.row_starts[idx]
+            last = min(stop, first + max(b2 - b1, o2 - o1, t2 - t1))
+            tag = "conflict" if kind == "conflict" else None
+            marked = (kind in ("ours", "both"), False, kind in ("theirs", "both"))
+            for k in range(row - first, last - first):
+                cells = []
+                for side, (lines, lo, hi) in enumerate(((self.ours, o1, o2), (self.base, b1, b2), (self.theirs, t1, t2))):
+                    text = lines[lo + k] if lo + k < hi else ""
+                    cells.append((text, [(0, len(text))] if marked[side] and text else [], tag))
+                out.append(tuple(cells))
+            row = last
+            idx += 1
+        return out
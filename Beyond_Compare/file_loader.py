@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Streaming, encoding-aware text loader for the Beyond_Compare tools.
+
+The encoding is detected from a small prefix (BOM, UTF-16 NUL pattern, UTF-8
+validity, then a legacy 8-bit fallback). The file is memory-mapped and split
+into a compact array of line offsets; lines are only decoded when indexed, so a
+large file costs 8 bytes per line instead of one Python string per line.
+"""
+import os
+import mmap
+import codecs
+from array import array
+from operator import add
+from itertools import accumulate
+
+# Bytes used to guess the encoding
+SNIFF_BYTES = 64 * 1024
+# Below this size the file is simply read into memory (mmap has a fixed setup cost)
+MMAP_MIN_BYTES = 1024 * 1024
+FALLBACK_ENCODING = "cp1252"
+# Bytes split at a time while indexing single-byte-newline encodings
+INDEX_BLOCK = 8 * 1024 * 1024
+RAW_BLOCK_LINES = 64 * 1024
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),  # before UTF-16 LE, which shares its first two bytes
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def detect_encoding(prefix):
+    """
+    Return (encoding, bom_length) for the first bytes of a file.
+    """
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+    # BOM-less UTF-16 (some exports): ASCII text leaves every other byte NUL
+    sample = prefix[:4096]
+    if len(sample) >= 4:
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_nuls > half * 0.4 and even_nuls < half * 0.05:
+            return "utf-16-le", 0
+        if even_nuls > half * 0.4 and odd_nuls < half * 0.05:
+            return "utf-16-be", 0
+    try:
+        prefix.decode("utf-8")
+        return "utf-8", 0
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the end of the prefix is still UTF-8
+        if e.start >= len(prefix) - 3 and e.reason == "unexpected end of data":
+            return "utf-8", 0
+    return FALLBACK_ENCODING, 0
+
+
+class LineFile:
+    """
+    Read-only sequence of the decoded lines of a text file (line endings removed).
+
+    Supports len(), indexing, slicing and iteration like the list returned by
+    read().splitlines(). raw_lines() yields the undecoded bytes of each line,
+    which hash_lines() uses when both files share an encoding.
+    """
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self._file = None
+        self._map = None
+        size = os.path.getsize(path)
+        with open(path, "rb") as fh:
+            prefix = fh.read(SNIFF_BYTES)
+        detected, bom = detect_encoding(prefix)
+        if encoding:
+            bom = bom if codecs.lookup(encoding).name == codecs.lookup(detected).name else 0
+            detected = encoding
+        self.encoding = detected
+        self.size = size
+        if size >= MMAP_MIN_BYTES:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data = self._map
+        else:
+            with open(path, "rb") as fh:
+                self._data = fh.read()
+        self._width = len("\n".encode(self.encoding))
+        self._newline = "\n".encode(self.encoding)
+        self._cr = "\r".encode(self.encoding)
+        self._offsets = self._index(bom)
+
+    def _index(self, start):
+        # offsets[i] is where line i starts; one extra entry marks the end of the data
+        data, newline, width = self._data, self._newline, self._width
+        end = len(data)
+        offsets = array("q", [start])
+        append = offsets.append
+        if width == 1:
+            # Split blocks in C and turn the line lengths into offsets without a Python loop per line
+            pos = start
+            while pos < end:
+                block = data[pos:pos + INDEX_BLOCK]
+                cut = block.rfind(newline) + 1
+                if not cut:
+                    pos += len(block)  # no newline in this block (very long line)
+                    continue
+                lengths = block[:cut].split(newline)
+                lengths.pop()
+                offsets.extend(map(add, accumulate(map(len, lengths)), range(pos + 1, pos + 1 + len(lengths))))
+                pos += cut
+            if offsets[-1] != end:
+                append(end)  # last line without a trailing newline
+            return offsets
+        find = data.find
+        pos = find(newline, start)
+        while pos != -1:
+            if (pos - start) % width:
+                # Newline byte pattern straddling two code units (UTF-16/32): not a line end
+                pos = find(newline, pos + 1)
+                continue
+            append(pos + width)
+            pos = find(newline, pos + width)
+        if offsets[-1] != end:
+            append(end)  # last line without a trailing newline
+        return offsets
+
+    def _span(self, i):
+        # The line without its ending: the newline (if any), then one "\r", also
+        # on a last line without a newline (as str.splitlines() does). raw_lines()
+        # splits blocks at once with the same rule.
+        start, stop = self._offsets[i], self._offsets[i + 1]
+        width = self._width
+        if self._data[stop - width:stop] == self._newline:
+            stop -= width
+        if stop - width >= start and self._data[stop - width:stop] == self._cr:
+            stop -= width
+        return start, stop
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        start, stop = self._span(index)
+        return self._data[start:stop].decode(self.encoding, errors="replace")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def raw_lines(self):
+        data, offsets, newline = self._data, self._offsets, self._newline
+        count = len(self)
+        if self._width > 1:
+            for i in range(count):
+                start, stop = self._span(i)
+                yield data[start:stop]
+            return
+        # Split many lines per call instead of slicing them one by one (endings as in _span())
+        cr = self._cr
+        for i in range(0, count, RAW_BLOCK_LINES):
+            j = min(count, i + RAW_BLOCK_LINES)
+            block = data[offsets[i]:offsets[j]]
+            lines = block.split(newline)
+            if block.endswith(newline):
+                lines.pop()
+            if cr in block:
+                lines = [line[:-1] if line.endswith(cr) else line for line in lines]
+            yield from lines
+
+    def raw_comparable(self, other):
+        """
+        True when equal raw bytes mean equal text in both files (same codec).
+        """
+        return (isinstance(other, LineFile)
+                and codecs.lookup(self.encoding).name == codecs.lookup(other.encoding).name)
+
+    def close(self):
+        if self._map is not None:
+            self._data = b""
+            self._offsets = array("q", [0])
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Headless three-way compare: base (e.g. golden config) vs ours (device config) vs
+theirs (proposed MOP).
+
+Prints a summary, optionally writes the merged file (conflicts wrapped in
+diff3-style markers) and/or a conflicts-only report. Exit code is 1 when there
+are conflicts, 0 otherwise (2 on errors), like diff3/git merge-file.
+
+Usage:
+    python three_way.py BASE OURS THEIRS [--merged FILE] [--conflicts FILE]
+    python Beyond_Compare_V5.py merge3 BASE OURS THEIRS ...   (same CLI)
+"""
+import re
+import sys
+import time
+import argparse
+
+from file_loader import LineFile
+from diff_core import (DIFF_ENGINES, DEFAULT_ENGINE, WHITESPACE_MODES, CONFIG_NOISE_FILTERS, CONFIG_NOISE_MASKS,
+                       conflict_hunks, line_key, merge3, merge3_lines)
+
+
+def write_lines(path, lines):
+    with open(path, "w", encoding="utf-8", newline="\n") as fh:
+        for line in lines:
+            fh.write(line + "\n")
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Three-way compare of two files against a common base (headless).")
+    parser.add_argument("base", help="Common ancestor (e.g. golden config).")
+    parser.add_argument("ours", help="First changed version (e.g. device config).")
+    parser.add_argument("theirs", help="Second changed version (e.g. proposed MOP).")
+    parser.add_argument("--merged", help="Write the merged file (conflicts with <<<<<<< markers) here.")
+    parser.add_argument("--conflicts", help="Write only the conflict hunks here.")
+    parser.add_argument("--labels", nargs=3, default=["ours", "base", "theirs"], metavar=("OURS", "BASE", "THEIRS"),
+                        help="Names used in markers and reports.")
+    parser.add_argument("--engine", choices=list(DIFF_ENGINES), default=DEFAULT_ENGINE, help="Line diff engine.")
+    parser.add_argument("--ignore-case", action="store_true", help="Compare lines case-insensitively.")
+    parser.add_argument("--ignore-whitespace", choices=list(WHITESPACE_MODES), default="exact", help="Whitespace differences to ignore.")
+    parser.add_argument("--filter", action="append", default=[], metavar="REGEX", help="Ignore lines matching REGEX (repeatable).")
+    parser.add_argument("--mask", action="append", default=[], metavar="REGEX", help="Ignore text matching REGEX within lines (repeatable).")
+    parser.add_argument("--ignore-config-noise", action="store_true", help="Add the built-in filters/masks for config banners and timestamps.")
+    args = parser.parse_args(argv)
+    filters, masks = list(args.filter), list(args.mask)
+    if args.ignore_config_noise:
+        filters += CONFIG_NOISE_FILTERS
+        masks += CONFIG_NOISE_MASKS
+    try:
+        key = line_key(filters, masks, args.ignore_whitespace, args.ignore_case)
+    except re.error as e:
+        parser.error(f"invalid --filter/--mask pattern: {e}")
+
+    t0 = time.perf_counter()
+    try:
+        with LineFile(args.base) as base, LineFile(args.ours) as ours, LineFile(args.theirs) as theirs:
+            regions = merge3(base, ours, theirs, args.engine, key)
+            labels = tuple(args.labels)
+            if args.merged:
+                write_lines(args.merged, merge3_lines(base, ours, theirs, regions, labels))
+            if args.conflicts:
+                write_lines(args.conflicts, conflict_hunks(base, ours, theirs, regions, labels))
+            elif not args.merged:
+                for line in conflict_hunks(base, ours, theirs, regions, labels):
+                    print(line)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    counts = {}
+    for region in regions:
+        if region[0] != "unchanged":
+            counts[region[0]] = counts.get(region[0], 0) + 1
+    summary = ", ".join(f"{counts.get(k, 0)} {k}" for k in ("ours", "theirs", "both", "conflict"))
+    print(f"Three-way compare in {time.perf_counter() - t0:.2f}s: {summary} change(s)")
+    return 1 if counts.get("conflict") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import csv
 import math
 import argparse
 import datetime
@@ -16,6 +17,8 @@ except Exception:
     tk = None  # CLI mode can still work without tkinter
 
 SUPPORTED_EXTS = {".xlsx", ".csv"}  # extend if you wish (e.g., ".xls")
+# "object" keeps Python str cells; "pyarrow" keeps cells in Arrow-backed string arrays end-to-end
+STRING_BACKENDS = ("object", "pyarrow")
 
 
 def timestamp() -> str:
@@ -255,6 +258,14 @@ def build_dataframe(df_raw: pd.DataFrame, headers: List[str], data_start: int) -
     elif len(df.columns) < len(headers):
         headers = headers[:len(df.columns)]
     df.columns = headers
+    if len(df.columns) and all(_is_arrow_string_dtype(dt) for dt in df.dtypes):
+        # Arrow strings: blank -> NA with Arrow kernels and keep the Arrow storage
+        # (convert_dtypes() would move the data back to Python strings)
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            df.isetitem(i, col.mask(col.str.strip().eq("").fillna(False)))
+        df = df.dropna(axis=1, how="all")
+        return df.reset_index(drop=True)
     # Clean up
     df = df.replace(r"^\s*$", pd.NA, regex=True)
     df = df.dropna(axis=1, how="all")
@@ -268,13 +279,49 @@ def build_placeholder_headers(ncols: int) -> List[str]:
 
 # --------------------- Readers (CSV/Excel) into raw frames ---------------------
 
-def read_csv_raw(path: str) -> pd.DataFrame:
+def _is_arrow_string_dtype(dtype: object) -> bool:
+    return isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"
+
+
+def raw_string_dtype(string_backend: str = "object") -> Any:
+    """
+    dtype passed to the readers for the chosen string backend.
+    """
+    if string_backend not in STRING_BACKENDS:
+        raise ValueError(f"string_backend must be one of {STRING_BACKENDS}")
+    if string_backend == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("pyarrow is required for Arrow strings. pip install pyarrow") from e
+        return "string[pyarrow]"
+    return str
+
+
+def _sniff_delimiter(path: str) -> str:
+    # The pyarrow engine cannot sniff (sep=None), so guess the delimiter from a small prefix
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+        sample = fh.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def read_csv_raw(path: str, string_backend: str = "object") -> pd.DataFrame:
+    dtype = raw_string_dtype(string_backend)
+    if string_backend == "pyarrow":
+        # Multi-threaded Arrow reader; ragged or non-UTF-8 files fall back to the python engine below
+        try:
+            return pd.read_csv(path, sep=_sniff_delimiter(path), engine="pyarrow", header=None, dtype=dtype)
+        except Exception:
+            pass
     encodings = [None, "utf-8", "utf-8-sig", "utf-16", "latin-1"]
     last_err = None
     for enc in encodings:
         try:
             # Read as raw (no header) so we can detect where the header actually is
-            return pd.read_csv(path, sep=None, engine="python", encoding=enc, header=None, dtype=str)
+            return pd.read_csv(path, sep=None, engine="python", encoding=enc, header=None, dtype=dtype)
         except UnicodeDecodeError as e:
             last_err = e
         except Exception as e:
@@ -282,9 +329,10 @@ def read_csv_raw(path: str) -> pd.DataFrame:
     raise RuntimeError(f"Failed to read CSV: {path} ({last_err})")
 
 
-def read_excel_raw_all_sheets(path: str) -> List[Tuple[str, pd.DataFrame]]:
+def read_excel_raw_all_sheets(path: str, string_backend: str = "object") -> List[Tuple[str, pd.DataFrame]]:
+    dtype = raw_string_dtype(string_backend)
     try:
-        sheets_raw: Dict[str, pd.DataFrame] = pd.read_excel(path, sheet_name=None, header=None, dtype=str)
+        sheets_raw: Dict[str, pd.DataFrame] = pd.read_excel(path, sheet_name=None, header=None, dtype=dtype)
     except ImportError as e:
         raise RuntimeError("openpyxl is required for Excel support. pip install openpyxl") from e
     except Exception as e:
@@ -429,21 +477,23 @@ def load_sources(
     normalise_columns: bool = True,
     include_metadata: bool = True,
     csv_sheet_label: str = "(CSV)",
-    align_headerless: bool = False
+    align_headerless: bool = False,
+    string_backend: str = "object"
 ) -> pd.DataFrame:
     """
     Read all files, detect/align headers across sources, union columns, add metadata columns.
     Returns a single concatenated DataFrame. Column order is preserved in the order columns
     are first seen across inputs (no alphabetical sorting).
+    With string_backend="pyarrow" the cells stay in Arrow string arrays from read to write.
     """
     units: List[Unit] = []
     for f in files:
         ext = os.path.splitext(f)[1].lower()
         if ext == ".csv":
-            df_raw = read_csv_raw(f)
+            df_raw = read_csv_raw(f, string_backend)
             units.append(Unit(source_file=os.path.basename(f), source_sheet=csv_sheet_label, df_raw=df_raw))
         elif ext == ".xlsx":
-            for sheet_name, df_raw in read_excel_raw_all_sheets(f):
+            for sheet_name, df_raw in read_excel_raw_all_sheets(f, string_backend):
                 units.append(Unit(source_file=os.path.basename(f), source_sheet=str(sheet_name), df_raw=df_raw))
         else:
             continue
@@ -461,8 +511,9 @@ def load_sources(
         df = apply_column_normalisation(df, normalise_columns)
         if include_metadata:
             # Insert metadata at the front so they remain leading columns
-            df.insert(0, "source_sheet", u.source_sheet)
-            df.insert(0, "source_file", u.source_file)
+            meta_dtype = "string[pyarrow]" if string_backend == "pyarrow" else None
+            df.insert(0, "source_sheet", pd.Series(u.source_sheet, index=df.index, dtype=meta_dtype))
+            df.insert(0, "source_file", pd.Series(u.source_file, index=df.index, dtype=meta_dtype))
         frames.append(df)
 
     # Concatenate without sorting columns
@@ -555,6 +606,8 @@ def run_cli(argv: Optional[List[str]] = None) -> int:
                         help="Output format(s). Use 'both' or list both xlsx csv.")
     parser.add_argument("--separate-sheets", action="store_true",
                         help="For Excel output, create one sheet per source_sheet plus an 'All' sheet.")
+    parser.add_argument("--string-backend", choices=list(STRING_BACKENDS), default="object",
+                        help="Cell storage: 'object' (Python strings) or 'pyarrow' (Arrow strings, faster and smaller for big exports).")
     args = parser.parse_args(argv)
 
     files = [f for f in args.files if is_supported_file(f)]
@@ -570,6 +623,7 @@ def run_cli(argv: Optional[List[str]] = None) -> int:
         normalise_columns=(not args.no_normalise),
         include_metadata=(not args.no_metadata),
         align_headerless=args.align_headerless,  # default False unless flag is set
+        string_backend=args.string_backend,
     )
 
     if df.empty:
@@ -616,6 +670,7 @@ class App:
         self.out_xlsx = tk.BooleanVar(value=True)
         self.out_csv = tk.BooleanVar(value=False)
         self.align_headerless = tk.BooleanVar(value=False)  # disabled by default
+        self.arrow_strings = tk.BooleanVar(value=False)
 
         # Layout
         frm = ttk.Frame(root, padding=10)
@@ -643,6 +698,7 @@ class App:
         ttk.Checkbutton(opts, text="Normalise column names (trim/collapse spaces)", variable=self.normalise_columns).grid(row=1, column=0, sticky="w")
         ttk.Checkbutton(opts, text="Excel: separate output sheets by source_sheet", variable=self.separate_sheets).grid(row=2, column=0, sticky="w")
         ttk.Checkbutton(opts, text="Align headerless/weak files to common header by width (optional)", variable=self.align_headerless).grid(row=3, column=0, sticky="w")
+        ttk.Checkbutton(opts, text="Arrow strings for large files (requires pyarrow)", variable=self.arrow_strings).grid(row=4, column=0, sticky="w")
 
         fmt = ttk.LabelFrame(frm, text="Output format")
         fmt.grid(row=5, column=0, columnspan=2, sticky="ew", pady=(10, 0))
@@ -672,6 +728,7 @@ class App:
         self.out_xlsx.trace_add("write", self._on_option_change)
         self.out_csv.trace_add("write", self._on_option_change)
         self.align_headerless.trace_add("write", self._on_option_change)
+        self.arrow_strings.trace_add("write", self._on_option_change)
 
     def _on_option_change(self, *args):
         # Placeholder for future dynamic UI changes if needed
@@ -730,6 +787,7 @@ class App:
                 normalise_columns=self.normalise_columns.get(),
                 include_metadata=self.include_metadata.get(),
                 align_headerless=self.align_headerless.get(),  # default False
+                string_backend="pyarrow" if self.arrow_strings.get() else "object",
             )
             if df.empty:
                 self.log_msg("No data found in the selected files.")
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import importlib.util
+from typing import Dict, List, Callable, Any
+
+# Compares the "object" (Python str) and "pyarrow" (Arrow string) backends of
+# ExcelFilter_Tool_V3.1.py and Combine_Excel_V20250918_V3.4.py on a synthetic CSV export.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FILTER_SCRIPT = os.path.join(HERE, "ExcelFilter_Tool_V3.1.py")
+COMBINE_SCRIPT = os.path.join(HERE, "..", "Combine_Excel", "Combine_Excel_V20250918_V3.4.py")
+
+
+def load_script(name: str, path: str):
+    # The tools are standalone scripts (dots in file names), so load them by path
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_export(path: str, rows: int, cols: int) -> None:
+    rnd = random.Random(42)
+    regions = ["North", "South", "East", "West", "Central"]
+    statuses = ["Active", "Inactive", "Pending", ""]
+    header = ["NE Name", "Region", "Status", "Count"] + [f"Field {i}" for i in range(4, cols)]
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        fh.write(",".join(header) + "\n")
+        for r in range(rows):
+            row = [f" NE-{r:07d} ", rnd.choice(regions), rnd.choice(statuses), str(rnd.randint(0, 9999))]
+            row += [f"v{(r * 31 + c) % 997}" for c in range(4, cols)]
+            fh.write(",".join(row) + "\n")
+
+
+def timed(label: str, results: Dict[str, float], fn: Callable[[], Any]) -> Any:
+    t0 = time.perf_counter()
+    out = fn()
+    results[label] = time.perf_counter() - t0
+    return out
+
+
+def bench_filter(ef, path: str, out_dir: str, backend: str) -> Dict[str, float]:
+    res: Dict[str, float] = {}
+    units = timed("read", res, lambda: ef.load_main_source(path, string_backend=backend))
+    _name, df_raw, meta = units[0]
+    df = timed("build", res, lambda: ef.build_df_from_unit(df_raw, meta))
+    res["memory_mb"] = df.memory_usage(deep=True).sum() / 1e6
+    rules: List[Dict[str, Any]] = [
+        {"column": "Region", "operator": "is", "values": ["north", "east"]},
+        {"column": "Status", "operator": "contains_any", "values": ["act"]},
+        {"column": "NE Name", "operator": "regex_any", "values": [r"NE-00\d{3}1"]},
+        {"column": "Status", "operator": "not_empty"},
+    ]
+    outputs = timed("filter", res, lambda: ef.filter_sheets([("(CSV)", df)], rules, "AND", True, max_workers=1))
+    timed("write_csv", res, lambda: ef.write_outputs(outputs, out_dir, f"filter_{backend}", False, True, False))
+    return res
+
+
+def bench_combine(ce, path: str, out_dir: str, backend: str) -> Dict[str, float]:
+    res: Dict[str, float] = {}
+    df = timed("load", res, lambda: ce.load_sources([path], string_backend=backend))
+    res["memory_mb"] = df.memory_usage(deep=True).sum() / 1e6
+    timed("write_csv", res, lambda: ce.write_outputs(df, out_dir, f"combine_{backend}", False, True, False))
+    return res
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark object vs pyarrow string backends.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the synthetic export (default 1,000,000).")
+    parser.add_argument("--cols", type=int, default=80, help="Columns in the synthetic export (default 80).")
+    parser.add_argument("--csv", help="Use an existing CSV instead of generating one.")
+    parser.add_argument("--backends", nargs="+", default=["object", "pyarrow"], choices=["object", "pyarrow"])
+    args = parser.parse_args()
+
+    ef = load_script("excelfilter_v31", FILTER_SCRIPT)
+    ce = load_script("combine_excel_v34", COMBINE_SCRIPT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if not path:
+            path = os.path.join(tmp, "export.csv")
+            print(f"Generating {args.rows:,} x {args.cols} CSV...")
+            make_export(path, args.rows, max(4, args.cols))
+        print(f"Input: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        for tool, fn, mod in (("ExcelFilter", bench_filter, ef), ("Combine_Excel", bench_combine, ce)):
+            for backend in args.backends:
+                res = fn(mod, path, tmp, backend)
+                parts = ", ".join(f"{k}={v:.1f}MB" if k == "memory_mb" else f"{k}={v:.2f}s" for k, v in res.items())
+                total = sum(v for k, v in res.items() if k != "memory_mb")
+                print(f"{tool:<14} {backend:<8} total={total:.2f}s  {parts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 import os
 import sys
 import re
+import csv
 import math
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple, Optional, Dict, Any
 
 import pandas as pd
@@ -18,6 +20,8 @@ except Exception as e:
 # ===================== Utilities and header detection =====================
 
 SUPPORTED_EXTS = {".xlsx", ".csv"}
+# "object" keeps Python str cells; "pyarrow" keeps cells in Arrow-backed string arrays end-to-end
+STRING_BACKENDS = ("object", "pyarrow")
 
 def timestamp() -> str:
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -181,6 +185,13 @@ def build_dataframe(df_raw: pd.DataFrame, headers: List[str], data_start: int) -
     elif len(df.columns) < len(headers):
         headers = headers[:len(df.columns)]
     df.columns = headers
+    if len(df.columns) and all(_is_arrow_string_dtype(dt) for dt in df.dtypes):
+        # Blank -> NA with Arrow kernels; convert_dtypes() would only drop the Arrow storage
+        for i in range(df.shape[1]):
+            col = df.iloc[:, i]
+            df.isetitem(i, col.mask(col.str.strip().eq("").fillna(False)))
+        df = df.dropna(axis=1, how="all")
+        return df.reset_index(drop=True)
     df = df.replace(r"^\s*$", pd.NA, regex=True)
     df = df.dropna(axis=1, how="all")
     df = df.reset_index(drop=True).convert_dtypes()
@@ -209,19 +220,49 @@ def apply_column_normalisation(df: pd.DataFrame, do_normalise: bool) -> pd.DataF
 
 # ===================== IO helpers =====================
 
-def read_csv_raw(path: str) -> pd.DataFrame:
+def _is_arrow_string_dtype(dtype: object) -> bool:
+    return isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow"
+
+def raw_string_dtype(string_backend: str = "object") -> Any:
+    if string_backend not in STRING_BACKENDS:
+        raise ValueError(f"string_backend must be one of {STRING_BACKENDS}")
+    if string_backend == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("pyarrow is required for Arrow strings. Install with: pip install pyarrow") from e
+        return "string[pyarrow]"
+    return str
+
+def _sniff_delimiter(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as fh:
+        sample = fh.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+def read_csv_raw(path: str, string_backend: str = "object") -> pd.DataFrame:
+    dtype = raw_string_dtype(string_backend)
+    if string_backend == "pyarrow":
+        # Multi-threaded Arrow reader; ragged or non-UTF-8 files fall back to the python engine below
+        try:
+            return pd.read_csv(path, sep=_sniff_delimiter(path), engine="pyarrow", header=None, dtype=dtype)
+        except Exception:
+            pass
     encodings = [None, "utf-8", "utf-8-sig", "utf-16", "latin-1"]
     last_err = None
     for enc in encodings:
         try:
-            return pd.read_csv(path, sep=None, engine="python", encoding=enc, header=None, dtype=str)
+            return pd.read_csv(path, sep=None, engine="python", encoding=enc, header=None, dtype=dtype)
         except Exception as e:
             last_err = e
     raise RuntimeError(f"Failed to read CSV: {path} ({last_err})")
 
-def read_excel_raw_all_sheets(path: str) -> List[Tuple[str, pd.DataFrame]]:
+def read_excel_raw_all_sheets(path: str, string_backend: str = "object") -> List[Tuple[str, pd.DataFrame]]:
+    dtype = raw_string_dtype(string_backend)
     try:
-        sheets_raw: Dict[str, pd.DataFrame] = pd.read_excel(path, sheet_name=None, header=None, dtype=str)
+        sheets_raw: Dict[str, pd.DataFrame] = pd.read_excel(path, sheet_name=None, header=None, dtype=dtype)
     except ImportError as e:
         raise RuntimeError("openpyxl is required for .xlsx. Install with: pip install openpyxl") from e
     except Exception as e:
@@ -231,15 +272,16 @@ def read_excel_raw_all_sheets(path: str) -> List[Tuple[str, pd.DataFrame]]:
         items.append((str(sheet), df_raw if df_raw is not None else pd.DataFrame()))
     return items
 
-def load_main_source(path: str, all_sheets: bool = False) -> List[Tuple[str, pd.DataFrame, Dict[str, Any]]]:
+def load_main_source(path: str, all_sheets: bool = False,
+                     string_backend: str = "object") -> List[Tuple[str, pd.DataFrame, Dict[str, Any]]]:
     ext = os.path.splitext(path)[1].lower()
     items: List[Tuple[str, pd.DataFrame, Dict[str, Any]]] = []
     if ext == ".csv":
-        df_raw = read_csv_raw(path)
+        df_raw = read_csv_raw(path, string_backend)
         meta = analyse_header(df_raw)
         items.append(("(CSV)", df_raw, meta))
     elif ext == ".xlsx":
-        sheets = read_excel_raw_all_sheets(path)
+        sheets = read_excel_raw_all_sheets(path, string_backend)
         if not sheets:
             raise RuntimeError("Workbook has no sheets or cannot be read.")
         if all_sheets:
@@ -321,7 +363,8 @@ def read_list_values(path: str) -> List[str]:
 # ===================== Filtering primitives =====================
 
 def series_as_str(s: pd.Series, case_sensitive: bool, trim: bool = True) -> pd.Series:
-    z = s.astype("string")
+    # Keep an existing string dtype (astype("string") would move Arrow data to Python storage)
+    z = s if isinstance(s.dtype, pd.StringDtype) else s.astype("string")
     if trim:
         z = z.str.strip()
     if not case_sensitive:
@@ -371,7 +414,10 @@ def apply_rule(df: pd.DataFrame, rule: Dict[str, Any]) -> pd.Series:
             list_path = rule.get("file")
             if not list_path:
                 raise ValueError(f"operator={op} requires 'file'")
-            values = read_list_values(list_path)
+            # file_values is filled by resolve_list_files() so workers don't re-read the file
+            values = rule.get("file_values")
+            if values is None:
+                values = read_list_values(list_path)
             if not values:
                 return pd.Series(False, index=df.index)
         else:
@@ -408,7 +454,7 @@ def apply_rule(df: pd.DataFrame, rule: Dict[str, Any]) -> pd.Series:
                 return pd.Series(False, index=df.index)
             joined = "|".join(f"(?:{p})" for p in patterns)
             flags = 0 if case_sensitive else re.IGNORECASE
-            mask = df[col].astype("string").str.contains(joined, regex=True, flags=flags, na=False)
+            mask = series_as_str(df[col], case_sensitive=True, trim=False).str.contains(joined, regex=True, flags=flags, na=False)
             if op == "not_regex":
                 mask = ~mask
             return mask
@@ -454,6 +500,82 @@ def combine_masks(masks: List[pd.Series], mode: str) -> pd.Series:
             raise ValueError("combine mode must be AND or OR")
     return out
 
+# ===================== Parallel evaluation =====================
+
+# Sheets/partitions smaller than this are evaluated in-process (pool start-up and pickling cost more)
+PARALLEL_MIN_ROWS = 50_000
+# Very large sheets are split into row partitions of this size so one sheet can use several cores
+PARTITION_ROWS = 250_000
+
+def resolve_list_files(rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Read every list file once and attach its values to a copy of the rule.
+    """
+    resolved: List[Dict[str, Any]] = []
+    cache: Dict[str, List[str]] = {}
+    for r in rules:
+        op = str(r.get("operator", "")).lower().strip()
+        if op in ("in_list_file", "not_in_list_file") and r.get("file") and "file_values" not in r:
+            path = r["file"]
+            if path not in cache:
+                cache[path] = read_list_values(path)
+            r = dict(r, file_values=cache[path])
+        resolved.append(r)
+    return resolved
+
+def filter_frame(df: pd.DataFrame, rules: List[Dict[str, Any]], combine_mode: str, keep_matches: bool) -> pd.DataFrame:
+    masks = [apply_rule(df, r) for r in rules]
+    combined = combine_masks(masks, combine_mode)
+    if keep_matches:
+        return df[combined]
+    return df[~combined]
+
+def _split_rows(df: pd.DataFrame, chunk_rows: int) -> List[pd.DataFrame]:
+    if len(df) <= chunk_rows:
+        return [df]
+    return [df.iloc[i : i + chunk_rows] for i in range(0, len(df), chunk_rows)]
+
+def filter_sheets(df_by_sheet: List[Tuple[str, pd.DataFrame]],
+                  rules: List[Dict[str, Any]],
+                  combine_mode: str,
+                  keep_matches: bool,
+                  max_workers: Optional[int] = None) -> List[Tuple[str, pd.DataFrame]]:
+    """
+    Evaluate the rules on every sheet, spreading sheets and row partitions of large
+    sheets over a process pool. Results keep the original sheet and row order.
+    """
+    rules = resolve_list_files(rules)
+    tasks: List[Tuple[int, pd.DataFrame]] = []
+    for idx, (_name, df) in enumerate(df_by_sheet):
+        for part in _split_rows(df, PARTITION_ROWS):
+            tasks.append((idx, part))
+
+    total_rows = sum(len(df) for _name, df in df_by_sheet)
+    workers = max_workers or os.cpu_count() or 1
+    parts: List[pd.DataFrame] = []
+    if len(tasks) > 1 and workers > 1 and total_rows >= PARALLEL_MIN_ROWS:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                futures = [pool.submit(filter_frame, part, rules, combine_mode, keep_matches) for _idx, part in tasks]
+                parts = [f.result() for f in futures]
+        except (KeyError, ValueError, re.error):
+            raise
+        except Exception:
+            # Pool unavailable (frozen build, restricted environment): fall back to one core
+            parts = []
+    if not parts:
+        parts = [filter_frame(part, rules, combine_mode, keep_matches) for _idx, part in tasks]
+
+    by_sheet: Dict[int, List[pd.DataFrame]] = {}
+    for (idx, _part), out in zip(tasks, parts):
+        by_sheet.setdefault(idx, []).append(out)
+    outputs: List[Tuple[str, pd.DataFrame]] = []
+    for idx, (name, df) in enumerate(df_by_sheet):
+        chunks = by_sheet.get(idx, [df.iloc[0:0]])
+        out = chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+        outputs.append((name, out.reset_index(drop=True)))
+    return outputs
+
 # ===================== Output writing =====================
 
 def write_outputs(df_by_sheet: List[Tuple[str, pd.DataFrame]],
@@ -525,6 +647,7 @@ class FilterGUI:
         self.var_out_excel = tk.BooleanVar(value=True)
         self.var_out_csv = tk.BooleanVar(value=False)
         self.var_separate_sheets = tk.BooleanVar(value=True)
+        self.var_arrow_strings = tk.BooleanVar(value=False)
 
         # Build UI
         self._build_ui()
@@ -546,6 +669,7 @@ class FilterGUI:
 
         ttk.Checkbutton(frm_file, text="Apply to all sheets (Excel only)", variable=self.var_all_sheets, command=self._on_all_sheets_toggle).grid(row=1, column=0, columnspan=2, sticky="w", padx=6, pady=(0,6))
         ttk.Checkbutton(frm_file, text="Normalise column names", variable=self.var_normalise, command=self._rebuild_ready_frames).grid(row=2, column=0, columnspan=2, sticky="w", padx=6)
+        ttk.Checkbutton(frm_file, text="Arrow strings for large files (requires pyarrow)", variable=self.var_arrow_strings, command=self._on_all_sheets_toggle).grid(row=3, column=0, columnspan=2, sticky="w", padx=6, pady=(0,6))
 
         # Combine frame
         frm_opts = ttk.LabelFrame(self.root, text="2) Combine and output options")
@@ -757,7 +881,11 @@ class FilterGUI:
             return
         try:
             self._log(f"Loading main file: {path}")
-            units = load_main_source(path, all_sheets=self.var_all_sheets.get())
+            units = load_main_source(
+                path,
+                all_sheets=self.var_all_sheets.get(),
+                string_backend="pyarrow" if self.var_arrow_strings.get() else "object",
+            )
             self.main_path = path
             self.units = units
             self.lbl_file.config(text=f"{os.path.basename(path)} ({len(units)} sheet(s))")
@@ -958,20 +1086,12 @@ class FilterGUI:
         combine_mode = self.var_combine.get()
         keep_matches = self.var_keep_matches.get()
 
-        outputs: List[Tuple[str, pd.DataFrame]] = []
         for name, df in self.df_by_sheet_ready.items():
             # Validate columns exist in this sheet as well
             for r in rules:
                 if r["column"] not in df.columns:
                     raise KeyError(f"Column '{r['column']}' not found in sheet '{name}'.")
-            masks = [apply_rule(df, r) for r in rules]
-            combined = combine_masks(masks, combine_mode)
-            if keep_matches:
-                out = df[combined]
-            else:
-                out = df[~combined]
-            outputs.append((name, out.reset_index(drop=True)))
-        return outputs
+        return filter_sheets(list(self.df_by_sheet_ready.items()), rules, combine_mode, keep_matches)
 
     def preview(self):
         try:
@@ -1,6 +1,6 @@
 import os
 import shutil
-import chardet
+from target_match import TargetSet, config_files, iter_matches, load_targets, write_report
 
 # Path to the folder containing the configuration files
 folder_path = 'Input'
@@ -8,58 +8,28 @@ folder_path = 'Input'
 # Path to the folder where we will save the files with the configuration string
 output_folder_path = 'Output'
 
-# Configuration strings to look for in the files
-config_strings = [
-'sysname WWLSWBESI015',
-'sysname BWLSWSHTI001',
-'sysname BWLSWSHTI015',
-'sysname BWUPEMEA001',
-'sysname WWUPEASTRO02',
-'sysname WWUPEASTRO01',
-'sysname BWLSWSHTI002',
-'sysname BWLSWSHTI003',
-'sysname BWLSWSHTI007',
-'sysname BWLSWSHTI008',
-'sysname BWLSWSHTI013',
-'sysname BWLSWSHTI014',
-'sysname BWLSWSHTI016',
-'sysname WWLSWBESI007',
-'sysname WWLSWBESI008',
-'sysname WWLSWBESI016',
-'sysname WWLSWBESI009',
-'sysname WWLSWBESI002',
-'sysname WWLSWBESI003',
-'sysname BWLSWSHTI018', 
-'sysname BWLSWSHTI017']
+# File with the configuration strings to look for, one per line
+targets_file = 'sysnames.txt'
 
-# Specify the encoding for files that chardet is unable to detect
-fallback_encoding = 'ISO-8859-1'
+# Prepended to lines of the targets file that do not start with it, so it can list plain host names
+target_prefix = 'sysname '
 
-# Loop through all files and subfolders in the folder
-for root, dirs, files in os.walk(folder_path):
-    # Loop through all files in the current directory
-    for filename in files:
-        # Check if the file has the '.txt' extension
-        if filename.endswith('.txt'):
-            # Construct the full path to the file
-            file_path = os.path.join(root, filename)
-            # Open the file
-            with open(file_path, 'rb') as f:
-                # Read the contents of the file and detect the encoding
-                file_contents = f.read()
-                result = chardet.detect(file_contents)
-                # Check if the encoding was detected
-                if result['encoding'] is not None:
-                    # Decode the file contents using the detected encoding
-                    file_contents = file_contents.decode(result['encoding'], errors='ignore')
-                else:
-                    # If the encoding was not detected, try to decode the file contents with the fallback encoding
-                    try:
-                        file_contents = file_contents.decode(fallback_encoding, errors='ignore')
-                    except UnicodeDecodeError:
-                        print(f"Unable to decode file with fallback encoding: {file_path}")
-                        continue
-                # Check if any of the configuration strings is in the file
-                if any(config_string in file_contents for config_string in config_strings):
-                    # If so, copy the file to the output folder
-                    shutil.copy(file_path, output_folder_path)
+if __name__ == '__main__':
+    # Compile all configuration strings into one matcher (each file is scanned once for all of them)
+    targets = TargetSet(load_targets(targets_file, target_prefix))
+    os.makedirs(output_folder_path, exist_ok=True)
+    results = []
+    # Check every .txt file under the input folder, on all cores
+    for file_path, indexes, error in iter_matches(config_files(folder_path), targets):
+        if error:
+            print(f"Unable to read file: {file_path} ({error})")
+        elif indexes:
+            # Copy the file to the output folder and report which configuration string it matched
+            shutil.copy(file_path, output_folder_path)
+            print(f"{file_path}: {', '.join(targets.targets[i] for i in indexes)}")
+            results.append((file_path, indexes))
+    # Save the file -> matched string report, with the strings no file contained
+    report_path = os.path.join(output_folder_path, 'matches.csv')
+    unmatched = write_report(report_path, folder_path, results, targets)
+    print(f"{len(results)} file(s) matched, {len(unmatched)} of {len(targets.targets)} configuration string(s) "
+          f"not found. Report saved to {report_path}.")
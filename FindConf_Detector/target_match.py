@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Multi-target matching for FindConf_Detector: which of many config strings
+(typically "sysname <host>" lines) occur in each config file.
+
+The targets are compiled into one regex shaped as a trie, so a file is scanned
+once however long the list is, instead of once per target. Targets sharing a
+prefix such as "sysname " cost one prefix scan, and the regex engine walks the
+trie from there. ASCII targets are matched on the raw bytes (after a BOM check
+for UTF-16 exports), so files are not decoded.
+
+Every target occurring in a file is reported, as with a plain substring test:
+where one target is a prefix of another ("sysname BWLSWSHTI001" and
+"sysname BWLSWSHTI0011") both count when the longer one occurs, and targets
+overlapping in the text are all found.
+
+MissingConf_Detector/conf_audit.py can run the same check as "find" rules, but
+it reports per rule, one column each; this reports which of a long host list
+each file holds. Like every tool folder, FindConf_Detector stays standalone (no
+imports across folders), so _trie_regex() and config_files() are copies of
+the ones in conf_audit.py: change them together.
+
+Usage:
+    python target_match.py Input sysnames.txt [--prefix "sysname "] [--out matches.csv]
+"""
+import os
+import re
+import csv
+import sys
+import time
+import codecs
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_EXTENSIONS = (".txt",)
+# Encoding used for non-ASCII targets when a file is not valid UTF-8
+FALLBACK_ENCODING = "ISO-8859-1"
+# Below this many files the matching runs in-process
+PARALLEL_MIN_FILES = 8
+# Per worker, the file list is handed out in about this many chunks
+CHUNKS_PER_WORKER = 8
+
+_UTF16_BOMS = {codecs.BOM_UTF16_LE: "utf-16-le", codecs.BOM_UTF16_BE: "utf-16-be"}
+
+
+def load_targets(path, prefix=""):
+    """
+    Targets from a file, one per line (blank lines and '#' comments skipped,
+    duplicates dropped). Lines not starting with prefix get it prepended, so a
+    plain host list works with prefix="sysname ".
+    """
+    targets = []
+    seen = set()
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if prefix and not line.startswith(prefix):
+                line = prefix + line
+            if line not in seen:
+                seen.add(line)
+                targets.append(line)
+    return targets
+
+
+def _trie_regex(words):
+    # Shared prefixes are tested once; the longest word matching at a position wins.
+    # (Same as conf_audit._trie_regex() in MissingConf_Detector.)
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = None
+
+    def build(node):
+        subs = [re.escape(ch) + build(node[ch]) for ch in sorted(node) if ch]
+        if not subs:
+            return ""
+        body = subs[0] if len(subs) == 1 else "(?:" + "|".join(subs) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class TargetSet:
+    """
+    Targets compiled into one trie regex; find() returns the indexes of all the
+    targets occurring in a text.
+    """
+
+    def __init__(self, targets, ignore_case=False):
+        self.targets = list(targets)
+        if not self.targets:
+            raise ValueError("No targets given")
+        self.ignore_case = ignore_case
+        self.byte_mode = all(t.isascii() for t in self.targets)
+        fold = str.lower if ignore_case else (lambda t: t)
+        # Matched text -> indexes of the targets it stands for (several if equal after folding)
+        self.lookup = {}
+        for i, t in enumerate(self.targets):
+            self.lookup.setdefault(fold(t), []).append(i)
+        # A match stands for the targets along its trie path: its prefixes of these lengths
+        self.lengths = sorted({len(key) for key in self.lookup})
+        pattern = _trie_regex(self.lookup)
+        flags = re.IGNORECASE if ignore_case else 0
+        self.regex = re.compile(pattern.encode("ascii") if self.byte_mode else pattern, flags)
+
+    def __getstate__(self):
+        # The compiled trie is rebuilt in the workers
+        return {"targets": self.targets, "ignore_case": self.ignore_case}
+
+    def __setstate__(self, state):
+        self.__init__(state["targets"], state["ignore_case"])
+
+    def find(self, data):
+        """Sorted indexes of the targets found in data (bytes in byte mode, else str)."""
+        search = self.regex.search
+        texts = set()
+        pos = 0
+        # The longest match at each start position; the next search starts one
+        # position later, so overlapping targets are not skipped
+        while True:
+            m = search(data, pos)
+            if not m:
+                break
+            texts.add(m.group())
+            pos = m.start() + 1
+        found = set()
+        for text in texts:
+            if isinstance(text, bytes):
+                text = text.decode("ascii")
+            key = text.lower() if self.ignore_case else text
+            hits = [i for n in self.lengths if n <= len(key) for i in self.lookup.get(key[:n], ())]
+            if not hits:
+                # Unicode case folding that lower() does not mirror exactly
+                hits = [i for i, t in enumerate(self.targets) if text.casefold().startswith(t.casefold())]
+            found.update(hits)
+        return sorted(found)
+
+
+def read_config(path, byte_mode):
+    """The raw bytes of a config file, decoded only for UTF-16 or non-ASCII targets."""
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    encoding = _UTF16_BOMS.get(raw[:2])
+    if encoding:
+        return raw[2:].decode(encoding, errors="ignore")
+    if byte_mode:
+        return raw
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode(FALLBACK_ENCODING)
+
+
+_worker_targets = None
+
+
+def _init_worker(targets):
+    global _worker_targets
+    _worker_targets = targets
+
+
+def match_file(path, targets=None):
+    """(path, target_indexes, error) for one file; fits a process pool after _init_worker()."""
+    targets = targets or _worker_targets
+    try:
+        data = read_config(path, targets.byte_mode)
+    except OSError as e:
+        return path, [], str(e)
+    if isinstance(data, str) and targets.byte_mode:
+        data = data.encode("ascii", errors="ignore")
+    return path, targets.find(data), ""
+
+
+def config_files(root, extensions=DEFAULT_EXTENSIONS):
+    """Files under root (recursively) whose extension is in extensions, sorted."""
+    # Same as conf_audit.config_files() in MissingConf_Detector
+    extensions = tuple(e.lower() for e in extensions)
+    found = []
+    for dirpath, _dirs, files in os.walk(root):
+        found.extend(os.path.join(dirpath, name) for name in files if name.lower().endswith(extensions))
+    found.sort()
+    return found
+
+
+def iter_matches(paths, targets, max_workers=None):
+    """Yield match_file() results for paths, in order; large lists use a process pool."""
+    workers = max_workers or os.cpu_count() or 1
+    if len(paths) < PARALLEL_MIN_FILES or workers == 1:
+        for path in paths:
+            yield match_file(path, targets)
+        return
+    chunk = max(1, len(paths) // (workers * CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(targets,)) as ex:
+        yield from ex.map(match_file, paths, chunksize=chunk)
+
+
+def write_report(report_path, root, results, targets):
+    """
+    CSV of the files with a match and the target(s) each one matched, followed
+    by the targets that matched no file. results: [(path, target_indexes)].
+    """
+    matched = set()
+    with open(report_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["File", "Matched"])
+        for path, indexes in results:
+            matched.update(indexes)
+            writer.writerow([os.path.relpath(path, root), "; ".join(targets.targets[i] for i in indexes)])
+        unmatched = [t for i, t in enumerate(targets.targets) if i not in matched]
+        if unmatched:
+            writer.writerow([])
+            writer.writerow(["Not found in any file"])
+            writer.writerows([t] for t in unmatched)
+    return unmatched
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Report which target strings each config file contains.")
+    parser.add_argument("root", help="Folder with the config files (searched recursively).")
+    parser.add_argument("targets", help="Targets file, one string (or host name with --prefix) per line.")
+    parser.add_argument("--prefix", default="", help="Prepended to targets not starting with it, e.g. 'sysname '.")
+    parser.add_argument("-i", "--ignore-case", action="store_true")
+    parser.add_argument("--out", default="matches.csv", help="Report file (CSV, default: matches.csv).")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    try:
+        targets = TargetSet(load_targets(args.targets, args.prefix), args.ignore_case)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    results = []
+    for path, indexes, error in iter_matches(config_files(args.root), targets, args.workers or None):
+        if error:
+            print(f"Error reading {path}: {error}", file=sys.stderr)
+        elif indexes:
+            results.append((path, indexes))
+    unmatched = write_report(args.out, args.root, results, targets)
+    print(f"{len(results)} file(s) matched, {len(unmatched)} of {len(targets.targets)} target(s) not found, "
+          f"in {time.perf_counter() - started:.1f}s. Report saved to {args.out}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
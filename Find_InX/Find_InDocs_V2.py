@@ -1,42 +1,63 @@
 import os
+import re
 import tkinter as tk
 from tkinter import filedialog
-from docx import Document
 
-def find_string_in_docx_top_directory(directory, search_string, output_file):
+from search_core import PatternSet, load_patterns, parallel_map, walk_files
+from docx_search import find_docx_hits, search_docx
+
+def find_string_in_docx_top_directory(directory, search_string, output_file, patterns=None, regex=False):
     """
     Searches for a string in .docx files ONLY in the top-level of a given directory.
     """
-    files_with_string = []
-    search_text = search_string.lower()
     print(f"Searching for '{search_string}' in .docx files within '{directory}' (no subfolders)...")
+    files_with_string = search_docx_files(directory, patterns or [search_string], recursive=False, regex=regex)
+    if files_with_string is not None:
+        write_results(output_file, search_string, directory, files_with_string, recursive=False)
 
-    for filename in os.listdir(directory):
-        if filename.lower().endswith('.docx'):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                if search_single_docx(file_path, search_text):
-                    files_with_string.append(file_path)
-    
-    write_results(output_file, search_string, directory, files_with_string, recursive=False)
 
-
-def find_string_in_docx_recursively(directory, search_string, output_file):
+def find_string_in_docx_recursively(directory, search_string, output_file, patterns=None, regex=False):
     """
     Searches for a string in .docx files in a directory and ALL its subdirectories.
     """
-    files_with_string = []
-    search_text = search_string.lower()
     print(f"Searching for '{search_string}' in .docx files within '{directory}' and all subfolders...")
+    files_with_string = search_docx_files(directory, patterns or [search_string], recursive=True, regex=regex)
+    if files_with_string is not None:
+        write_results(output_file, search_string, directory, files_with_string, recursive=True)
+
+
+def search_docx_files(directory, patterns, recursive, regex=False):
+    """
+    Scans the document text (body, headers, footers, footnotes; see docx_search.py) for all
+    patterns in one pass per file, in parallel worker processes. Returns a sorted list of
+    (file_path, ["[pattern] part, paragraph N: context", ...]), or None for a bad regex.
+    """
+    try:
+        pattern_set = PatternSet(patterns, regex=regex)
+    except re.error as e:
+        print(f"Invalid regular expression: {e}")
+        return None
+    files_with_string = []
 
-    for dirpath, _, filenames in os.walk(directory):
-        for filename in filenames:
-            if filename.lower().endswith('.docx'):
-                file_path = os.path.join(dirpath, filename)
-                if search_single_docx(file_path, search_text):
-                    files_with_string.append(file_path)
+    def report_error(path, message):
+        print(f"Could not read file {os.path.basename(path)} due to error: {message}")
 
-    write_results(output_file, search_string, directory, files_with_string, recursive=True)
+    def on_result(path, hits, truncated, error):
+        if error:
+            report_error(path, error)
+        if hits:
+            lines = [f"[{pattern_set.patterns[index]}] {part}, paragraph {para}: {snippet}"
+                     for index, part, para, snippet in hits]
+            if truncated:
+                lines.append(f"... stopped after {len(hits)} hits")
+            files_with_string.append((path, lines))
+
+    # Skip Word's "~$name.docx" lock files of open documents
+    files = (f for f in walk_files(directory, ('.docx',), recursive=recursive, on_error=report_error)
+             if not os.path.basename(f[0]).startswith('~$'))
+    parallel_map(files, find_docx_hits, (pattern_set,), on_result)
+    files_with_string.sort()
+    return files_with_string
 
 
 def search_single_docx(file_path, search_text):
@@ -44,33 +65,22 @@ def search_single_docx(file_path, search_text):
     Checks a single .docx file for the presence of search_text.
     Returns True if found, False otherwise.
     """
-    try:
-        doc = Document(file_path)
-        # Search in paragraphs
-        for para in doc.paragraphs:
-            if search_text in para.text.lower():
-                return True
-        
-        # Search in tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    if search_text in cell.text.lower():
-                        return True
-    except Exception as e:
-        print(f"Could not read file {os.path.basename(file_path)} due to error: {e}")
-    
-    return False
+    _path, found, error = search_docx(file_path, PatternSet([search_text]))
+    if error:
+        print(f"Could not read file {os.path.basename(file_path)} due to error: {error}")
+    return found
 
 
 def write_results(output_file, search_string, directory, file_list, recursive):
-    """Writes the list of found files to the output file."""
+    """Writes the found files, each followed by its hits, to the output file."""
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
             if file_list:
                 f.write(f"Files containing the string '{search_string}':\n\n")
-                for file_path in file_list:
+                for file_path, hits in file_list:
                     f.write(file_path + '\n')
+                    for hit in hits:
+                        f.write(f"    {hit}\n")
             else:
                 search_area = f"'{directory}' and its subdirectories" if recursive else f"'{directory}'"
                 f.write(f"No .docx files found in {search_area} containing the string '{search_string}'.\n")
@@ -96,17 +106,25 @@ if __name__ == "__main__":
         # 4. Ask user whether to include subfolders
         include_subfolders_choice = input("Include subfolders in the search? (yes/no): ").lower().strip()
         
-        # 5. Get the search string from the user
-        search_string = input("Please enter the string to search for: ")
+        # 5. Get the search string (or a pattern list file) from the user
+        mode = input("Search for (1) one string, (2) a list of strings from a file, (3) a list of regular expressions from a file? [1]: ").strip()
+        patterns = None
+        if mode in ('2', '3'):
+            pattern_file = filedialog.askopenfilename(title="Select the pattern list (one per line)",
+                                                      filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            patterns = load_patterns(pattern_file) if pattern_file else []
+            search_string = f"{len(patterns)} pattern(s) from {os.path.basename(pattern_file)}" if patterns else ""
+        else:
+            search_string = input("Please enter the string to search for: ")
 
         if search_string:
             output_file = 'result.txt'
-            
+
             # 6. Call the appropriate function based on user's choice
             if include_subfolders_choice.startswith('y'):
-                find_string_in_docx_recursively(directory, search_string, output_file)
+                find_string_in_docx_recursively(directory, search_string, output_file, patterns, regex=(mode == '3'))
             else:
-                find_string_in_docx_top_directory(directory, search_string, output_file)
+                find_string_in_docx_top_directory(directory, search_string, output_file, patterns, regex=(mode == '3'))
         else:
             print("No search string entered. Exiting programme.")
     else:
@@ -1,42 +1,70 @@
 import os
 import tkinter as tk
 from tkinter import filedialog
-from openpyxl import load_workbook
 
-def find_string_in_xlsx_top_directory(directory, search_string, output_file):
+from search_core import parallel_map, walk_files
+from xlsx_search import XmlNeedle, find_cells, search_xlsx
+from xlsx_index import DEFAULT_INDEX, format_refs, index_root, search_cells, update_index
+
+def find_string_in_xlsx_top_directory(directory, search_string, output_file, index_path=None):
     """
     Searches for a string in .xlsx files ONLY in the top-level of a given directory.
     """
-    files_with_string = []
-    search_text = search_string.lower()
     print(f"Searching for '{search_string}' in .xlsx files within '{directory}' (no subfolders)...")
-
-    for filename in os.listdir(directory):
-        if filename.lower().endswith('.xlsx'):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
-                if search_single_xlsx(file_path, search_text):
-                    files_with_string.append(file_path)
-    
+    files_with_string = search_xlsx_files(directory, search_string, recursive=False, index_path=index_path)
     write_results(output_file, search_string, directory, files_with_string, recursive=False)
 
 
-def find_string_in_xlsx_recursively(directory, search_string, output_file):
+def find_string_in_xlsx_recursively(directory, search_string, output_file, index_path=None):
     """
     Searches for a string in .xlsx files in a directory and ALL its subdirectories.
     """
-    files_with_string = []
-    search_text = search_string.lower()
     print(f"Searching for '{search_string}' in .xlsx files within '{directory}' and all subfolders...")
+    files_with_string = search_xlsx_files(directory, search_string, recursive=True, index_path=index_path)
+    write_results(output_file, search_string, directory, files_with_string, recursive=True)
 
-    for dirpath, _, filenames in os.walk(directory):
-        for filename in filenames:
-            if filename.lower().endswith('.xlsx'):
-                file_path = os.path.join(dirpath, filename)
-                if search_single_xlsx(file_path, search_text):
-                    files_with_string.append(file_path)
 
-    write_results(output_file, search_string, directory, files_with_string, recursive=True)
+def search_xlsx_files(directory, search_string, recursive, index_path=None):
+    """
+    Scans the workbooks' XML directly (see xlsx_search.py) in parallel worker processes,
+    or queries the cell index (see xlsx_index.py) after re-reading only changed workbooks.
+    Returns a sorted list of (file_path, [(sheet, cells, value snippet)]).
+    """
+    if index_path:
+        root = index_root(index_path)
+        directory_abs = os.path.abspath(directory)
+        try:
+            covered = root is None or os.path.commonpath([root, directory_abs]) == root
+        except ValueError:
+            covered = False  # different drives
+        if covered:
+            update_index(index_path, root or directory_abs)
+            found = {}
+            for path, sheet, refs, count, snippet in search_cells(index_path, search_string, directory, recursive):
+                found.setdefault(path, []).append((sheet, format_refs(refs, count), snippet))
+            return sorted(found.items())
+        print(f"The index covers {root}, not this folder; searching the workbooks directly.")
+
+    needle = XmlNeedle(search_string)
+    files_with_string = []
+
+    def report_error(path, message):
+        print(f"Could not read file {os.path.basename(path)} due to error: {message}")
+
+    def on_result(path, hits, truncated, error):
+        if error:
+            report_error(path, error)
+        elif hits:
+            if truncated:
+                hits.append(("", "", f"... stopped after {len(hits)} cells"))
+            files_with_string.append((path, hits))
+
+    # Skip Excel's "~$name.xlsx" lock files of open workbooks
+    files = (f for f in walk_files(directory, ('.xlsx',), recursive=recursive, on_error=report_error)
+             if not os.path.basename(f[0]).startswith('~$'))
+    parallel_map(files, find_cells, (needle,), on_result)
+    files_with_string.sort()
+    return files_with_string
 
 
 def search_single_xlsx(file_path, search_text):
@@ -44,30 +72,22 @@ def search_single_xlsx(file_path, search_text):
     Checks a single .xlsx file for the presence of search_text.
     Returns True if found, False otherwise.
     """
-    try:
-        # read_only=True and data_only=True improve performance and get cell values instead of formulas
-        workbook = load_workbook(file_path, read_only=True, data_only=True)
-        for sheet in workbook.worksheets:
-            for row in sheet.iter_rows():
-                for cell in row:
-                    if cell.value is not None:
-                        # Check if the search text is in the cell's value
-                        if search_text in str(cell.value).lower():
-                            return True # String found, no need to search further in this file
-    except Exception as e:
-        print(f"Could not read file {os.path.basename(file_path)} due to error: {e}")
-    
-    return False # String was not found in the entire workbook
+    _path, found, error = search_xlsx(file_path, XmlNeedle(search_text))
+    if error:
+        print(f"Could not read file {os.path.basename(file_path)} due to error: {error}")
+    return found
 
 
 def write_results(output_file, search_string, directory, file_list, recursive):
-    """Writes the list of found files to the output file."""
+    """Writes the found files, each followed by its matching cells, to the output file."""
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
             if file_list:
-                f.write(f"Files containing the string '{search_string}':\n\n")
-                for file_path in file_list:
+                f.write(f"Files containing the string '{search_string}' (sheet!cells: value):\n\n")
+                for file_path, hits in file_list:
                     f.write(file_path + '\n')
+                    for sheet, cells, snippet in hits:
+                        f.write(f"    {sheet}!{cells}: {snippet}\n" if sheet else f"    {snippet}\n")
             else:
                 search_area = f"'{directory}' and its subdirectories" if recursive else f"'{directory}'"
                 f.write(f"No .xlsx files found in {search_area} containing the string '{search_string}'.\n")
@@ -98,12 +118,17 @@ if __name__ == "__main__":
 
         if search_string:
             output_file = 'result.txt'
-            
+
+            # Optional: keep a cell index so repeated searches only re-read changed workbooks
+            index_path = None
+            if input(f"Use the cell index {DEFAULT_INDEX} (created on first use)? (yes/no): ").lower().strip().startswith('y'):
+                index_path = DEFAULT_INDEX
+
             # 6. Call the appropriate function based on user's choice
             if include_subfolders_choice.startswith('y'):
-                find_string_in_xlsx_recursively(directory, search_string, output_file)
+                find_string_in_xlsx_recursively(directory, search_string, output_file, index_path=index_path)
             else:
-                find_string_in_xlsx_top_directory(directory, search_string, output_file)
+                find_string_in_xlsx_top_directory(directory, search_string, output_file, index_path=index_path)
         else:
             print("No search string entered. Exiting programme.")
     else:
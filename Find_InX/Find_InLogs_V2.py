@@ -1,48 +1,138 @@
 import os
+import re
 import tkinter as tk
 from tkinter import filedialog
 
-def find_string_in_top_directory(directory, search_string, output_file, file_extensions, match_whole_word=False):
+from search_core import (HITS_SPLIT, PatternSet, compile_needle, find_hits, load_patterns, parallel_map, parallel_search,
+                         walk_files)
+from search_index import DEFAULT_INDEX, indexed_search
+
+def find_string_in_top_directory(directory, search_string, output_file, file_extensions, match_whole_word=False, index_path=None):
     """Searches for a string ONLY in the top-level of a given directory."""
-    files_with_string = []
     print(f"Searching for '{search_string}' in '{directory}' only (no subfolders)...")
+    run_search(directory, search_string, output_file, file_extensions, recursive=False, index_path=index_path,
+               match_whole_word=match_whole_word)
+
 
-    for filename in os.listdir(directory):
-        if filename.endswith(file_extensions):
-            file_path = os.path.join(directory, filename)
-            # Ensure we are checking a file, not a directory
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                        for line in file:
-                            if (search_string.lower() in line.lower()):
-                                files_with_string.append(file_path)
-                                break # Move to the next file once found
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
-    
-    write_results(output_file, search_string, directory, files_with_string, recursive=False)
-
-
-def find_string_in_files_recursively(directory, search_string, output_file, file_extensions, match_whole_word=False):
+def find_string_in_files_recursively(directory, search_string, output_file, file_extensions, match_whole_word=False, index_path=None):
     """Searches for a string in a directory and ALL its subdirectories."""
-    files_with_string = []
     print(f"Searching for '{search_string}' in '{directory}' and all subfolders...")
+    run_search(directory, search_string, output_file, file_extensions, recursive=True, index_path=index_path,
+               match_whole_word=match_whole_word)
+
+
+def run_search(directory, search_string, output_file, file_extensions, recursive, index_path=None, match_whole_word=False):
+    """
+    Walks the directory on a few threads and scans the files in parallel worker processes
+    (case-insensitive byte search, first hit per file). Matching files are written to the
+    output file as soon as they are found. Compressed logs (.gz/.bz2/.xz) are searched
+    as if unpacked, and zip archives member by member (reported as archive.zip!member).
+    With index_path, the trigram index (see search_index.py, updated first) picks the
+    candidate files instead of the walk.
+    """
+    pattern, overlap = compile_needle(search_string, whole_word=match_whole_word)
+    found = 0
+
+    def report_error(path, message):
+        print(f"Error processing {path}: {message}")
+
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(f"Files containing the string '{search_string}':\n\n")
+            f.flush()
+
+            def on_result(path, matched, error):
+                nonlocal found
+                if error:
+                    report_error(path, error)
+                elif matched:
+                    found += 1
+                    f.write(path + '\n')
+                    f.flush()
+
+            if index_path:
+                # The index is updated first; folders it does not cover are searched directly
+                scanned = indexed_search(index_path, search_string, on_result, directory, file_extensions, recursive,
+                                         whole_word=match_whole_word)
+                if scanned is not None:
+                    print(f"Index shortlisted {scanned} file(s).")
+            else:
+                files = walk_files(directory, file_extensions, recursive=recursive, on_error=report_error, archives=True)
+                parallel_search(files, pattern, overlap, on_result, member_extensions=file_extensions)
+    except OSError as e:
+        print(f"Error writing to output file {output_file}: {e}")
+        return
+
+    if not found:
+        write_results(output_file, search_string, directory, [], recursive)
+    else:
+        print(f"\nSearch complete. {found} file(s) found. Results saved to {output_file}.")
+
+
+def find_patterns_in_files(directory, patterns, output_file, file_extensions, recursive, regex=False, match_whole_word=False):
+    """
+    Searches for many patterns (e.g. a list of host names or IPs) in one pass per file.
+    Every hit is written as 'file:line: [pattern] context', followed by a per-pattern
+    summary and the patterns that were not found anywhere.
+    """
+    try:
+        pattern_set = PatternSet(patterns, regex=regex, whole_word=match_whole_word)
+    except re.error as e:
+        print(f"Invalid regular expression: {e}")
+        return
+    patterns = pattern_set.patterns
+    kind = "regular expression(s)" if regex else "pattern(s)"
+    print(f"Searching for {len(patterns)} {kind} in '{directory}'" + (" and all subfolders..." if recursive else " only..."))
+    file_counts = [0] * len(patterns)
+    hit_counts = [0] * len(patterns)
+    files_with_hits = 0
+
+    def report_error(path, message):
+        print(f"Error processing {path}: {message}")
+
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(f"Hits for {len(patterns)} {kind} (file:line: [pattern] context):\n\n")
+            f.flush()
+
+            def on_result(path, hits, truncated, error):
+                nonlocal files_with_hits
+                if error:
+                    report_error(path, error)
+                    return
+                if not hits:
+                    return
+                files_with_hits += 1
+                seen = set()
+                for index, line_no, snippet in hits:
+                    hit_counts[index] += 1
+                    if index not in seen:
+                        seen.add(index)
+                        file_counts[index] += 1
+                    f.write(f"{path}:{line_no}: [{patterns[index]}] {snippet}\n")
+                if truncated:
+                    f.write(f"{path}: ... stopped after {len(hits)} hits\n")
+                f.flush()
 
-    for dirpath, _, filenames in os.walk(directory):
-        for filename in filenames:
-            if filename.endswith(file_extensions):
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                        for line in file:
-                            if (search_string.lower() in line.lower()):
-                                files_with_string.append(file_path)
-                                break # Move to the next file once found
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
+            files = walk_files(directory, file_extensions, recursive=recursive, on_error=report_error, archives=True)
+            parallel_map(files, find_hits, (pattern_set,), on_result, member_extensions=file_extensions, split=HITS_SPLIT)
+
+            f.write("\nSummary (pattern: files, hits):\n")
+            for index, pattern in enumerate(patterns):
+                if hit_counts[index]:
+                    f.write(f"{pattern}: {file_counts[index]}, {hit_counts[index]}\n")
+            missing = [p for p, n in zip(patterns, hit_counts) if not n]
+            if missing:
+                f.write(f"\nNot found ({len(missing)}):\n")
+                for pattern in missing:
+                    f.write(pattern + '\n')
+    except OSError as e:
+        print(f"Error writing to output file {output_file}: {e}")
+        return
 
-    write_results(output_file, search_string, directory, files_with_string, recursive=True)
+    found = sum(1 for n in hit_counts if n)
+    print(f"\nSearch complete. {found} of {len(patterns)} pattern(s) found in {files_with_hits} file(s). "
+          f"Results saved to {output_file}.")
 
 
 def write_results(output_file, search_string, directory, file_list, recursive):
@@ -62,35 +152,60 @@ def write_results(output_file, search_string, directory, file_list, recursive):
 
 
 # --- Main Script Execution ---
+# (The guard matters: worker processes re-import this file on Windows)
+if __name__ == "__main__":
+    # 1. Set up and hide the root Tkinter window
+    root = tk.Tk()
+    root.withdraw()
 
-# 1. Set up and hide the root Tkinter window
-root = tk.Tk()
-root.withdraw()
+    # 2. Prompt user to select a directory
+    print("A folder selection window will now open.")
+    directory = filedialog.askdirectory(title="Select the folder to search")
 
-# 2. Prompt user to select a directory
-print("A folder selection window will now open.")
-directory = filedialog.askdirectory(title="Select the folder to search")
+    # 3. Proceed only if a directory was selected
+    if directory:
+        print(f"Directory selected: {directory}\n")
 
-# 3. Proceed only if a directory was selected
-if directory:
-    print(f"Directory selected: {directory}\n")
+        # 4. Ask user whether to include subfolders
+        include_subfolders_choice = input("Include subfolders in the search? (yes/no): ").lower().strip()
 
-    # 4. Ask user whether to include subfolders
-    include_subfolders_choice = input("Include subfolders in the search? (yes/no): ").lower().strip()
-    
-    # 5. Get the search string from the user
-    search_string = input("Please enter the string to search for: ")
-
-    if search_string:
+        # 5. Choose between one string and a list of patterns
+        mode = input("Search for (1) one string, (2) a list of strings from a file, (3) a list of regular expressions from a file? [1]: ").strip()
+        match_whole_word = input("Match whole words only? (yes/no): ").lower().strip().startswith('y')
         allowed_extensions = ('.log', '.txt', '.cfg')
         output_file = 'result.txt'
-        
-        # 6. Call the appropriate function based on user's choice
-        if include_subfolders_choice.startswith('y'):
-            find_string_in_files_recursively(directory, search_string, output_file, allowed_extensions)
+
+        if mode in ('2', '3'):
+            pattern_file = filedialog.askopenfilename(title="Select the pattern list (one per line)",
+                                                      filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            patterns = load_patterns(pattern_file) if pattern_file else []
+            if patterns:
+                find_patterns_in_files(directory, patterns, output_file, allowed_extensions,
+                                       recursive=include_subfolders_choice.startswith('y'),
+                                       regex=(mode == '3'), match_whole_word=match_whole_word)
+            else:
+                print("No patterns loaded. Exiting programme.")
+            raise SystemExit
+
+        # Get the search string from the user
+        search_string = input("Please enter the string to search for: ")
+
+        if search_string:
+
+            # Optional: use the index built with "python search_index.py build <folder>"
+            index_path = None
+            if os.path.exists(DEFAULT_INDEX):
+                if input(f"Use the search index {DEFAULT_INDEX}? (yes/no): ").lower().strip().startswith('y'):
+                    index_path = DEFAULT_INDEX
+
+            # 6. Call the appropriate function based on user's choice
+            if include_subfolders_choice.startswith('y'):
+                find_string_in_files_recursively(directory, search_string, output_file, allowed_extensions,
+                                                 match_whole_word=match_whole_word, index_path=index_path)
+            else:
+                find_string_in_top_directory(directory, search_string, output_file, allowed_extensions,
+                                             match_whole_word=match_whole_word, index_path=index_path)
         else:
-            find_string_in_top_directory(directory, search_string, output_file, allowed_extensions)
+            print("No search string entered. Exiting programme.")
     else:
-        print("No search string entered. Exiting programme.")
-else:
-    print("No directory was selected. Exiting programme.")
+        print("No directory was selected. Exiting programme.")
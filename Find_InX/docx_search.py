@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Fast .docx search for Find_InDocs: the text is read straight out of the zip's XML
+parts instead of building a python-docx Document for every file.
+
+word/document.xml, the headers, footers, footnotes and endnotes are streamed
+in blocks. Each block is reduced to its text in C (one regex pass over the
+<w:t> elements, paragraph ends turned into newlines), so text split over
+several runs is matched as one, and every paragraph becomes one line for
+search_core.find_hits_stream() and its PatternSet.
+"""
+import re
+import zipfile
+
+from search_core import MAX_HITS_PER_FILE, STREAM_ERRORS, find_hits_stream, iter_xml_blocks
+
+# Parts with document text, in the order they are searched and their labels
+_PART_RE = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+_PART_ORDER = ("document", "header", "footer", "footnotes", "endnotes")
+# What a damaged document can raise besides the stream errors
+DOCX_ERRORS = STREAM_ERRORS + (KeyError, ValueError)
+
+# Element names as written with any namespace prefix (<w:t> in Word's own files)
+_NS = rb"(?:[\w.-]+:)?"
+_W_TEXT_RE = re.compile(rb"<" + _NS + rb"t(?:\s[^>]*)?>([^<]*)</" + _NS + rb"t>")
+_PARA_END_RE = re.compile(rb"</" + _NS + rb"p>")
+_ENTITY_RE = re.compile(rb"&(#x[0-9a-fA-F]+|#[0-9]+|amp|lt|gt|quot|apos);")
+_ENTITIES = {b"amp": b"&", b"lt": b"<", b"gt": b">", b"quot": b'"', b"apos": b"'"}
+# Run content that stands for text, rewritten as <w:t> so one findall collects everything.
+# A <w:tab/> with attributes is a tab stop definition, not a tab; breaks may carry a type.
+_INLINE_RE = re.compile(rb"</" + _NS + rb"(p)>|<" + _NS + rb"(tab|noBreakHyphen)\s*/>|<" + _NS + rb"(br|cr)(?:\s[^>]*)?/>")
+_INLINE = {b"p": b"<w:t>\n</w:t>", b"tab": b"<w:t>\t</w:t>", b"br": b"<w:t> </w:t>",
+           b"cr": b"<w:t> </w:t>", b"noBreakHyphen": b"<w:t>-</w:t>"}
+
+
+def _entity(m):
+    name = m.group(1)
+    if name.startswith(b"#"):
+        code = int(name[2:], 16) if name[1:2] in (b"x", b"X") else int(name[1:])
+        return chr(code).encode("utf-8", errors="replace")
+    return _ENTITIES[name]
+
+
+def _inline(m):
+    return _INLINE[m.group(m.lastindex)]
+
+
+def text_parts(zf):
+    """
+    [(label, part_name)] of the parts holding document text: the body first, then
+    headers, footers, footnotes and endnotes (e.g. ("header2", "word/header2.xml")).
+    """
+    parts = []
+    for name in zf.namelist():
+        m = _PART_RE.match(name)
+        if m:
+            label = m.group(1)
+            kind = label.rstrip("0123456789")
+            parts.append((_PART_ORDER.index(kind), int(label[len(kind):] or 0), label, name))
+    return [(label, name) for _order, _num, label, name in sorted(parts)]
+
+
+def iter_text_blocks(fh):
+    """
+    Yield the plain text (UTF-8, one line per paragraph) of a WordprocessingML
+    stream, block by block. Blocks end after a paragraph, so no <w:t> is split.
+    """
+    for block in iter_xml_blocks(fh, _PARA_END_RE):
+        block = _INLINE_RE.sub(_inline, block)
+        text = b"".join(_W_TEXT_RE.findall(block))
+        if b"&" in text:
+            text = _ENTITY_RE.sub(_entity, text)
+        yield text
+
+
+class _BlockReader:
+    # Minimal binary stream over a generator of blocks; read() returns the next block
+    def __init__(self, blocks):
+        self._blocks = blocks
+
+    def read(self, size=-1):
+        return next(self._blocks, b"")
+
+
+def find_docx_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    """
+    (path, hits, truncated, error) for one document, hits being
+    [(pattern_index, part_label, paragraph_no, snippet)] for a search_core.PatternSet;
+    fits search_core.parallel_map(). Paragraphs are counted per part.
+    """
+    hits = []
+    try:
+        with zipfile.ZipFile(opener() if opener else path) as zf:
+            for label, name in text_parts(zf):
+                with zf.open(name) as fh:
+                    found, truncated = find_hits_stream(_BlockReader(iter_text_blocks(fh)), patterns, max_hits - len(hits))
+                hits.extend((index, label, para, snippet) for index, para, snippet in found)
+                if truncated:
+                    return path, hits, True, ""
+    except DOCX_ERRORS as e:
+        return path, hits, False, str(e)
+    return path, hits, False, ""
+
+
+def search_docx(path, patterns, opener=None):
+    """
+    (path, found, error) for one document; stops at the first hit.
+    """
+    path, hits, _truncated, error = find_docx_hits(path, patterns, 1, opener)
+    return path, bool(hits), error
@@ -0,0 +1,697 @@
+#!/usr/bin/env python3
+"""
+Shared search engine for the Find_InX scripts (no GUI, no input()).
+
+- walk_files(): directory walk with os.scandir on a small thread pool, yielding
+  files while the walk is still running
+- compile_needle(): a literal search string as a case-insensitive pattern that
+  runs on raw bytes (ASCII needles) instead of decoding and lowering every line
+- search_file(): scans a file in large blocks, stopping at the first hit
+- parallel_search(): fans files out over a process pool and hands each result
+  back to the caller as soon as it is ready
+- open_stream() / iter_archive(): .gz/.bz2/.xz files are decompressed on the fly
+  and .zip archives are searched member by member, inside the workers and
+  without extracting anything to disk
+"""
+import os
+import re
+import bz2
+import gzip
+import lzma
+import zlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Bytes read per call while scanning a file
+READ_BLOCK = 8 * 1024 * 1024
+# Threads listing directories (helps most on network shares)
+WALK_THREADS = 8
+# Files are sent to the workers in batches of up to this many files / bytes
+BATCH_FILES = 64
+BATCH_BYTES = 64 * 1024 * 1024
+# Batches in flight per worker process (bounds memory while the walk is still running)
+PENDING_PER_WORKER = 4
+# Below this many files the search runs in-process
+PARALLEL_MIN_FILES = 8
+# Plain files this big are split into byte ranges of about RANGE_BYTES for several workers
+SPLIT_MIN_BYTES = 256 * 1024 * 1024
+RANGE_BYTES = 64 * 1024 * 1024
+# Pattern-list searches: hits kept per file, and characters of context around a hit
+MAX_HITS_PER_FILE = 1000
+CONTEXT_CHARS = 120
+# A "line" longer than this is cut so a file without newlines cannot fill memory
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+# Single-file compression handled by open_stream(); .zip is a container, see iter_archive()
+COMPRESSED_SUFFIXES = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+ZIP_SUFFIX = ".zip"
+# Separates an archive path from a member name in reported paths: logs.zip!dev1/messages.log
+MEMBER_SEP = "!"
+# What a corrupt or truncated archive can raise while being read
+STREAM_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile)
+_ROTATION_RE = re.compile(r"(\.\d+)+$")
+
+
+def _compressed_suffix(name):
+    suffix = os.path.splitext(name)[1].lower()
+    return suffix if suffix in COMPRESSED_SUFFIXES else ""
+
+
+def wanted_name(name, extensions, archives=False):
+    """
+    True if a file name matches extensions (lower-case, empty = all). With
+    archives, zip files and compressed files whose inner name matches (also
+    rotated ones like messages.log.1.gz) are wanted too.
+    """
+    lower = name.lower()
+    if not extensions or lower.endswith(extensions):
+        return True
+    if not archives:
+        return False
+    if lower.endswith(ZIP_SUFFIX):
+        return True
+    suffix = _compressed_suffix(lower)
+    if suffix:
+        inner = lower[:-len(suffix)]
+        return inner.endswith(extensions) or _ROTATION_RE.sub("", inner).endswith(extensions)
+    return False
+
+
+def open_stream(path, raw=None):
+    """
+    Binary stream of a file's content, decompressing .gz/.bz2/.xz by name. raw is
+    an already open stream for path (e.g. a zip member) to wrap instead of opening it.
+    """
+    suffix = _compressed_suffix(path)
+    if suffix:
+        if raw is None:
+            return COMPRESSED_SUFFIXES[suffix](path, "rb")
+        return COMPRESSED_SUFFIXES[suffix](raw, "rb")
+    return raw if raw is not None else open(path, "rb", buffering=0)
+
+
+def _failing_opener(error):
+    def opener():
+        raise OSError(error)
+    return opener
+
+
+def iter_archive(path, extensions=()):
+    """
+    Yield (display_path, opener) for every member of a zip file whose name is
+    wanted (compressed members are decompressed too); opener() returns a binary
+    stream. A damaged archive yields one entry whose opener raises OSError.
+    """
+    try:
+        zf = zipfile.ZipFile(path)
+    except STREAM_ERRORS as e:
+        yield path, _failing_opener(f"{e}")
+        return
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir() or not wanted_name(info.filename.rsplit("/", 1)[-1], extensions, archives=True):
+                continue
+            if info.filename.lower().endswith(ZIP_SUFFIX):
+                continue  # nested zips are not opened
+            yield (path + MEMBER_SEP + info.filename,
+                   lambda info=info: open_stream(info.filename, zf.open(info)))
+
+
+def _scan_dir(path, extensions, archives):
+    files, subdirs, errors = [], [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file() and wanted_name(entry.name, extensions, archives):
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime))
+                except OSError as e:
+                    errors.append((entry.path, str(e)))
+    except OSError as e:
+        errors.append((path, str(e)))
+    return files, subdirs, errors
+
+
+def walk_files(root, extensions=(), recursive=True, threads=WALK_THREADS, on_error=None, archives=False):
+    """
+    Yield (path, size, mtime) for every file under root whose name ends with one of
+    extensions (case-insensitive; empty = all files). Directories are listed
+    concurrently; files are yielded as soon as their directory has been read.
+    archives=True also yields zip and compressed files (see wanted_name()).
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        pending = {pool.submit(_scan_dir, root, extensions, archives)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                files, subdirs, errors = fut.result()
+                if on_error is not None:
+                    for path, message in errors:
+                        on_error(path, message)
+                yield from files
+                if recursive:
+                    pending.update(pool.submit(_scan_dir, d, extensions, archives) for d in subdirs)
+
+
+def _word_bounded(body, text_mode):
+    # Like \b...\b, but also right for patterns that start or end with punctuation (IPs, "-vlan")
+    if text_mode:
+        return r"(?<!\w)(?:" + body + r")(?!\w)"
+    return rb"(?<!\w)(?:" + body + rb")(?!\w)"
+
+
+def compile_needle(search_string, ignore_case=True, whole_word=False):
+    """
+    Return (pattern, overlap) for a literal search string.
+
+    ASCII needles become a bytes regex (re.IGNORECASE folds ASCII in C, so the
+    data is never decoded); others fall back to a str regex on UTF-8 decoded
+    blocks. overlap is how many bytes consecutive blocks must share so a match
+    across a block boundary, with a character on either side of it for the
+    whole-word check, is not missed.
+    """
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        data = search_string.encode("ascii")
+    except UnicodeEncodeError:
+        body = re.escape(search_string)
+        if whole_word:
+            body = _word_bounded(body, True)
+        return re.compile(body, flags), len(search_string.encode("utf-8")) + 3 + 8
+    body = re.escape(data)
+    if whole_word:
+        body = _word_bounded(body, False)
+    return re.compile(body, flags), len(data) + 1
+
+
+def _trie_regex(words, text_mode):
+    """
+    One regex for many literals, shaped as a trie (shared prefixes are tested
+    once), so the regex engine walks an automaton instead of trying every
+    alternative in turn. Longer words win where one is a prefix of another.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[None] = None
+    esc = (lambda ch: re.escape(ch)) if text_mode else (lambda ch: re.escape(bytes([ch])))
+    empty = "" if text_mode else b""
+
+    def build(node):
+        end = None in node
+        leaves = [k for k in node if k is not None and list(node[k]) == [None]]
+        subs = [esc(k) + build(node[k]) for k in sorted(k for k in node if k is not None and k not in leaves)]
+        if len(leaves) == 1:
+            subs.append(esc(leaves[0]))
+        elif leaves:
+            subs.append(("[" if text_mode else b"[") + empty.join(esc(k) for k in sorted(leaves)) + ("]" if text_mode else b"]"))
+        if not subs:
+            return empty
+        if len(subs) == 1 and not end:
+            return subs[0]
+        body = ("(?:" if text_mode else b"(?:") + ("|" if text_mode else b"|").join(subs) + (")" if text_mode else b")")
+        return body + ("?" if text_mode else b"?") if end else body
+
+    return build(trie)
+
+
+class PatternSet:
+    """
+    Many search patterns compiled into one regex, so a file is read once for all
+    of them. Literals (e.g. a list of host names or IPs) become a trie regex;
+    with regex=True every pattern is a regular expression in its own named group.
+
+    Matches do not overlap: where one pattern's hit contains another's, only the
+    longer (literals) or the first listed (regex) is reported. which(match)
+    returns the index of the pattern that produced a match.
+    """
+
+    def __init__(self, patterns, regex=False, whole_word=False, ignore_case=True):
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        if not self.patterns:
+            raise ValueError("No search patterns given")
+        self.regex_mode = regex
+        self.whole_word = whole_word
+        self.ignore_case = ignore_case
+        # One plain string: format-specific fast paths (e.g. xlsx_search) can take over
+        self.single_literal = len(self.patterns) == 1 and not regex and not whole_word
+        # Work on raw bytes unless a pattern needs Unicode
+        self.text_mode = not all(p.isascii() for p in self.patterns)
+        flags = re.IGNORECASE if ignore_case else 0
+        if regex:
+            parts = [f"(?P<p{i}>{p})" for i, p in enumerate(self.patterns)]
+            body = "|".join(parts) if self.text_mode else "|".join(parts).encode("ascii")
+            self.lookup = None
+        else:
+            folded = [p.lower() if ignore_case else p for p in self.patterns]
+            words = folded if self.text_mode else [w.encode("ascii") for w in folded]
+            self.lookup = {w: i for i, w in reversed(list(enumerate(words)))}
+            body = _trie_regex(self.lookup, self.text_mode)
+        if whole_word:
+            body = _word_bounded(body, self.text_mode)
+        self.regex = re.compile(body, flags)  # re.error propagates for bad user regexes
+
+    def which(self, match):
+        if self.lookup is None:
+            return int(match.lastgroup[1:])
+        text = match.group()
+        index = self.lookup.get(text.lower() if self.ignore_case else text)
+        if index is None:
+            # Unicode case folding that lower() does not mirror exactly
+            index = next(i for i, p in enumerate(self.patterns) if p.casefold() == match.group().casefold())
+        return index
+
+
+def load_patterns(pattern_file):
+    """
+    Patterns from a list file, one per line (blank lines and lines starting with '#' are skipped).
+    """
+    with open(pattern_file, "r", encoding="utf-8-sig", errors="replace") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _snippet(line, col, width):
+    if len(line) <= 2 * CONTEXT_CHARS + width:
+        return line
+    lo = max(0, col - CONTEXT_CHARS)
+    hi = min(len(line), col + width + CONTEXT_CHARS)
+    return ("..." if lo else "") + line[lo:hi] + ("..." if hi < len(line) else "")
+
+
+def find_hits_stream(fh, patterns, max_hits=MAX_HITS_PER_FILE):
+    """
+    All hits of a PatternSet in a binary stream as (pattern_index, line_no,
+    snippet), plus a flag telling whether max_hits cut the list short. Blocks end
+    on line boundaries, so a match never spans two blocks (nor two lines).
+    """
+    text_mode = patterns.text_mode
+    finditer = patterns.regex.finditer
+    nl = "\n" if text_mode else b"\n"
+    hits = []
+    line_no = 1
+    carry = b""
+    while True:
+        data = fh.read(READ_BLOCK)
+        if data:
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            if not cut and len(data) < MAX_LINE_BYTES:
+                carry = data
+                continue
+            cut = cut or len(data)
+        elif carry:
+            data, cut = carry, len(carry)
+        else:
+            break
+        block, carry = data[:cut], data[cut:]
+        hay = block.decode("utf-8", errors="ignore") if text_mode else block
+        pos = 0
+        for m in finditer(hay):
+            start = m.start()
+            line_no += hay.count(nl, pos, start)
+            pos = start
+            ls = hay.rfind(nl, 0, start) + 1
+            le = hay.find(nl, start)
+            line = hay[ls:le if le >= 0 else len(hay)]
+            if not text_mode:
+                line = line.decode("utf-8", errors="replace")
+            hits.append((patterns.which(m), line_no, _snippet(line.rstrip("\r"), start - ls, m.end() - start)))
+            if len(hits) >= max_hits:
+                return hits, True
+        line_no += hay.count(nl, pos)
+    return hits, False
+
+
+def find_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    """
+    (path, hits, truncated, error) for one file; see find_hits_stream().
+    opener() replaces open_stream(path), e.g. for zip members.
+    """
+    try:
+        with (opener() if opener else open_stream(path)) as fh:
+            hits, truncated = find_hits_stream(fh, patterns, max_hits)
+            return path, hits, truncated, ""
+    except STREAM_ERRORS as e:
+        return path, [], False, str(e)
+
+
+def iter_blocks(fh, overlap=0, block_size=READ_BLOCK):
+    """
+    Yield (offset, block) from a binary stream; each block starts with the last
+    overlap bytes of the previous one. offset is the stream position of block[0].
+    """
+    tail = b""
+    offset = 0
+    while True:
+        data = fh.read(block_size)
+        if not data:
+            break
+        block = tail + data if tail else data
+        yield offset - len(tail), block
+        tail = block[-overlap:] if overlap else b""
+        offset += len(data)
+
+
+def _after_last_tag(data, end_tag):
+    # Offset just after the last match of end_tag in data, or -1
+    pos = len(data)
+    while True:
+        pos = data.rfind(b"</", 0, pos)
+        if pos < 0:
+            return -1
+        m = end_tag.match(data, pos)
+        if m:
+            return m.end()
+
+
+def iter_xml_blocks(fh, end_tag, block_size=READ_BLOCK):
+    """
+    Yield blocks of raw XML from a binary stream that end right after a match of
+    end_tag, a bytes regex for a closing tag (e.g. </si> or </x:si>), so no
+    element that is looked into is split between two blocks. The cut is after
+    an ASCII tag, so it never splits a UTF-8 character.
+    """
+    carry = b""
+    while True:
+        data = fh.read(block_size)
+        if not data:
+            if carry:
+                yield carry
+            return
+        data = carry + data
+        cut = _after_last_tag(data, end_tag)
+        if cut < 0:
+            carry = data
+            continue
+        yield data[:cut]
+        carry = data[cut:]
+
+
+def _block_hit(pattern, block, skip, text_mode, final):
+    # A hit counts only with the real data around it in the block, so the (?<!\w)
+    # and (?!\w) of a whole-word pattern never see a block edge as a word edge:
+    # the first skip bytes are context only, and unless the data ends with this
+    # block a character must follow. Hits that do not count here are whole in
+    # the neighbouring block, with their context.
+    pos = skip
+    if text_mode:
+        pos = len(block[:skip].decode("utf-8", errors="ignore"))
+        block = block.decode("utf-8", errors="ignore")
+    for m in pattern.finditer(block, pos):
+        if final or m.end() < len(block):
+            return True
+    return False
+
+
+def search_stream(fh, pattern, overlap, skip=0, open_end=False):
+    """
+    True if pattern matches in a binary stream read in blocks sharing overlap
+    bytes. The first skip bytes of the stream only give context (the bytes
+    before a range), and with open_end the data goes on after the stream.
+    """
+    text_mode = isinstance(pattern.pattern, str)
+    # Bytes of context kept in front of each later block: one character
+    context = 4 if text_mode else 1
+    pending = None
+    for offset, block in iter_blocks(fh, overlap):
+        if pending is not None and _block_hit(pattern, pending, pending_skip, text_mode, False):
+            return True
+        # A block that still starts at the beginning of the stream has no context to skip
+        pending, pending_skip = block, max(skip - offset, context if offset else 0)
+    return pending is not None and _block_hit(pattern, pending, pending_skip, text_mode, not open_end)
+
+
+def search_file(path, pattern, overlap, opener=None):
+    """
+    (path, found, error) for one file; stops reading at the first hit.
+    opener() replaces open_stream(path), e.g. for zip members.
+    """
+    try:
+        with (opener() if opener else open_stream(path)) as fh:
+            return path, search_stream(fh, pattern, overlap), ""
+    except STREAM_ERRORS as e:
+        return path, False, str(e)
+
+
+class _RangeReader:
+    """
+    Binary stream over the lines that start in [pos, end) of a file positioned
+    at pos: reading goes on past end to finish the last line. Counts newlines.
+    """
+
+    def __init__(self, fh, pos, end):
+        self.fh, self.pos, self.end = fh, pos, end
+        self.newlines = 0
+
+    def read(self, size=READ_BLOCK):
+        if self.pos >= self.end:
+            return b""
+        data = self.fh.read(min(size, self.end - self.pos))
+        if not data:
+            self.pos = self.end
+            return b""
+        self.pos += len(data)
+        if self.pos >= self.end and not data.endswith(b"\n"):
+            data += _read_line_rest(self.fh)
+        self.newlines += data.count(b"\n")
+        return data
+
+
+class _SliceReader:
+    # Binary stream over the next length bytes of a file
+    def __init__(self, fh, length):
+        self.fh, self.left = fh, length
+
+    def read(self, size=READ_BLOCK):
+        data = self.fh.read(min(size, self.left)) if self.left > 0 else b""
+        self.left -= len(data)
+        return data
+
+
+def _read_line_rest(fh):
+    parts = []
+    while True:
+        chunk = fh.read(64 * 1024)
+        if not chunk:
+            break
+        cut = chunk.find(b"\n")
+        if cut >= 0:
+            parts.append(chunk[:cut + 1])
+            fh.seek(cut + 1 - len(chunk), os.SEEK_CUR)
+            break
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def search_range(path, start, end, pattern, overlap):
+    """
+    (found, error) for matches starting in bytes [start, end) of a plain file.
+    """
+    try:
+        with open(path, "rb", buffering=0) as fh:
+            # A few bytes before the range give the whole-word check its context
+            lead = min(start, 4 if isinstance(pattern.pattern, str) else 1)
+            fh.seek(start - lead)
+            reader = _SliceReader(fh, lead + end - start + overlap)
+            open_end = end + overlap < os.fstat(fh.fileno()).st_size
+            return search_stream(reader, pattern, overlap, lead, open_end), ""
+    except OSError as e:
+        return False, str(e)
+
+
+def find_hits_range(path, start, end, patterns, max_hits=MAX_HITS_PER_FILE):
+    """
+    (hits, truncated, newlines, error) for the lines starting in bytes
+    [start, end) of a plain file; line numbers count from the range's first line.
+    """
+    try:
+        with open(path, "rb", buffering=0) as fh:
+            pos = start
+            if start:
+                # The line running through start - 1 belongs to the previous range
+                fh.seek(start - 1)
+                pos += len(_read_line_rest(fh)) - 1
+            reader = _RangeReader(fh, pos, end)
+            hits, truncated = find_hits_stream(reader, patterns, max_hits)
+            return hits, truncated, reader.newlines, ""
+    except OSError as e:
+        return [], False, 0, str(e)
+
+
+def _merge_found(path, parts, *_args):
+    found = any(part and part[0] for part in parts)
+    error = "" if found else next((part[1] for part in parts if part and part[1]), "")
+    return path, found, error
+
+
+def merge_hits(path, parts, _patterns=None, max_hits=MAX_HITS_PER_FILE):
+    """
+    (path, hits, truncated, error) from find_hits_range() results in file order,
+    with line numbers made absolute.
+    """
+    hits, offset = [], 0
+    for part_hits, truncated, newlines, error in parts:
+        if error:
+            return path, hits, False, error
+        hits.extend((index, line_no + offset, snippet) for index, line_no, snippet in part_hits)
+        if truncated or len(hits) >= max_hits:
+            # A truncated range stopped reading, so later line numbers are unknown
+            return path, hits[:max_hits], True, ""
+        offset += newlines
+    return path, hits, False, ""
+
+
+class RangeSplit:
+    """
+    How parallel_map() may cut a big plain file into byte ranges for several
+    workers: range_func(path, start, end, *args) runs in a worker (module-level
+    function), merge(path, parts, *args) builds the normal result from the range
+    results in file order (None for ranges skipped after stop), stop(part) ends
+    the file early and can_split(path) picks the files that may be cut.
+    """
+
+    def __init__(self, range_func, merge, stop=None, can_split=None):
+        self.range_func = range_func
+        self.merge = merge
+        self.stop = stop
+        self.can_split = can_split or is_plain_file
+
+    def ranges(self, size):
+        count = -(-size // RANGE_BYTES)
+        step = -(-size // count)
+        return [(start, min(size, start + step)) for start in range(0, size, step)]
+
+
+def is_plain_file(path):
+    """True unless the file is decompressed or expanded on the fly (see open_stream())."""
+    return not _compressed_suffix(path) and not path.lower().endswith(ZIP_SUFFIX)
+
+
+# Files-containing search: the first range with a hit decides the file
+SEARCH_SPLIT = RangeSplit(search_range, _merge_found, stop=lambda part: part[0])
+# Hit listing with line numbers (find_hits)
+HITS_SPLIT = RangeSplit(find_hits_range, merge_hits)
+
+
+def _run_batch(func, paths, args, member_extensions):
+    results = []
+    for path in paths:
+        if path.lower().endswith(ZIP_SUFFIX):
+            # One result per member, reported as archive!member
+            for name, opener in iter_archive(path, member_extensions):
+                results.append(func(name, *args, opener=opener))
+        else:
+            results.append(func(path, *args))
+    return results
+
+
+def _work_units(files, split):
+    """
+    Work for the pool, largest first: ("range", path, index, count, start, end)
+    for each range of a file worth splitting, ("batch", paths) for the rest.
+    """
+    units = []
+    batch, batch_size = [], 0
+    for path, size, *_ in files:
+        if split is not None and size >= SPLIT_MIN_BYTES and split.can_split(path):
+            ranges = split.ranges(size)
+            units.extend((end - start, ("range", path, i, len(ranges), start, end)) for i, (start, end) in enumerate(ranges))
+            continue
+        batch.append(path)
+        batch_size += size
+        if len(batch) >= BATCH_FILES or batch_size >= BATCH_BYTES:
+            units.append((batch_size, ("batch", batch)))
+            batch, batch_size = [], 0
+    if batch:
+        units.append((batch_size, ("batch", batch)))
+    units.sort(key=lambda u: u[0], reverse=True)
+    return [unit for _size, unit in units]
+
+
+def parallel_map(files, func, args, on_result, max_workers=None, member_extensions=(), split=None):
+    """
+    Run func(path, *args) for (path, size, ...) tuples from any iterable (e.g.
+    walk_files()) in a process pool and call on_result(*result) in this process
+    as each file is done. func must be a module-level function that also takes
+    opener= (see search_file()); zip files are expanded into their members
+    matching member_extensions. Results arrive in completion order.
+
+    The files are collected first and scheduled largest first, so a huge file
+    does not start last and hold up the end of the run. With split (a
+    RangeSplit), files of SPLIT_MIN_BYTES and more are cut into byte ranges
+    searched by different workers.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    files = sorted(files, key=lambda f: f[1], reverse=True)
+    if workers > 1 and len(files) < PARALLEL_MIN_FILES:
+        # Only start processes for more than a handful of files, or one worth splitting
+        if split is None or not any(f[1] >= SPLIT_MIN_BYTES and split.can_split(f[0]) for f in files):
+            workers = 1
+    if workers == 1:
+        for path, *_ in files:
+            for result in _run_batch(func, [path], args, member_extensions):
+                on_result(*result)
+        return
+
+    parts = {}      # path -> range results so far (None = not done)
+    left = {}       # path -> ranges still running or queued
+    finished = set()
+    pending = {}    # future -> unit
+
+    def finish(path):
+        finished.add(path)
+        on_result(*split.merge(path, parts.pop(path), *args))
+        left.pop(path, None)
+
+    def collect(done):
+        for fut in done:
+            unit = pending.pop(fut)
+            if unit[0] == "batch":
+                for result in fut.result():
+                    on_result(*result)
+                continue
+            _kind, path, index, _count, _start, _end = unit
+            if path in finished or fut.cancelled():
+                continue
+            part = fut.result()
+            parts[path][index] = part
+            left[path] -= 1
+            if split.stop is not None and split.stop(part):
+                # Early exit: drop the ranges of this file that have not started
+                for other, other_unit in pending.items():
+                    if other_unit[0] == "range" and other_unit[1] == path:
+                        other.cancel()
+                finish(path)
+            elif not left[path]:
+                finish(path)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for unit in _work_units(files, split):
+            if unit[0] == "batch":
+                fut = pool.submit(_run_batch, func, unit[1], args, member_extensions)
+            else:
+                _kind, path, index, count, start, end = unit
+                if path in finished:
+                    continue
+                if path not in parts:
+                    parts[path] = [None] * count
+                    left[path] = count
+                fut = pool.submit(split.range_func, path, start, end, *args)
+            pending[fut] = unit
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+
+
+def parallel_search(files, pattern, overlap, on_result, max_workers=None, member_extensions=()):
+    """
+    Files-containing search: on_result(path, found, error) per file (see parallel_map).
+    """
+    parallel_map(files, search_file, (pattern, overlap), on_result, max_workers, member_extensions, SEARCH_SPLIT)
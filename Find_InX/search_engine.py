@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+One search over a mixed archive: logs and text files, compressed logs and zip
+archives, .xlsx, .docx, .pdf, .msg and .eml, found by one directory walk and
+searched by one worker pool, with every hit written by one result writer as
+text, JSONL or CSV.
+
+Each format has a hit finder returning (path, hits, truncated, error) with
+hits = [(pattern_index, location, snippet)]; locations are "line 12",
+"Sheet1!B7", "document, paragraph 3", "page 2, line 5" or "body, line 4".
+PDF and Outlook .msg support need pymupdf and extract-msg; without them those
+files are reported as errors and everything else is still searched.
+
+Usage:
+    python search_engine.py ROOT [ROOT ...] -e TEXT [-e TEXT ...] [--format jsonl|csv|text] [--out FILE]
+    python search_engine.py ROOT --patterns hosts.txt [--regex] [--word] [--files-only]
+"""
+import io
+import os
+import re
+import sys
+import csv
+import json
+import time
+import zipfile
+import argparse
+from email import policy
+from email.parser import BytesParser
+
+from search_core import (MAX_HITS_PER_FILE, STREAM_ERRORS, PatternSet, RangeSplit, find_hits, find_hits_range,
+                         find_hits_stream, is_plain_file, load_patterns, merge_hits, parallel_map, walk_files)
+from xlsx_search import WORKBOOK_ERRORS, XmlNeedle, iter_cells, workbook_hits
+from docx_search import find_docx_hits
+
+TEXT_EXTENSIONS = (".log", ".txt", ".cfg")
+DOCUMENT_EXTENSIONS = (".xlsx", ".docx", ".pdf", ".msg", ".eml")
+DEFAULT_EXTENSIONS = TEXT_EXTENSIONS + DOCUMENT_EXTENSIONS
+OUTPUT_FORMATS = ("text", "jsonl", "csv")
+RESULT_FIELDS = ["path", "pattern", "location", "snippet"]
+# What cell extraction can raise on a damaged workbook (e.g. a shared string index out of range)
+_EXTRACT_ERRORS = WORKBOOK_ERRORS + (IndexError, RuntimeError)
+
+
+def _unit_hits(text, patterns, location, max_hits, with_line=True):
+    """
+    Hits in one extracted piece of text (a cell, a page, a mail body) as
+    (pattern_index, location, snippet); most pieces are rejected by one search().
+    """
+    data = text.encode("utf-8", errors="replace")
+    if not patterns.regex.search(text if patterns.text_mode else data):
+        return []
+    hits, _truncated = find_hits_stream(io.BytesIO(data), patterns, max_hits)
+    return [(index, f"{location}, line {line_no}" if with_line else location, snippet) for index, line_no, snippet in hits]
+
+
+def text_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    path, hits, truncated, error = find_hits(path, patterns, max_hits, opener)
+    return path, [(index, f"line {line_no}", snippet) for index, line_no, snippet in hits], truncated, error
+
+
+def docx_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    path, hits, truncated, error = find_docx_hits(path, patterns, max_hits, opener)
+    return path, [(index, f"{part}, paragraph {para}", snippet) for index, part, para, snippet in hits], truncated, error
+
+
+def xlsx_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    """
+    A single literal uses the xlsx_search XML scanner; pattern lists and regexes
+    go through every cell value.
+    """
+    hits = []
+    try:
+        with zipfile.ZipFile(opener() if opener else path) as zf:
+            if patterns.single_literal:
+                needle = XmlNeedle(patterns.patterns[0], patterns.ignore_case)
+                for sheet, ref, value in workbook_hits(zf, needle, max_hits + 1):
+                    hits.extend(_unit_hits(value, patterns, f"{sheet}!{ref}", 1, with_line=False))
+            else:
+                for sheet, ref, value in iter_cells(zf):
+                    hits.extend(_unit_hits(value, patterns, f"{sheet}!{ref}", max_hits + 1 - len(hits), with_line=False))
+                    if len(hits) > max_hits:
+                        break
+    except _EXTRACT_ERRORS as e:
+        return path, hits[:max_hits], False, str(e)
+    return path, hits[:max_hits], len(hits) > max_hits, ""
+
+
+def pdf_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    try:
+        import fitz  # pymupdf, optional
+    except ImportError:
+        return path, [], False, "pymupdf is required for PDF files (pip install pymupdf)"
+    hits = []
+    try:
+        doc = fitz.open(stream=opener().read(), filetype="pdf") if opener else fitz.open(path)
+        with doc:
+            for number, page in enumerate(doc, 1):
+                hits.extend(_unit_hits(page.get_text(), patterns, f"page {number}", max_hits + 1 - len(hits)))
+                if len(hits) > max_hits:
+                    break
+    except Exception as e:  # pymupdf raises its own error types for damaged files
+        return path, hits[:max_hits], False, str(e)
+    return path, hits[:max_hits], len(hits) > max_hits, ""
+
+
+def _mail_hits(fields, patterns, max_hits):
+    hits = []
+    for name, text in fields:
+        if text:
+            hits.extend(_unit_hits(text, patterns, name, max_hits + 1 - len(hits), with_line=(name == "body")))
+        if len(hits) > max_hits:
+            break
+    return hits
+
+
+def msg_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    try:
+        import extract_msg  # optional
+    except ImportError:
+        return path, [], False, "extract-msg is required for .msg files (pip install extract-msg)"
+    try:
+        msg = extract_msg.Message(opener().read() if opener else path)
+        try:
+            fields = [("subject", msg.subject), ("from", getattr(msg, "sender", None)), ("to", msg.to), ("body", msg.body)]
+            hits = _mail_hits(fields, patterns, max_hits)
+        finally:
+            msg.close()
+    except Exception as e:  # extract-msg/olefile raise their own error types for damaged files
+        return path, [], False, str(e)
+    return path, hits[:max_hits], len(hits) > max_hits, ""
+
+
+def eml_hits(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    try:
+        with (opener() if opener else open(path, "rb")) as fh:
+            msg = BytesParser(policy=policy.default).parse(fh)
+        body = msg.get_body(preferencelist=("plain", "html"))
+        fields = [("subject", msg["subject"]), ("from", msg["from"]), ("to", msg["to"]),
+                  ("body", body.get_content() if body is not None else "")]
+        hits = _mail_hits(fields, patterns, max_hits)
+    except STREAM_ERRORS + (LookupError, ValueError) as e:
+        return path, [], False, str(e)
+    return path, hits[:max_hits], len(hits) > max_hits, ""
+
+
+# Hit finder by file extension; everything else is searched as text
+HIT_FINDERS = {".xlsx": xlsx_hits, ".docx": docx_hits, ".pdf": pdf_hits, ".msg": msg_hits, ".eml": eml_hits}
+
+
+def search_any(path, patterns, max_hits=MAX_HITS_PER_FILE, opener=None):
+    """
+    (path, hits, truncated, error) for a file of any supported format; fits
+    search_core.parallel_map(), which also hands over zip members here.
+    """
+    finder = HIT_FINDERS.get(os.path.splitext(path)[1].lower(), text_hits)
+    return finder(path, patterns, max_hits, opener)
+
+
+def _merge_text_hits(path, parts, patterns, max_hits=MAX_HITS_PER_FILE):
+    path, hits, truncated, error = merge_hits(path, parts, patterns, max_hits)
+    return path, [(index, f"line {line_no}", snippet) for index, line_no, snippet in hits], truncated, error
+
+
+def _splittable(path):
+    return is_plain_file(path) and os.path.splitext(path)[1].lower() not in HIT_FINDERS
+
+
+# Huge plain text files are searched in byte ranges by several workers
+TEXT_SPLIT = RangeSplit(find_hits_range, _merge_text_hits, can_split=_splittable)
+
+
+class ResultWriter:
+    """
+    Writes hits as they arrive: "path | location | [pattern] snippet" lines,
+    JSON lines, or CSV rows with RESULT_FIELDS.
+    """
+
+    def __init__(self, fh, fmt="text"):
+        self.fh = fh
+        self.fmt = fmt
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(fh, fieldnames=RESULT_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, path, pattern, location, snippet):
+        if self.fmt == "jsonl":
+            self.fh.write(json.dumps({"path": path, "pattern": pattern, "location": location, "snippet": snippet},
+                                     ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow({"path": path, "pattern": pattern, "location": location, "snippet": snippet})
+        else:
+            self.fh.write(f"{path} | {location} | [{pattern}] {snippet}\n")
+
+    def flush(self):
+        self.fh.flush()
+
+
+def _skip_lock_files(files):
+    # Office "~$name" lock files of open documents are not documents
+    return (f for f in files if not os.path.basename(f[0]).startswith("~$"))
+
+
+def search_roots(roots, patterns, writer, extensions=DEFAULT_EXTENSIONS, recursive=True, max_hits=MAX_HITS_PER_FILE,
+                 max_workers=None, log=print):
+    """
+    Walk all roots once and search every file with the matching hit finder in
+    one worker pool. Returns (files_with_hits, hits, errors).
+    """
+    files_with_hits = total = errors = 0
+
+    def report_error(path, message):
+        nonlocal errors
+        errors += 1
+        log(f"Error processing {path}: {message}")
+
+    def on_result(path, hits, truncated, error):
+        nonlocal files_with_hits, total
+        if error:
+            report_error(path, error)
+        if not hits:
+            return
+        files_with_hits += 1
+        total += len(hits)
+        for index, location, snippet in hits:
+            writer.write(path, patterns.patterns[index], location, snippet)
+        # With max_hits=1 (--files-only) stopping at the first hit is the point, not a cut
+        if truncated and max_hits > 1:
+            log(f"{path}: stopped after {len(hits)} hits")
+        writer.flush()
+
+    def all_files():
+        for root in roots:
+            yield from _skip_lock_files(walk_files(root, extensions, recursive=recursive, on_error=report_error,
+                                                   archives=True))
+
+    parallel_map(all_files(), search_any, (patterns, max_hits), on_result, max_workers, member_extensions=extensions,
+                 split=TEXT_SPLIT)
+    return files_with_hits, total, errors
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Search logs, archives and Office/PDF/mail files in one pass (headless).")
+    parser.add_argument("roots", nargs="+", help="Directories to search.")
+    parser.add_argument("-e", "--text", action="append", default=[], help="String (or regex with --regex) to find; repeatable.")
+    parser.add_argument("--patterns", help="File with one pattern per line ('#' comments allowed).")
+    parser.add_argument("--regex", action="store_true", help="Patterns are regular expressions.")
+    parser.add_argument("--word", action="store_true", help="Match whole words only.")
+    parser.add_argument("--case-sensitive", action="store_true", help="Do not ignore case.")
+    parser.add_argument("--ext", nargs="+", default=list(DEFAULT_EXTENSIONS), help="File extensions to search.")
+    parser.add_argument("--top-only", action="store_true", help="Do not descend into subfolders.")
+    parser.add_argument("--files-only", action="store_true", help="Stop at the first hit in each file.")
+    parser.add_argument("--max-hits", type=int, default=MAX_HITS_PER_FILE, help="Hits reported per file.")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="text", help="Result format.")
+    parser.add_argument("--out", help="Result file (default: standard output).")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    patterns = list(args.text)
+    if args.patterns:
+        try:
+            patterns += load_patterns(args.patterns)
+        except OSError as e:
+            parser.error(f"cannot read --patterns file: {e}")
+    if not patterns:
+        parser.error("give at least one -e TEXT or a --patterns file")
+    try:
+        pattern_set = PatternSet(patterns, regex=args.regex, whole_word=args.word, ignore_case=not args.case_sensitive)
+    except re.error as e:
+        parser.error(f"invalid regular expression: {e}")
+    for root in args.roots:
+        if not os.path.isdir(root):
+            print(f"Not a directory: {root}", file=sys.stderr)
+            return 2
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    t0 = time.perf_counter()
+    extensions = tuple(e if e.startswith(".") else "." + e for e in args.ext)
+    max_hits = 1 if args.files_only else max(1, args.max_hits)
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        found, hits, errors = search_roots(args.roots, pattern_set, ResultWriter(out, args.format), extensions,
+                                           not args.top_only, max_hits, args.workers or None, log)
+    finally:
+        if args.out:
+            out.close()
+    log(f"{hits} hit(s) in {found} file(s), {errors} error(s) in {time.perf_counter() - t0:.1f}s"
+        + (f". Results saved to {args.out}." if args.out else "."))
+    return 0 if found else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Persistent trigram index for repeated Find_InX searches over the same archive.
+
+Files are split into tokens (letters, digits and . : / @ _ -, so IPs and host
+names stay whole), and every distinct 3-byte slice of a token is recorded in a
+SQLite file as a posting list of file ids. A search looks up the trigrams of
+the search string, intersects their posting lists and only scans the remaining
+candidate files (search_core does the confirming scan).
+
+Updates are incremental: only files whose size or mtime changed are re-read.
+Each update appends new posting segments; superseded ids are dropped when the
+segments are compacted. Compressed files and zip archives are not indexed,
+only listed, so every search scans them. A search first updates the index, so
+files added or changed since the last build are found too.
+
+Usage:
+    python search_index.py build ROOT [--index FILE] [--ext .log .txt .cfg]
+    python search_index.py update [--index FILE]
+    python search_index.py search "text" [--index FILE] [--out result.txt]
+"""
+import os
+import re
+import sys
+import time
+import zlib
+import sqlite3
+import argparse
+from array import array
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from search_core import READ_BLOCK, PENDING_PER_WORKER, compile_needle, parallel_search, walk_files, wanted_name
+
+DEFAULT_INDEX = "findinx_index.sqlite"
+DEFAULT_EXTENSIONS = (".log", ".txt", ".cfg")
+INDEX_VERSION = "1"
+# Bytes of the token alphabet (after ASCII lowercasing); non-ASCII bytes keep UTF-8 words whole
+_TOKEN_RE = re.compile(rb"[0-9a-z_.:/@\-\x80-\xff]+")
+# Postings kept in memory before a segment is written
+SEGMENT_POSTINGS = 20_000_000
+# More segments than this are merged into one at the end of an update
+MAX_SEGMENTS = 16
+# Files per worker task while indexing
+INDEX_BATCH = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL);
+CREATE TABLE IF NOT EXISTS postings (gram INTEGER, seg INTEGER, ids BLOB, PRIMARY KEY (gram, seg)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS unindexed (path TEXT PRIMARY KEY, size INTEGER, mtime REAL);
+"""
+
+
+def _token_grams(tokens, grams):
+    for tok in tokens:
+        for i in range(len(tok) - 2):
+            grams.add(tok[i:i + 3])
+
+
+def file_grams(path):
+    """
+    Distinct token trigrams of a file as sorted ints (3 bytes, big-endian).
+    Tokens are turned into trigrams block by block, so memory is bounded by
+    the trigram set (at most 2**24 values), not by the file's distinct tokens.
+    """
+    grams = set()
+    with open(path, "rb", buffering=0) as fh:
+        carry = b""
+        while True:
+            data = fh.read(READ_BLOCK)
+            if not data:
+                break
+            data = carry + data
+            # Keep the last (possibly cut-off) line for the next block
+            cut = data.rfind(b"\n") + 1
+            if not cut and len(data) >= READ_BLOCK:
+                # No newline in sight: take all of it, and start the next block with
+                # its last two bytes again so no trigram across the cut is lost
+                _token_grams(set(_TOKEN_RE.findall(data.lower())), grams)
+                carry = data[-2:]
+                continue
+            _token_grams(set(_TOKEN_RE.findall(data[:cut].lower())), grams)
+            carry = data[cut:]
+        _token_grams(set(_TOKEN_RE.findall(carry.lower())), grams)
+    return sorted(int.from_bytes(g, "big") for g in grams)
+
+
+def query_grams(search_string):
+    """
+    Trigrams every matching file must contain. Trigrams with non-ASCII bytes are
+    left out (their case folding is not byte-wise); an empty list means the index
+    cannot narrow this search down.
+    """
+    data = search_string.encode("utf-8").lower()
+    grams = set()
+    _token_grams(_TOKEN_RE.findall(data), grams)
+    return sorted(int.from_bytes(g, "big") for g in grams if max(g) < 0x80)
+
+
+def _pack(ids):
+    # Sorted ids -> zlib-compressed deltas
+    deltas = array("I", ids[:1])
+    deltas.extend(b - a for a, b in zip(ids, ids[1:]))
+    return zlib.compress(deltas.tobytes(), 1)
+
+
+def _unpack(blob):
+    deltas = array("I")
+    deltas.frombytes(zlib.decompress(blob))
+    return accumulate(deltas)
+
+
+def open_index(index_path):
+    con = sqlite3.connect(index_path)
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _meta(con, key, default=None):
+    row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(con, **values):
+    con.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+
+def index_info(index_path):
+    """(root, extensions) the index covers; root is None for a new/empty index."""
+    con = open_index(index_path)
+    try:
+        stored = _meta(con, "extensions")
+        return _meta(con, "root"), tuple(stored.split()) if stored is not None else DEFAULT_EXTENSIONS
+    finally:
+        con.close()
+
+
+def _index_batch(paths):
+    out = []
+    for path in paths:
+        try:
+            out.append((path, array("I", file_grams(path)).tobytes(), ""))
+        except OSError as e:
+            out.append((path, b"", str(e)))
+    return out
+
+
+def _iter_grams(paths, max_workers):
+    batches = [paths[i:i + INDEX_BATCH] for i in range(0, len(paths), INDEX_BATCH)]
+    if max_workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            yield from _index_batch(batch)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(_index_batch, batch))
+            if len(pending) >= max_workers * PENDING_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield from fut.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield from fut.result()
+
+
+def compact(con):
+    """
+    Merge all posting segments into one, dropping ids of removed/changed files.
+    Postings are merged one trigram at a time into a new table, which then
+    replaces the old one, so only one posting list is in memory at once.
+    """
+    live = {row[0] for row in con.execute("SELECT id FROM files")}
+
+    def merged():
+        gram, ids = None, []
+        for row_gram, blob in con.execute("SELECT gram, ids FROM postings ORDER BY gram, seg"):
+            if row_gram != gram:
+                if ids:
+                    yield gram, _pack(sorted(ids))
+                gram, ids = row_gram, []
+            ids.extend(i for i in _unpack(blob) if i in live)
+        if ids:
+            yield gram, _pack(sorted(ids))
+
+    con.execute("DROP TABLE IF EXISTS postings_merged")
+    con.execute("CREATE TABLE postings_merged (gram INTEGER, seg INTEGER, ids BLOB, PRIMARY KEY (gram, seg)) WITHOUT ROWID")
+    con.executemany("INSERT INTO postings_merged (gram, seg, ids) VALUES (?, 0, ?)", merged())
+    con.execute("DROP TABLE postings")
+    con.execute("ALTER TABLE postings_merged RENAME TO postings")
+    _set_meta(con, next_seg=1)
+    con.commit()
+
+
+def update_index(index_path, root=None, extensions=None, max_workers=None, log=print):
+    """
+    Build or refresh the index: new and changed files are (re)indexed, removed
+    files are dropped. root/extensions are remembered from the first build.
+    Returns (indexed, removed, errors).
+    """
+    con = open_index(index_path)
+    try:
+        root = root or _meta(con, "root")
+        if not root:
+            raise ValueError("No root directory: build the index with a ROOT first")
+        if extensions is None:
+            stored = _meta(con, "extensions")
+            extensions = tuple(stored.split()) if stored is not None else DEFAULT_EXTENSIONS
+        root = os.path.abspath(root)
+        _set_meta(con, root=root, extensions=" ".join(extensions), version=INDEX_VERSION)
+
+        known = {path: (fid, size, mtime) for fid, path, size, mtime in con.execute("SELECT id, path, size, mtime FROM files")}
+        seen = set()
+        todo = []
+        archives = []
+        lower_exts = tuple(e.lower() for e in extensions)
+        for path, size, mtime in walk_files(root, extensions, archives=True):
+            if not wanted_name(os.path.basename(path), lower_exts):
+                archives.append((path, size, mtime))
+                continue
+            seen.add(path)
+            old = known.get(path)
+            if old is None or old[1] != size or old[2] != mtime:
+                todo.append((path, size, mtime))
+        todo_paths = {t[0] for t in todo}
+        removed = sum(1 for p in known if p not in seen)
+        gone = [known[p][0] for p in known if p not in seen or p in todo_paths]
+        con.executemany("DELETE FROM files WHERE id = ?", ((fid,) for fid in gone))
+        con.execute("DELETE FROM unindexed")
+        con.executemany("INSERT INTO unindexed (path, size, mtime) VALUES (?, ?, ?)", archives)
+        con.commit()
+
+        next_id = (con.execute("SELECT MAX(id) FROM files").fetchone()[0] or 0) + 1
+        next_id = max(next_id, int(_meta(con, "next_id", 1)))
+        seg = int(_meta(con, "next_seg", 0))
+        info = {path: (size, mtime) for path, size, mtime in todo}
+        postings = {}
+        pending_files = []
+        count = 0
+        errors = 0
+        started = time.perf_counter()
+
+        def flush():
+            nonlocal postings, pending_files, count, seg
+            con.executemany("INSERT INTO postings (gram, seg, ids) VALUES (?, ?, ?)",
+                            ((gram, seg, _pack(ids)) for gram, ids in postings.items()))
+            con.executemany("INSERT INTO files (id, path, size, mtime) VALUES (?, ?, ?, ?)", pending_files)
+            seg += 1
+            _set_meta(con, next_seg=seg, next_id=next_id)
+            con.commit()
+            postings, pending_files, count = {}, [], 0
+
+        workers = max_workers or os.cpu_count() or 1
+        for n, (path, grams, error) in enumerate(_iter_grams([t[0] for t in todo], workers), 1):
+            if error:
+                errors += 1
+                log(f"Error indexing {path}: {error}")
+                continue
+            fid = next_id
+            next_id += 1
+            ids = array("I")
+            ids.frombytes(grams)
+            for gram in ids:
+                postings.setdefault(gram, []).append(fid)  # ids only grow, so lists stay sorted
+            count += len(ids)
+            pending_files.append((fid, path, *info[path]))
+            if count >= SEGMENT_POSTINGS:
+                flush()
+            if n % 1000 == 0:
+                log(f"Indexed {n}/{len(todo)} file(s)...")
+        if pending_files:
+            flush()
+        _set_meta(con, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+        con.commit()
+        if seg > MAX_SEGMENTS:
+            compact(con)
+        log(f"Index {index_path}: {len(todo) - errors} file(s) indexed, {removed} removed, "
+            f"{errors} error(s) in {time.perf_counter() - started:.1f}s")
+        return len(todo) - errors, removed, errors
+    finally:
+        con.close()
+
+
+def candidate_files(index_path, search_string, directory=None, extensions=None, recursive=True):
+    """
+    Indexed files that may contain search_string, plus the compressed files and
+    zip archives (not indexed), as (path, size, mtime), limited to directory
+    (and its subfolders if recursive) and extensions.
+    """
+    con = open_index(index_path)
+    try:
+        archives = con.execute("SELECT path, size, mtime FROM unindexed").fetchall()
+        grams = query_grams(search_string)
+        ids = None
+        # Rarest trigram first would be ideal; shortest blobs are a cheap proxy
+        lists = []
+        for gram in grams:
+            blobs = [row[0] for row in con.execute("SELECT ids FROM postings WHERE gram = ?", (gram,))]
+            lists.append((sum(len(b) for b in blobs), blobs))
+        for _size, blobs in sorted(lists, key=lambda x: x[0]):
+            found = set()
+            for blob in blobs:
+                found.update(_unpack(blob))
+            ids = found if ids is None else ids & found
+            if not ids:
+                break
+        rows = [] if ids is not None and not ids else con.execute("SELECT id, path, size, mtime FROM files").fetchall()
+    finally:
+        con.close()
+
+    prefix = os.path.join(os.path.abspath(directory), "") if directory else None
+    exts = tuple(e.lower() for e in extensions) if extensions else ()
+    out = []
+    for fid, path, size, mtime in rows + [(None,) + row for row in archives]:
+        if fid is not None and ids is not None and fid not in ids:
+            continue
+        if prefix is not None:
+            if not path.startswith(prefix):
+                continue
+            if not recursive and os.path.dirname(path) != prefix[:-1]:
+                continue
+        if not wanted_name(os.path.basename(path), exts, archives=fid is None):
+            continue
+        out.append((path, size, mtime))
+    return out
+
+
+def indexed_search(index_path, search_string, on_result, directory=None, extensions=None, recursive=True, max_workers=None,
+                   whole_word=False, log=print):
+    """
+    Update the index (only changed files are re-read), shortlist files with it,
+    then confirm with search_core.parallel_search. A directory outside the index
+    root, or extensions the index does not hold, are searched directly instead.
+    Returns the number of candidate files scanned, or None after a direct search.
+    """
+    root, indexed_exts = index_info(index_path)
+    directory_abs = os.path.abspath(directory) if directory else root
+    wanted = tuple(e.lower() for e in extensions) if extensions else None
+    try:
+        covered = directory_abs is not None and (
+            root is None or (os.path.commonpath([root, directory_abs]) == root
+                             and (wanted is None or set(wanted) <= {e.lower() for e in indexed_exts})))
+    except ValueError:
+        covered = False  # different drives
+    pattern, overlap = compile_needle(search_string, whole_word=whole_word)
+    if not covered:
+        if directory_abs is None:
+            raise ValueError("No directory to search: build the index with a ROOT first")
+        log(f"The index covers {root} ({' '.join(indexed_exts)}), not this search; searching the files directly.")
+        extensions = extensions or indexed_exts
+        files = walk_files(directory_abs, extensions, recursive=recursive,
+                           on_error=lambda path, message: on_result(path, False, message), archives=True)
+        parallel_search(files, pattern, overlap, on_result, max_workers, member_extensions=extensions)
+        return None
+    if root is None:
+        update_index(index_path, directory_abs, tuple(extensions) if extensions else None, max_workers, log)
+    else:
+        update_index(index_path, max_workers=max_workers, log=log)
+    candidates = candidate_files(index_path, search_string, directory, extensions, recursive)
+    parallel_search(candidates, pattern, overlap, on_result, max_workers,
+                    member_extensions=extensions or index_info(index_path)[1])
+    return len(candidates)
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Build, update or query the Find_InX trigram index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="Create or refresh the index for ROOT.")
+    p_build.add_argument("root")
+    p_build.add_argument("--ext", nargs="+", default=list(DEFAULT_EXTENSIONS), help="File extensions to index.")
+    p_update = sub.add_parser("update", help="Re-index files changed since the last build/update.")
+    p_search = sub.add_parser("search", help="Search using the index.")
+    p_search.add_argument("text")
+    p_search.add_argument("--dir", help="Only files under this directory.")
+    p_search.add_argument("--out", default="result.txt", help="Result file (default: result.txt).")
+    for p in (p_build, p_update, p_search):
+        p.add_argument("--index", default=DEFAULT_INDEX, help=f"Index file (default: {DEFAULT_INDEX}).")
+        p.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "update"):
+        try:
+            root = args.root if args.command == "build" else None
+            exts = tuple(args.ext) if args.command == "build" else None
+            update_index(args.index, root, exts, args.workers or None)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"Index not found: {args.index} (run 'build' first)", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    found = []
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(f"Files containing the string '{args.text}':\n\n")
+
+        def on_result(path, matched, error):
+            if error:
+                print(f"Error processing {path}: {error}")
+            elif matched:
+                found.append(path)
+                f.write(path + "\n")
+                f.flush()
+
+        try:
+            scanned = indexed_search(args.index, args.text, on_result, args.dir, None, True, args.workers or None)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    scanned = f"{scanned} candidate(s) scanned" if scanned is not None else "searched without the index"
+    print(f"{len(found)} file(s) found, {scanned} in {time.perf_counter() - t0:.2f}s. Results saved to {args.out}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Persistent cell index for repeated Find_InExcel searches over the same report archive.
+
+For every workbook the index keeps its size and mtime and, per sheet, the
+distinct cell values with the cells that hold them. An update only re-reads
+workbooks whose size or mtime changed (in parallel, see search_core), so a
+search for a host name is a query over the stored values instead of a pass
+over every workbook.
+
+Usage:
+    python xlsx_index.py build ROOT [--index FILE]
+    python xlsx_index.py update [--index FILE]
+    python xlsx_index.py search "text" [--index FILE] [--dir DIR] [--out result.txt]
+"""
+import os
+import sys
+import time
+import sqlite3
+import zipfile
+import argparse
+
+from search_core import parallel_map, walk_files
+from xlsx_search import WORKBOOK_ERRORS, XmlNeedle, iter_cells, value_snippet
+
+DEFAULT_INDEX = "findinx_cells.sqlite"
+INDEX_VERSION = "1"
+# Cell references kept per distinct value and sheet
+MAX_REFS = 20
+# Workbooks written to the index per transaction
+COMMIT_FILES = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL);
+CREATE TABLE IF NOT EXISTS cells (file_id INTEGER, sheet TEXT, value TEXT, refs TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS cells_file ON cells (file_id);
+"""
+
+
+def open_index(index_path):
+    con = sqlite3.connect(index_path)
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _meta(con, key, default=None):
+    row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(con, **values):
+    con.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+
+def index_root(index_path):
+    """The directory the index covers, or None for a new/empty index."""
+    con = open_index(index_path)
+    try:
+        return _meta(con, "root")
+    finally:
+        con.close()
+
+
+def workbook_values(path, opener=None):
+    """
+    (path, rows, error) with rows = [(sheet, value, refs, count)], one per distinct
+    value and sheet; fits search_core.parallel_map().
+    """
+    try:
+        with zipfile.ZipFile(opener() if opener else path) as zf:
+            values = {}
+            for sheet, ref, value in iter_cells(zf):
+                refs = values.setdefault((sheet, value), [])
+                refs.append(ref)
+    except (WORKBOOK_ERRORS + (IndexError,)) as e:
+        return path, [], str(e)
+    return path, [(sheet, value, ",".join(refs[:MAX_REFS]), len(refs)) for (sheet, value), refs in values.items()], ""
+
+
+def _skip_lock_files(files):
+    # Excel's "~$name.xlsx" lock files of open workbooks are not workbooks
+    return (f for f in files if not os.path.basename(f[0]).startswith("~$"))
+
+
+def update_index(index_path, root=None, max_workers=None, log=print):
+    """
+    Build or refresh the index: new and changed workbooks are (re)read, removed
+    ones are dropped. root is remembered from the first build.
+    Returns (indexed, removed, errors).
+    """
+    con = open_index(index_path)
+    try:
+        root = root or _meta(con, "root")
+        if not root:
+            raise ValueError("No root directory: build the index with a ROOT first")
+        root = os.path.abspath(root)
+        _set_meta(con, root=root, version=INDEX_VERSION)
+
+        known = {path: (fid, size, mtime) for fid, path, size, mtime in con.execute("SELECT id, path, size, mtime FROM files")}
+        seen = set()
+        todo = []
+        for path, size, mtime in _skip_lock_files(walk_files(root, (".xlsx",))):
+            seen.add(path)
+            old = known.get(path)
+            if old is None or old[1] != size or old[2] != mtime:
+                todo.append((path, size, mtime))
+        todo_paths = {t[0] for t in todo}
+        removed = sum(1 for p in known if p not in seen)
+        gone = [(known[p][0],) for p in known if p not in seen or p in todo_paths]
+        con.executemany("DELETE FROM cells WHERE file_id = ?", gone)
+        con.executemany("DELETE FROM files WHERE id = ?", gone)
+        con.commit()
+
+        info = {path: (size, mtime) for path, size, mtime in todo}
+        done = 0
+        errors = 0
+        started = time.perf_counter()
+
+        def on_result(path, rows, error):
+            nonlocal done, errors
+            done += 1
+            if error:
+                errors += 1
+                log(f"Error indexing {path}: {error}")
+                return
+            fid = con.execute("INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)", (path, *info[path])).lastrowid
+            con.executemany("INSERT INTO cells (file_id, sheet, value, refs, count) VALUES (?, ?, ?, ?, ?)",
+                            ((fid, *row) for row in rows))
+            if done % COMMIT_FILES == 0:
+                con.commit()
+                log(f"Indexed {done}/{len(todo)} workbook(s)...")
+
+        # Errors are not recorded in files, so a broken workbook is retried on the next update
+        parallel_map(todo, workbook_values, (), on_result, max_workers)
+        _set_meta(con, updated=time.strftime("%Y-%m-%d %H:%M:%S"))
+        con.commit()
+        log(f"Index {index_path}: {len(todo) - errors} workbook(s) indexed, {removed} removed, "
+            f"{errors} error(s) in {time.perf_counter() - started:.1f}s")
+        return len(todo) - errors, removed, errors
+    finally:
+        con.close()
+
+
+def search_cells(index_path, search_string, directory=None, recursive=True):
+    """
+    Matching cells as [(path, sheet, refs, count, value_snippet)], sorted by path,
+    limited to directory (and its subfolders if recursive). Case-insensitive.
+    """
+    needle = XmlNeedle(search_string)
+    con = open_index(index_path)
+    try:
+        if search_string.isascii():
+            # LIKE folds ASCII case in SQLite itself
+            escaped = search_string.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            rows = con.execute("SELECT f.path, c.sheet, c.refs, c.count, c.value FROM cells c JOIN files f ON f.id = c.file_id "
+                               "WHERE c.value LIKE ? ESCAPE '\\'", (f"%{escaped}%",)).fetchall()
+        else:
+            con.create_function("matches", 1, lambda value: needle.text.search(value) is not None, deterministic=True)
+            rows = con.execute("SELECT f.path, c.sheet, c.refs, c.count, c.value FROM cells c JOIN files f ON f.id = c.file_id "
+                               "WHERE matches(c.value)").fetchall()
+    finally:
+        con.close()
+
+    prefix = os.path.join(os.path.abspath(directory), "") if directory else None
+    out = []
+    for path, sheet, refs, count, value in rows:
+        if prefix is not None:
+            if not path.startswith(prefix):
+                continue
+            if not recursive and os.path.dirname(path) != prefix[:-1]:
+                continue
+        out.append((path, sheet, refs, count, value_snippet(value, needle)))
+    out.sort(key=lambda r: r[0])
+    return out
+
+
+def format_refs(refs, count):
+    """'A1,B7' or 'A1,B7,... (25 cells)' when not all references were kept."""
+    return refs if count <= MAX_REFS else f"{refs},... ({count} cells)"
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Build, update or query the Find_InExcel cell index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="Create or refresh the index for ROOT.")
+    p_build.add_argument("root")
+    p_update = sub.add_parser("update", help="Re-read workbooks changed since the last build/update.")
+    p_search = sub.add_parser("search", help="Search using the index.")
+    p_search.add_argument("text")
+    p_search.add_argument("--dir", help="Only workbooks under this directory.")
+    p_search.add_argument("--out", default="result.txt", help="Result file (default: result.txt).")
+    for p in (p_build, p_update, p_search):
+        p.add_argument("--index", default=DEFAULT_INDEX, help=f"Index file (default: {DEFAULT_INDEX}).")
+    for p in (p_build, p_update):
+        p.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "update"):
+        try:
+            update_index(args.index, args.root if args.command == "build" else None, args.workers or None)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"Index not found: {args.index} (run 'build' first)", file=sys.stderr)
+        return 2
+    t0 = time.perf_counter()
+    hits = search_cells(args.index, args.text, args.dir)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(f"Cells containing the string '{args.text}':\n\n")
+        for path, sheet, refs, count, snippet in hits:
+            f.write(f"{path} | {sheet}!{format_refs(refs, count)} | {snippet}\n")
+    print(f"{len(hits)} cell value(s) in {len({h[0] for h in hits})} workbook(s) found in "
+          f"{time.perf_counter() - t0:.2f}s. Results saved to {args.out}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Fast .xlsx search for Find_InExcel: a workbook is read as the zip of XML parts it
+is, without building an openpyxl Cell for every cell.
+
+xl/sharedStrings.xml (where Excel keeps each distinct text once) and the sheet
+XML are scanned in large blocks with a regex for the search string as it is
+written in XML (entities included). Only a raw hit is parsed: a hit in the
+shared strings becomes a string index, and the sheets are then searched for
+cells using one of those indices; a hit inside a sheet is checked against the
+value of the enclosing cell, so tag names, cell references and formulas never
+match.
+
+Values are compared as stored: numbers and dates are the raw numbers in the XML
+(what data_only=True loads before openpyxl converts dates).
+"""
+import re
+import posixpath
+from bisect import bisect_right
+import zipfile
+import xml.etree.ElementTree as ET
+from html import unescape
+
+from search_core import CONTEXT_CHARS, MAX_HITS_PER_FILE, STREAM_ERRORS, iter_xml_blocks
+
+SHARED_STRINGS = "xl/sharedStrings.xml"
+WORKBOOK = "xl/workbook.xml"
+WORKBOOK_RELS = "xl/_rels/workbook.xml.rels"
+WORKSHEET_PREFIX = "xl/worksheets/"
+# Above this many matching shared strings, string cells are checked one by one instead of by one regex
+MAX_INDEX_ALTERNATION = 500
+# What a damaged workbook can raise besides the stream errors
+WORKBOOK_ERRORS = STREAM_ERRORS + (KeyError, ValueError, ET.ParseError)
+
+# How a character of the search string may appear in XML text
+_XML_FORMS = {"&": "&amp;", "<": "&lt;", ">": "(?:>|&gt;)", '"': '(?:"|&quot;)', "'": "(?:'|&apos;)"}
+
+# Element names may carry a namespace prefix (<x:c> instead of <c>)
+_NS = r"(?:[\w.-]+:)?"
+_T_TEXT = rf"<{_NS}t(?:\s[^>]*)?>([^<]*)</{_NS}t>"
+_PHONETIC = rf"<{_NS}rPh[\s>].*?</{_NS}rPh>"
+_RICH_SI = rf"<{_NS}si>\s*<{_NS}r>.*?</{_NS}si>"
+_RUN = rf"<{_NS}r>"
+_CELL = rf"<{_NS}c(?=[\s>])([^>]*)(?<!/)>(.*?)</{_NS}c>"  # not an empty <c .../>
+_CELL_START = rf"<{_NS}c[\s>]"
+_CELL_END = rf"</{_NS}c>"
+_REF = r'\br="([A-Z]+[0-9]+)"'
+_TYPE = r'\bt="(\w+)"'
+_VALUE = rf"<{_NS}v>([^<]*)</{_NS}v>"
+_SHARED_CELL = rf'<{_NS}c(?=\s)([^>]*?\bt="s"[^>]*)><{_NS}v>({{}})</{_NS}v>'
+_SI = rf"<{_NS}si>(.*?)</{_NS}si>|<{_NS}si/>"
+_SI_START = rf"<{_NS}si[\s/>]"
+_SI_END = rf"</{_NS}si>"
+
+# Needle-independent forms for reading every cell (iter_cells)
+_T_TEXT_RE = re.compile(_T_TEXT.encode())
+_PHONETIC_RE = re.compile(_PHONETIC.encode(), re.DOTALL)
+_SI_RE = re.compile(_SI.encode(), re.DOTALL)
+_CELL_RE = re.compile(_CELL.encode(), re.DOTALL)
+_REF_RE = re.compile(_REF.encode())
+_TYPE_RE = re.compile(_TYPE.encode())
+_VALUE_RE = re.compile(_VALUE.encode())
+_SI_END_RE = re.compile(_SI_END.encode())
+_CELL_END_RE = re.compile(_CELL_END.encode())
+
+
+class XmlNeedle:
+    """
+    A search string compiled for raw XML blocks and for unescaped cell text. Like
+    search_core.compile_needle(), ASCII strings work on bytes and others on
+    UTF-8 decoded text. Picklable, so it can be sent to worker processes.
+    """
+
+    def __init__(self, search_string, ignore_case=True):
+        self.flags = re.IGNORECASE if ignore_case else 0
+        self.text_mode = not search_string.isascii()
+        self.text = re.compile(re.escape(search_string), self.flags)
+        self.raw = self._compile("".join(_XML_FORMS.get(ch) or re.escape(ch) for ch in search_string), self.flags)
+        self.t_text = self._compile(_T_TEXT)
+        self.phonetic = self._compile(_PHONETIC, re.DOTALL)
+        self.rich_si = self._compile(_RICH_SI, re.DOTALL)
+        self.cell = self._compile(_CELL, re.DOTALL)
+        self.ref = self._compile(_REF)
+        self.type = self._compile(_TYPE)
+        self.value = self._compile(_VALUE)
+        self.any_shared_cell = self._compile(_SHARED_CELL.format(r"\d+"))
+        self.run = self._compile(_RUN)
+        self.si_start = self._compile(_SI_START)
+        self.si_end = self._compile(_SI_END)
+        self.cell_start = self._compile(_CELL_START)
+        self.cell_end = self._compile(_CELL_END)
+
+    def encode(self, text):
+        return text if self.text_mode else text.encode("ascii")
+
+    def decode(self, data):
+        return data if self.text_mode else data.decode("utf-8", errors="replace")
+
+    def _compile(self, source, flags=0):
+        return re.compile(self.encode(source), flags)
+
+    def shared_cell(self, indices):
+        """Regex for string cells that use one of the given shared-string indices."""
+        if len(indices) > MAX_INDEX_ALTERNATION:
+            return None
+        return self._compile(_SHARED_CELL.format("|".join(str(i) for i in sorted(indices))))
+
+
+def _iter_blocks(fh, end_tag, text_mode):
+    """
+    search_core.iter_xml_blocks(), decoded to text for text_mode needles.
+    """
+    for block in iter_xml_blocks(fh, end_tag):
+        yield block.decode("utf-8", errors="replace") if text_mode else block
+
+
+def _si_text(needle, block, start, end):
+    inner = needle.phonetic.sub(needle.encode(""), block[start:end])
+    return unescape(needle.decode(needle.encode("").join(needle.t_text.findall(inner))))
+
+
+def shared_string_hits(zf, needle):
+    """
+    {index: text} of the shared strings containing the search string.
+    """
+    hits = {}
+    try:
+        fh = zf.open(SHARED_STRINGS)
+    except KeyError:
+        return hits  # no text cells, or all text stored inline
+    base = 0
+    with fh:
+        for block in _iter_blocks(fh, _SI_END_RE, needle.text_mode):
+            candidates = [m.start() for m in needle.raw.finditer(block)]
+            if needle.run.search(block):
+                # Rich text splits a string into runs, which the raw scan cannot see across
+                candidates.extend(m.start() for m in needle.rich_si.finditer(block))
+            starts = [m.start() for m in needle.si_start.finditer(block)]
+            for pos in sorted(candidates):
+                count = bisect_right(starts, pos)
+                if not count:
+                    continue  # e.g. a hit in the <sst> attributes
+                index = base + count - 1
+                if index in hits:
+                    continue
+                end = needle.si_end.search(block, pos)
+                text = _si_text(needle, block, starts[count - 1], end.start() if end else len(block))
+                if needle.text.search(text):
+                    hits[index] = text
+            base += len(starts)
+    return hits
+
+
+def _cell_hit(needle, block, pos):
+    """
+    (start, ref, value) of the cell around a raw hit at pos whose own value
+    matches, or None (hit in a tag, a cell reference, a formula, a shared string index).
+    """
+    lt, start = needle.encode("<"), pos
+    while True:
+        # Back to the tag opening the cell; reaching the end of another cell first means no cell
+        start = block.rfind(lt, 0, start)
+        if start < 0 or needle.cell_end.match(block, start):
+            return None
+        if needle.cell_start.match(block, start):
+            break
+    end = needle.cell_end.search(block, pos)
+    if not end:
+        return None
+    m = needle.cell.match(block, start, end.end())
+    if not m:
+        return None
+    attrs, inner = m.groups()
+    kind = needle.type.search(attrs)
+    kind = needle.decode(kind.group(1)) if kind else "n"
+    if kind == "s":
+        return None
+    if kind == "inlineStr":
+        value = needle.encode("").join(needle.t_text.findall(needle.phonetic.sub(needle.encode(""), inner)))
+    else:
+        v = needle.value.search(inner)
+        if not v:
+            return None
+        value = v.group(1)
+    value = unescape(needle.decode(value))
+    if not needle.text.search(value):
+        return None
+    ref = needle.ref.search(attrs)
+    return start, needle.decode(ref.group(1)) if ref else "", value
+
+
+def scan_sheet(fh, needle, shared, max_hits=None):
+    """
+    [(cell_ref, value)] of the matching cells of one worksheet stream, in sheet
+    order. shared is the result of shared_string_hits().
+    """
+    shared_re = needle.shared_cell(shared) if shared else None
+    hits = []
+    for block in _iter_blocks(fh, _CELL_END_RE, needle.text_mode):
+        found = {}
+        if shared:
+            for m in (shared_re or needle.any_shared_cell).finditer(block):
+                index = int(m.group(2))
+                if index in shared:
+                    ref = needle.ref.search(m.group(1))
+                    found[m.start()] = (needle.decode(ref.group(1)) if ref else "", shared[index])
+        for m in needle.raw.finditer(block):
+            hit = _cell_hit(needle, block, m.start())
+            if hit:
+                found[hit[0]] = hit[1:]
+        for pos in sorted(found):
+            hits.append(found[pos])
+            if max_hits and len(hits) >= max_hits:
+                return hits
+    return hits
+
+
+def sheet_parts(zf):
+    """
+    [(sheet_name, part_name)] of the worksheets in workbook order. Falls back to
+    the worksheet parts by file name when the workbook part cannot be read.
+    """
+    names = set(zf.namelist())
+    fallback = [(posixpath.splitext(posixpath.basename(n))[0], n) for n in sorted(names)
+                if n.startswith(WORKSHEET_PREFIX) and n.endswith(".xml") and "/_rels/" not in n]
+    try:
+        workbook = ET.fromstring(zf.read(WORKBOOK))
+        rels = ET.fromstring(zf.read(WORKBOOK_RELS))
+    except (KeyError, ET.ParseError):
+        return fallback
+    targets = {rel.get("Id"): rel.get("Target", "") for rel in rels}
+    parts = []
+    for sheet in workbook.iter():
+        if not sheet.tag.endswith("}sheet"):
+            continue
+        rid = next((v for k, v in sheet.attrib.items() if k.endswith("}id")), None)
+        target = targets.get(rid)
+        if not target:
+            continue
+        part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        if part in names:
+            parts.append((sheet.get("name", ""), part))
+    return parts or fallback
+
+
+def workbook_hits(zf, needle, max_hits=None):
+    """
+    [(sheet_name, cell_ref, value)] of the matching cells of an open workbook zip.
+    """
+    shared = shared_string_hits(zf, needle)
+    hits = []
+    for name, part in sheet_parts(zf):
+        with zf.open(part) as fh:
+            for ref, value in scan_sheet(fh, needle, shared, max_hits and max_hits - len(hits)):
+                hits.append((name, ref, value))
+        if max_hits and len(hits) >= max_hits:
+            break
+    return hits
+
+
+def value_snippet(value, needle):
+    """
+    A cell value cut to about CONTEXT_CHARS characters either side of the first
+    match, on one line.
+    """
+    value = " ".join(value.split())
+    if len(value) <= 2 * CONTEXT_CHARS:
+        return value
+    m = needle.text.search(value)
+    lo = max(0, m.start() - CONTEXT_CHARS) if m else 0
+    hi = min(len(value), lo + 2 * CONTEXT_CHARS)
+    return ("..." if lo else "") + value[lo:hi] + ("..." if hi < len(value) else "")
+
+
+def find_cells(path, needle, max_hits=MAX_HITS_PER_FILE, opener=None):
+    """
+    (path, hits, truncated, error) for one workbook, hits being
+    [(sheet_name, cell_ref, value_snippet)]; fits search_core.parallel_map().
+    """
+    try:
+        with zipfile.ZipFile(opener() if opener else path) as zf:
+            hits = workbook_hits(zf, needle, max_hits + 1)
+    except WORKBOOK_ERRORS as e:
+        return path, [], False, str(e)
+    truncated = len(hits) > max_hits
+    return path, [(sheet, ref, value_snippet(value, needle)) for sheet, ref, value in hits[:max_hits]], truncated, ""
+
+
+def shared_strings(zf):
+    """
+    All shared strings of a workbook, in index order.
+    """
+    strings = []
+    try:
+        fh = zf.open(SHARED_STRINGS)
+    except KeyError:
+        return strings
+    with fh:
+        for block in iter_xml_blocks(fh, _SI_END_RE):
+            for m in _SI_RE.finditer(block):
+                inner = _PHONETIC_RE.sub(b"", m.group(1) or b"")
+                strings.append(unescape(b"".join(_T_TEXT_RE.findall(inner)).decode("utf-8", errors="replace")))
+    return strings
+
+
+def iter_cells(zf):
+    """
+    Yield (sheet_name, cell_ref, value) for every cell with a value, values as
+    stored (see the module docstring). This reads everything; searches should
+    use workbook_hits().
+    """
+    strings = shared_strings(zf)
+    for name, part in sheet_parts(zf):
+        with zf.open(part) as fh:
+            for block in iter_xml_blocks(fh, _CELL_END_RE):
+                for m in _CELL_RE.finditer(block):
+                    attrs, inner = m.groups()
+                    kind = _TYPE_RE.search(attrs)
+                    kind = kind.group(1) if kind else b"n"
+                    if kind == b"inlineStr":
+                        value = unescape(b"".join(_T_TEXT_RE.findall(_PHONETIC_RE.sub(b"", inner))).decode("utf-8", errors="replace"))
+                    else:
+                        v = _VALUE_RE.search(inner)
+                        if not v:
+                            continue
+                        value = v.group(1).decode("utf-8", errors="replace")
+                        value = strings[int(value)] if kind == b"s" else unescape(value)
+                    if value:
+                        ref = _REF_RE.search(attrs)
+                        yield name, ref.group(1).decode("ascii") if ref else "", value
+
+
+def search_xlsx(path, needle, opener=None):
+    """
+    (path, found, error) for one workbook; fits search_core.parallel_map().
+    """
+    try:
+        with zipfile.ZipFile(opener() if opener else path) as zf:
+            return path, bool(workbook_hits(zf, needle, max_hits=1)), ""
+    except WORKBOOK_ERRORS as e:
+        return path, False, str(e)
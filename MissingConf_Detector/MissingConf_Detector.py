@@ -1,5 +1,5 @@
 import os
-import shutil
+from conf_audit import Rule, RuleSet, run_audit
 
 # Path to the folder containing the configuration files
 folder_path = 'C:/Users/engkufizz/Desktop/MissingConf_Detector/Input'
@@ -10,19 +10,13 @@ output_folder_path = 'C:/Users/engkufizz/Desktop/MissingConf_Detector/Output'
 # Configuration string to look for in the files
 config_string = 'ip ip-prefix XXX_IP_Filter index XXX permit 172.X.X.X 27 greater-equal 27 less-equal 32'
 
-# Loop through all files and subfolders in the folder
-for root, dirs, files in os.walk(folder_path):
-  # Loop through all files in the current directory
-  for filename in files:
-    # Check if the file has the '.txt' extension
-    if filename.endswith('.txt'):
-      # Construct the full path to the file
-      file_path = os.path.join(root, filename)
-      # Open the file
-      with open(file_path, encoding='utf-8') as f:
-        # Read the contents of the file
-        file_contents = f.read()
-        # Check if the configuration string is in the file
-        if config_string not in file_contents:
-          # If not, copy the file to the output folder
-          shutil.copy(file_path, output_folder_path)
+# Hard-link the files with missing configuration into the output folder instead of copying them
+use_hardlinks = False
+
+if __name__ == '__main__':
+  # Check every .txt file under the input folder (on all cores), write the audit
+  # report and collect the files missing the configuration into the output folder
+  os.makedirs(output_folder_path, exist_ok=True)
+  run_audit(folder_path, RuleSet([Rule('require', config_string)]),
+            report_path=os.path.join(output_folder_path, 'audit.csv'),
+            collect_dir=output_folder_path, link=use_hardlinks)
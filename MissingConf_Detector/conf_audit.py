@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Config-compliance audit for MissingConf_Detector / FindConf_Detector style checks.
+
+Every config file under a directory is checked against a list of rules in one
+pass and the result is written as a matrix report (one row per file, one
+column per rule):
+
+- require: the file must contain the pattern (MissingConf_Detector)
+- forbid:  the file must not contain the pattern
+- find:    informational, reports where the pattern occurs (FindConf_Detector)
+
+A rule can be scoped to config blocks (see vrp_config.py): "[interface
+GigabitEthernet] require: undo shutdown" checks the body of every block whose
+header starts with a match of the scope regex, and reports the blocks that
+miss it (or, for forbid/find, contain it). A file without such a block passes.
+Blocks are looked up once per scope and file, only when there are scoped rules.
+
+The encoding is guessed from the first bytes of a file instead of running
+chardet over all of it, and ASCII rules are matched on the raw bytes, so most
+files are never decoded. The rules are combined into a few regexes (one per
+leading character, literals as a trie) that scan the file side by side; where
+the earliest stops, the rules still open are tried at that position only, and
+found rules that keep matching are dropped from the scan.
+^ and $ anchor at line starts and ends (also before \r\n). Files are spread over a process pool.
+
+Files that fail a rule or hit a find rule can be collected into a folder as
+hard links (copies where linking is not possible) or copies.
+
+Rules file, one rule per line ("re" marks a regular expression, [...] a scope):
+    require: ip ip-prefix XXX_IP_Filter index 10 permit 172.16.0.0 27
+    require re: acl\\s+\\S+\\s+inbound
+    forbid: undo info-center enable
+    find: sysname BWLSWSHTI001
+    [interface GigabitEthernet] require: undo shutdown
+    [interface Vlanif\\d+] forbid re: ip address 10\\.
+
+Usage:
+    python conf_audit.py Input --rules rules.txt [--report audit.csv] [--collect Output [--link]]
+    python conf_audit.py Input --require "acl XXXX inbound" --collect Output
+    python conf_audit.py Input --in "interface Eth-Trunk" --require "mode lacp-static"
+"""
+import os
+import re
+import csv
+import sys
+import time
+import codecs
+import shutil
+import argparse
+from functools import lru_cache
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from vrp_config import crlf_safe, find_blocks
+
+# Bytes used to guess the encoding
+SNIFF_BYTES = 64 * 1024
+# Used when the prefix is neither UTF-8 nor recognised by chardet
+FALLBACK_ENCODING = "ISO-8859-1"
+DEFAULT_EXTENSIONS = (".txt",)
+DEFAULT_REPORT = "audit.csv"
+RULE_KINDS = ("require", "forbid", "find")
+# Below this many files the audit runs in-process
+PARALLEL_MIN_FILES = 8
+# Stops on already-found rules before the scan is rebuilt without them
+STALE_HITS = 32
+# Offending blocks listed per cell of a scoped rule
+MAX_LISTED_BLOCKS = 5
+# Files handed to a worker at a time (per worker: about this many chunks in total)
+CHUNKS_PER_WORKER = 8
+
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),  # before UTF-16 LE, which shares its first two bytes
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+_RULE_LINE = re.compile(r"(?:\[(.+)\]\s+)?(require|forbid|find)(\s+re)?\s*:\s?(.*)$")
+
+# scope: regex for the headers of the blocks the rule applies to, None for the whole file
+Rule = namedtuple("Rule", "kind pattern regex scope")
+Rule.__new__.__defaults__ = (False, None)
+
+
+def rule_label(rule):
+    """Column header of a rule, in rules-file syntax: '[interface X] require re: acl\\s+...'."""
+    scope = f"[{rule.scope}] " if rule.scope else ""
+    return f"{scope}{rule.kind}{' re' if rule.regex else ''}: {rule.pattern}"
+
+
+def load_rules(path):
+    """Rules from a rules file; blank lines and lines starting with '#' are skipped."""
+    rules = []
+    with open(path, encoding="utf-8-sig") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            m = _RULE_LINE.match(line.strip())
+            if not m or not m.group(4):
+                raise ValueError(f"{path}:{number}: expected '[scope] require|forbid|find [re]: pattern', got {line!r}")
+            rules.append(Rule(m.group(2), m.group(4), bool(m.group(3)), m.group(1)))
+    return rules
+
+
+def detect_encoding(prefix, guess_legacy=True):
+    """
+    (encoding, bom_length) for the first bytes of a file: BOM, BOM-less UTF-16,
+    UTF-8, then chardet on the prefix only (if installed and guess_legacy) and
+    finally FALLBACK_ENCODING.
+    """
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding, len(bom)
+    # BOM-less UTF-16 (some exports): ASCII text leaves every other byte NUL
+    sample = prefix[:4096]
+    if len(sample) >= 4:
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_nuls > half * 0.4 and even_nuls < half * 0.05:
+            return "utf-16-le", 0
+        if even_nuls > half * 0.4 and odd_nuls < half * 0.05:
+            return "utf-16-be", 0
+    try:
+        prefix.decode("utf-8")
+        return "utf-8", 0
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the end of the prefix is still UTF-8
+        # (a shorter prefix is the whole file, so nothing was cut off)
+        if len(prefix) >= SNIFF_BYTES and e.start >= len(prefix) - 3 and e.reason == "unexpected end of data":
+            return "utf-8", 0
+    if guess_legacy:
+        try:
+            import chardet
+        except ImportError:
+            chardet = None
+        if chardet is not None:
+            encoding = chardet.detect(prefix)["encoding"]
+            if encoding:
+                try:
+                    return codecs.lookup(encoding).name, 0
+                except LookupError:
+                    pass
+    return FALLBACK_ENCODING, 0
+
+
+def _ascii_compatible(encoding):
+    return not codecs.lookup(encoding).name.startswith(("utf-16", "utf-32"))
+
+
+class RuleSet:
+    """
+    Compiled rules. ASCII rules are also compiled for bytes, so ASCII-compatible
+    files (UTF-8, Latin-1, cp125x, ...) are checked without decoding.
+    """
+
+    def __init__(self, rules, ignore_case=False):
+        self.rules = list(rules)
+        if not self.rules:
+            raise ValueError("No rules given")
+        for rule in self.rules:
+            if rule.kind not in RULE_KINDS:
+                raise ValueError(f"Unknown rule kind {rule.kind!r} (expected one of {', '.join(RULE_KINDS)})")
+        self.flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self.sources = tuple(crlf_safe(r.pattern) if r.regex else re.escape(r.pattern) for r in self.rules)
+        self.text = [re.compile(s, self.flags) for s in self.sources]
+        # Whole-file rules and scoped ones (a bad scope regex raises re.error here)
+        self.flat = tuple(i for i, r in enumerate(self.rules) if not r.scope)
+        self.scoped = tuple(i for i, r in enumerate(self.rules) if r.scope)
+        for i in self.scoped:
+            re.compile(self.rules[i].scope)
+        self.byte_mode = all(s.isascii() for s in self.sources) and all(self.rules[i].scope.isascii() for i in self.scoped)
+        self.binary = [re.compile(s.encode("ascii"), self.flags) for s in self.sources] if self.byte_mode else None
+
+    def __getstate__(self):
+        # Compiled patterns are rebuilt in the workers
+        return {"rules": self.rules, "ignore_case": bool(self.flags & re.IGNORECASE)}
+
+    def __setstate__(self, state):
+        self.__init__(state["rules"], state["ignore_case"])
+
+    def check(self, data):
+        """
+        Result of every rule for data (bytes in byte mode, else str): for a
+        whole-file rule the line of its first match (0: none), for a scoped rule
+        (blocks_checked, flagged), flagged being [(line, header)] of the blocks
+        missing a required pattern or holding a forbid/find match (its line).
+        """
+        results = self.first_hits(data)
+        if not self.scoped:
+            return results
+        binary = isinstance(data, bytes)
+        regexes = self.binary if binary else self.text
+        newline = b"\n" if binary else "\n"
+        # Blocks are looked up once per scope, however many rules share it
+        blocks_by_scope = {}
+        for i in self.scoped:
+            scope = self.rules[i].scope
+            if scope not in blocks_by_scope:
+                blocks_by_scope[scope] = find_blocks(data, scope, self.flags & re.IGNORECASE)
+            blocks = blocks_by_scope[scope]
+            flagged = []
+            for line, header, body, end in blocks:
+                hit = regexes[i].search(data, body, end)
+                if binary:
+                    header = header.decode("ascii", errors="replace")
+                if self.rules[i].kind == "require":
+                    if not hit:
+                        flagged.append((line, header))
+                elif hit:
+                    flagged.append((line + 1 + data.count(newline, body, hit.start()), header))
+            results[i] = (len(blocks), flagged)
+        return results
+
+    def first_hits(self, data):
+        """
+        1-based line of the first match of every whole-file rule in data,
+        0 where a rule does not match (and for scoped rules).
+        """
+        binary = isinstance(data, bytes)
+        regexes = self.binary if binary else self.text
+        newline = b"\n" if binary else "\n"
+        offsets = [None] * len(regexes)
+        missing = self.flat
+        if not missing:
+            return [0] * len(regexes)
+        streams = self._streams(missing, binary)
+        if streams is None:
+            # Patterns that cannot be combined (inline flags, backreferences): one search each
+            for i in missing:
+                m = regexes[i].search(data)
+                if m:
+                    offsets[i] = m.start()
+            return _line_numbers(data, offsets, newline)
+        # Next match start of every stream at or after pos (len(data) + 1: none left)
+        ahead = [-1] * len(streams)
+        # Matches of already-found rules stopped on; after STALE_HITS of them the
+        # streams are rebuilt from the open rules only
+        stale = 0
+        pos = 0
+        while missing:
+            for k, stream in enumerate(streams):
+                if ahead[k] < pos:
+                    m = stream.search(data, pos)
+                    ahead[k] = m.start() if m else len(data) + 1
+            at = min(ahead)
+            if at > len(data):
+                break
+            # The earliest position any open rule matches at: see which ones do
+            still = []
+            for i in missing:
+                if regexes[i].match(data, at):
+                    offsets[i] = at
+                else:
+                    still.append(i)
+            if len(still) == len(missing):
+                stale += 1
+                if stale >= STALE_HITS and still:
+                    streams = self._streams(still, binary)
+                    ahead = [-1] * len(streams)
+                    stale = 0
+            missing = tuple(still)
+            pos = at + 1
+        return _line_numbers(data, offsets, newline)
+
+    def _streams(self, indexes, binary):
+        # Rules are grouped by the character their matches start with: the regex
+        # engine scans quickly for a shared prefix, but not for an alternation of
+        # rules starting differently. Literal rules of a group share one trie.
+        groups = {}
+        for i in indexes:
+            literals, regexes = groups.setdefault(_lead(self.rules[i], bool(self.flags & re.IGNORECASE)), (set(), set()))
+            if self.rules[i].regex:
+                regexes.add(self.sources[i])
+            else:
+                literals.add(self.rules[i].pattern)
+        key = tuple(sorted((lead, tuple(sorted(lits)), tuple(sorted(res))) for lead, (lits, res) in groups.items()))
+        return _compile_streams(key, self.flags, binary)
+
+
+def _lead(rule, ignore_case):
+    # First character of every match of rule, or "" where that is not obvious
+    lead = rule.pattern[:1]
+    if rule.regex and not (lead.isalnum() and rule.pattern[1:2] not in ("?", "*", "{") and "|" not in rule.pattern):
+        return ""
+    return lead.lower() if ignore_case else lead
+
+
+@lru_cache(maxsize=256)
+def _compile_streams(groups, flags, binary):
+    # Compiling a long alternation takes milliseconds, so it is cached per rule subset
+    streams = []
+    for _lead_char, literals, regexes in groups:
+        pattern = "|".join(([_trie_regex(literals)] if literals else []) + [f"(?:{s})" for s in regexes])
+        try:
+            streams.append(re.compile(pattern.encode("ascii") if binary else pattern, flags))
+        except re.error:
+            return None
+    return tuple(streams)
+
+
+def _trie_regex(words):
+    """
+    One regex for many literals, shaped as a trie (shared prefixes are tested
+    once), so the regex engine walks an automaton instead of trying every
+    literal in turn. FindConf_Detector/target_match.py has a copy (tool folders
+    do not import from each other): change both together.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = None
+
+    def build(node):
+        subs = [re.escape(ch) + build(node[ch]) for ch in sorted(node) if ch]
+        if not subs:
+            return ""
+        body = subs[0] if len(subs) == 1 else "(?:" + "|".join(subs) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _line_numbers(data, offsets, newline):
+    lines = [0] * len(offsets)
+    line = 1
+    last = 0
+    for offset, i in sorted((o, i) for i, o in enumerate(offsets) if o is not None):
+        line += data.count(newline, last, offset)
+        last = offset
+        lines[i] = line
+    return lines
+
+
+def read_config(path, byte_mode):
+    """
+    (data, encoding) of a config file: the raw bytes when byte_mode and the
+    encoding is ASCII-compatible, else the decoded text.
+    """
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    encoding, bom = detect_encoding(raw[:SNIFF_BYTES], guess_legacy=not byte_mode)
+    if byte_mode and _ascii_compatible(encoding):
+        return (raw[bom:] if bom else raw), encoding
+    return raw[bom:].decode(encoding, errors="ignore"), encoding
+
+
+_worker_rules = None
+
+
+def _init_worker(rules):
+    global _worker_rules
+    _worker_rules = rules
+
+
+def audit_file(path, rules=None):
+    """
+    (path, encoding, results, error) for one file, results being check() of the
+    rule set; fits a process pool after _init_worker().
+    """
+    rules = rules or _worker_rules
+    try:
+        data, encoding = read_config(path, rules.byte_mode)
+    except (OSError, LookupError) as e:
+        return path, "", [], str(e)
+    return path, encoding, rules.check(data), ""
+
+
+def config_files(root, extensions=DEFAULT_EXTENSIONS):
+    """Files under root (recursively) whose extension is in extensions, sorted."""
+    # Same as target_match.config_files() in FindConf_Detector
+    extensions = tuple(e.lower() for e in extensions)
+    found = []
+    for dirpath, _dirs, files in os.walk(root):
+        found.extend(os.path.join(dirpath, name) for name in files if name.lower().endswith(extensions))
+    found.sort()
+    return found
+
+
+def iter_audit(paths, rules, max_workers=None):
+    """Yield audit_file() results for paths, in order; large lists use a process pool."""
+    workers = max_workers or os.cpu_count() or 1
+    if len(paths) < PARALLEL_MIN_FILES or workers == 1:
+        for path in paths:
+            yield audit_file(path, rules)
+        return
+    chunk = max(1, len(paths) // (workers * CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(rules,)) as ex:
+        yield from ex.map(audit_file, paths, chunksize=chunk)
+
+
+def flagged(rule, result):
+    """True where a required pattern is missing or a forbid/find pattern matched."""
+    if rule.scope:
+        return bool(result[1])
+    return bool(result) != (rule.kind == "require")
+
+
+def file_status(rules, results, error):
+    """'ERROR', 'FAIL' (a required rule missing or a forbidden one found) or 'OK'."""
+    if error:
+        return "ERROR"
+    for rule, result in zip(rules.rules, results):
+        if rule.kind != "find" and flagged(rule, result):
+            return "FAIL"
+    return "OK"
+
+
+def _cell(rule, result):
+    if rule.scope:
+        checked, blocks = result
+        if not checked:
+            return "no block" if rule.kind == "require" else ""
+        if not blocks:
+            return f"OK ({checked})" if rule.kind == "require" else ""
+        listed = "; ".join(f"L{line} {header}" for line, header in blocks[:MAX_LISTED_BLOCKS])
+        more = "; ..." if len(blocks) > MAX_LISTED_BLOCKS else ""
+        what = {"require": "MISSING ", "forbid": "FOUND ", "find": ""}[rule.kind]
+        return f"{what}{len(blocks)}/{checked}: {listed}{more}"
+    if rule.kind == "require":
+        return f"L{result}" if result else "MISSING"
+    if rule.kind == "forbid":
+        return f"FOUND L{result}" if result else ""
+    return f"L{result}" if result else ""
+
+
+def collect_file(path, root, dest_dir, link=False):
+    """
+    Put path into dest_dir under its path relative to root, as a hard link if
+    link (falling back to a copy, e.g. across drives) or as a copy.
+    """
+    target = os.path.join(dest_dir, os.path.relpath(path, root))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.lexists(target):
+        os.remove(target)
+    if link:
+        try:
+            os.link(path, target)
+            return target
+        except OSError:
+            pass
+    shutil.copy2(path, target)
+    return target
+
+
+def run_audit(root, rules, report_path=DEFAULT_REPORT, collect_dir=None, link=False,
+              extensions=DEFAULT_EXTENSIONS, max_workers=None, log=print):
+    """
+    Audit every config file under root and write the matrix report as CSV.
+    Failing files and files with a find hit are collected into collect_dir if given.
+    Returns {"files", "ok", "fail", "error", "collected"}.
+    """
+    started = time.perf_counter()
+    paths = config_files(root, extensions)
+    counts = {"files": len(paths), "ok": 0, "fail": 0, "error": 0, "collected": 0}
+    per_rule = [0] * len(rules.rules)
+    with open(report_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["File", "Encoding", "Status"] + [rule_label(r) for r in rules.rules] + ["Error"])
+        for path, encoding, results, error in iter_audit(paths, rules, max_workers):
+            status = file_status(rules, results, error)
+            counts[status.lower()] += 1
+            cells = [_cell(rule, result) for rule, result in zip(rules.rules, results)] or [""] * len(rules.rules)
+            writer.writerow([os.path.relpath(path, root), encoding, status] + cells + [error])
+            hits = [flagged(rule, result) for rule, result in zip(rules.rules, results)]
+            for i, hit in enumerate(hits):
+                per_rule[i] += hit
+            if error:
+                log(f"Error reading {path}: {error}")
+            elif collect_dir and (status == "FAIL" or any(
+                    hit and rule.kind == "find" for rule, hit in zip(rules.rules, hits))):
+                collect_file(path, root, collect_dir, link)
+                counts["collected"] += 1
+
+    log(f"{counts['files']} file(s) audited in {time.perf_counter() - started:.1f}s: "
+        f"{counts['ok']} OK, {counts['fail']} failing, {counts['error']} error(s). Report saved to {report_path}.")
+    for rule, n in zip(rules.rules, per_rule):
+        what = {"require": "missing in", "forbid": "found in", "find": "found in"}[rule.kind]
+        log(f"  {rule_label(rule)}: {what} {n} file(s)")
+    if collect_dir:
+        log(f"{counts['collected']} file(s) {'linked' if link else 'copied'} to {collect_dir}.")
+    return counts
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Check config files against required/forbidden patterns.")
+    parser.add_argument("root", help="Folder with the config files (searched recursively).")
+    parser.add_argument("--rules", help="Rules file ('[scope] require|forbid|find [re]: pattern' per line).")
+    parser.add_argument("--require", action="append", default=[], help="Pattern every file must contain (repeatable).")
+    parser.add_argument("--forbid", action="append", default=[], help="Pattern no file may contain (repeatable).")
+    parser.add_argument("--find", action="append", default=[], help="Pattern to report and collect (repeatable).")
+    parser.add_argument("--regex", action="store_true", help="Treat --require/--forbid/--find patterns as regular expressions.")
+    parser.add_argument("--in", dest="scope", metavar="SCOPE",
+                        help="Check --require/--forbid/--find in every block whose header matches this regex.")
+    parser.add_argument("-i", "--ignore-case", action="store_true")
+    parser.add_argument("--ext", action="append", help="File extension to audit (repeatable, default: .txt).")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help=f"Matrix report (CSV, default: {DEFAULT_REPORT}).")
+    parser.add_argument("--collect", metavar="DIR", help="Collect failing files and find hits into DIR.")
+    parser.add_argument("--link", action="store_true", help="Collect as hard links instead of copies.")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores).")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.rules) if args.rules else []
+        for kind in RULE_KINDS:
+            rules.extend(Rule(kind, pattern, args.regex, args.scope) for pattern in getattr(args, kind))
+        rules = RuleSet(rules, args.ignore_case)
+    except (OSError, ValueError, re.error) as e:
+        print(e, file=sys.stderr)
+        return 2
+    extensions = tuple(e if e.startswith(".") else "." + e for e in args.ext) if args.ext else DEFAULT_EXTENSIONS
+    counts = run_audit(args.root, rules, args.report, args.collect, args.link, extensions, args.workers or None)
+    return 1 if counts["fail"] or counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
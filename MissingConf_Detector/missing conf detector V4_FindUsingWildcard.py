@@ -1,7 +1,5 @@
 import os
-import shutil
-import chardet
-import re
+from conf_audit import Rule, RuleSet, run_audit
 
 # Path to the folder containing the configuration files
 folder_path = 'Input'
@@ -12,25 +10,13 @@ output_folder_path = 'Output'
 # Regular expression pattern to look for in the files
 config_pattern = r'acl\s+.*\sinbound'
 
-# Compile the regular expression pattern
-pattern = re.compile(config_pattern)
+# Hard-link the files with missing configuration into the output folder instead of copying them
+use_hardlinks = False
 
-# Loop through all files and subfolders in the folder
-for root, dirs, files in os.walk(folder_path):
-    # Loop through all files in the current directory
-    for filename in files:
-        # Check if the file has the '.txt' extension
-        if filename.endswith('.txt'):
-            # Construct the full path to the file
-            file_path = os.path.join(root, filename)
-            # Open the file
-            with open(file_path, 'rb') as f:
-                # Read the contents of the file and detect the encoding
-                file_contents = f.read()
-                result = chardet.detect(file_contents)
-                # Decode the file contents using the detected encoding
-                file_contents = file_contents.decode(result['encoding'], errors='ignore')
-                # Check if the regular expression pattern is in the file
-                if not re.search(pattern, file_contents):
-                    # If not, copy the file to the output folder
-                    shutil.copy(file_path, output_folder_path)
+if __name__ == '__main__':
+    # Check every .txt file under the input folder (on all cores), write the audit
+    # report and collect the files without a match into the output folder
+    os.makedirs(output_folder_path, exist_ok=True)
+    run_audit(folder_path, RuleSet([Rule('require', config_pattern, regex=True)]),
+              report_path=os.path.join(output_folder_path, 'audit.csv'),
+              collect_dir=output_folder_path, link=use_hardlinks)
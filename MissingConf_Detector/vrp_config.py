@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+One-pass parser for Huawei VRP-style hierarchical configs, for scoped checks in
+conf_audit.py ("every interface GigabitEthernet... must contain undo shutdown").
+
+A line starts a block; the more-indented lines after it are its body (nested
+to any depth, e.g. bgp > ipv4-family > peer). A "#" line closes every block
+indented at least as far as the "#" itself, so a top-level "#" ends all open
+blocks. Blocks keep only offsets into the config text, so a rule is checked
+against a block body with regex.search(data, block.body, block.end), without
+copying it.
+
+- ConfigTree / parse_config(): the whole block tree, indexed by first word
+- find_blocks(): only the blocks whose header matches a scope, found by regex
+  scans (the scope itself, then the first line indented no deeper to end each
+  body) without building the tree; what conf_audit uses per rule scope
+
+Both work on bytes or str alike (the same type as the config data).
+
+Usage:
+    python vrp_config.py device.cfg [--depth N]
+"""
+import re
+import sys
+import argparse
+from functools import lru_cache
+
+# Non-blank lines: indentation, then the text (or just "#" for a separator line)
+_LINE_S = re.compile(r"^([ \t]*)([^\s#][^\r\n]*|#)", re.MULTILINE)
+_LINE_B = re.compile(_LINE_S.pattern.encode("ascii"), re.MULTILINE)
+
+
+class Block:
+    """
+    One config line and its body. header is the stripped line, line its 1-based
+    number; the body spans data[body:end] (empty for a plain command).
+    """
+
+    __slots__ = ("header", "line", "indent", "start", "body", "end", "parent", "children")
+
+    def __init__(self, header, line, indent, start, body, parent):
+        self.header = header
+        self.line = line
+        self.indent = indent
+        self.start = start
+        self.body = body
+        self.end = body
+        self.parent = parent
+        self.children = []
+
+    def __repr__(self):
+        return f"Block({self.header!r}, line={self.line}, children={len(self.children)})"
+
+    def walk(self):
+        """This block's children and all their descendants, in config order."""
+        for child in self.children:
+            yield child
+            yield from child.walk()
+
+
+class ConfigTree:
+    """Block tree of one config, with the blocks indexed by lower-cased first word."""
+
+    def __init__(self, data):
+        self.data = data
+        self.root, self.index = parse_config(data)
+
+    def blocks(self, scope):
+        """Blocks whose header scope (a compiled regex) matches at its start."""
+        return [b for b in self.root.walk() if scope.match(b.header)]
+
+
+def parse_config(data):
+    """
+    (root, index) for a config given as bytes or str: root is a Block holding
+    the top-level lines, index maps lower-cased first words to their blocks.
+    """
+    binary = isinstance(data, bytes)
+    newline, sharp, empty = (b"\n", b"#", b"") if binary else ("\n", "#", "")
+    root = Block(empty, 0, -1, 0, 0, None)
+    stack = [root]
+    index = {}
+    last_end = 0
+    line = 1
+    counted = 0
+    for m in (_LINE_B if binary else _LINE_S).finditer(data):
+        indent = m.end(1) - m.start(1)
+        top = stack[-1]
+        # A "#" separator closes the blocks at its level; any other line closes
+        # the blocks it is not indented under
+        while top.indent >= indent:
+            stack.pop().end = last_end
+            top = stack[-1]
+        text = m.group(2)
+        last_end = _line_end(data, m.end(), newline)
+        if text == sharp:
+            continue
+        line += data.count(newline, counted, m.start())
+        counted = m.start()
+        block = Block(text.rstrip(), line, indent, m.start(), last_end, top)
+        top.children.append(block)
+        stack.append(block)
+        index.setdefault(text.split(None, 1)[0].lower(), []).append(block)
+    while len(stack) > 1:
+        stack.pop().end = last_end
+    root.end = last_end
+    return root, index
+
+
+def find_blocks(data, scope, flags=0):
+    """
+    Blocks whose header starts with a match of the regex source scope, as
+    [(line, header, body, end)] in config order; same block rules as parse_config().
+    """
+    binary = isinstance(data, bytes)
+    newline, sharp = (b"\n", b"#") if binary else ("\n", "#")
+    regex = _scope_regex(scope, flags, binary)
+    blocks = []
+    line = 1
+    counted = 0
+    pos = 0
+    # The scope is searched unanchored (a literal prefix makes that fast); a hit
+    # counts if the scope matches where its line's text starts
+    while pos < len(data):
+        m = regex.search(data, pos)
+        if not m:
+            break
+        start = data.rfind(newline, 0, m.start()) + 1
+        body = _line_end(data, m.start(), newline)
+        text = data[start:body]
+        stripped = text.lstrip()
+        first = start + len(text) - len(stripped)
+        if stripped and stripped[:1] != sharp and (m.start() == first or (m.start() < first and regex.match(data, first))):
+            indent = first - start
+            nxt = _end_regex(indent, binary).search(data, body)
+            line += data.count(newline, counted, start)
+            counted = start
+            blocks.append((line, text.strip(), body, nxt.start() if nxt else len(data)))
+        pos = body
+    return blocks
+
+
+def _line_end(data, pos, newline):
+    # Offset just after the newline ending the line that pos is on (the text may end in "\r")
+    eol = data.find(newline, pos)
+    return len(data) if eol < 0 else eol + 1
+
+
+@lru_cache(maxsize=256)
+def _scope_regex(scope, flags, binary):
+    scope = crlf_safe(scope)
+    return re.compile(scope.encode("ascii") if binary else scope, flags | re.MULTILINE)
+
+
+def crlf_safe(pattern):
+    """
+    pattern with every "$" anchor (outside [...] and not escaped) also matching
+    before "\r\n", so line-end anchors work on Windows line endings in MULTILINE mode.
+    """
+    if "$" not in pattern:
+        return pattern
+    out = []
+    escaped = in_class = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            # "]" right after "[" or "[^" is a literal
+            in_class = ch != "]" or out[-1] == "[" or out[-2:] == ["[", "^"]
+        elif ch == "[":
+            in_class = True
+        elif ch == "$":
+            ch = r"(?=\r?$)"
+        out.append(ch)
+    return "".join(out)
+
+
+@lru_cache(maxsize=64)
+def _end_regex(indent, binary):
+    # The next line that is not blank and indented no deeper than the header ends its body
+    pattern = rf"^[ \t]{{0,{indent}}}\S"
+    return re.compile(pattern.encode("ascii") if binary else pattern, re.MULTILINE)
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Print the block tree of a VRP-style config.")
+    parser.add_argument("config")
+    parser.add_argument("--depth", type=int, default=2, help="Levels to print (default: 2).")
+    args = parser.parse_args(argv)
+    with open(args.config, encoding="utf-8", errors="replace") as f:
+        tree = ConfigTree(f.read())
+
+    def show(block, level):
+        for child in block.children:
+            print(f"{'  ' * level}{child.header}  [line {child.line}]")
+            if level + 1 < args.depth:
+                show(child, level + 1)
+
+    show(tree.root, 0)
+    print(f"{sum(len(v) for v in tree.index.values())} line(s), {len(tree.root.children)} top-level.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())
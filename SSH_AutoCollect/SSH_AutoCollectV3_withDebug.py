@@ -1,33 +1,25 @@
-import paramiko
 import logging
+from ssh_collect import load_nelist, run_collect
 
 logging.basicConfig(filename='automation.log', level=logging.INFO,
                     format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
 
-# Read the list of network elements from the text file
-with open('NElist.txt', 'r') as f:
-    lines = f.readlines()
+# Commands to run on every network element
+commands = ['dis health']
 
-# Connect to each network element
-for line in lines:
-    hostname, port, username, password = line.strip().split(',')
-    port = int(port)
+# Sessions open at the same time (in total, and to the same hostname)
+max_sessions = 32
+max_sessions_per_host = 1
 
-    try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname, port=port, username=username, password=password, timeout=10)
+# Run the commands on one interactive shell per network element (pager off),
+# for network elements that do not accept exec commands
+use_shell = False
 
-        # Execute the command
-        stdin, stdout, stderr = ssh.exec_command('dis health', timeout=10)
+if __name__ == '__main__':
+    # Read the list of network elements from the text file
+    nes = load_nelist('NElist.txt')
 
-        # Save the logs to a separate file based on the hostname
-        with open(f'{hostname}_logs.txt', 'w') as f:
-            f.write(stdout.read().decode())
-
-    except Exception as e:
-        logging.error(f'Error connecting to {hostname}: {e}')
-
-    finally:
-        # Close the connection
-        ssh.close()
+    # Connect to the network elements in parallel and save the logs of each one to
+    # <hostname>_logs.txt; errors go to automation.log and collect_summary.csv
+    run_collect(nes, commands, workers=max_sessions, per_host=max_sessions_per_host, timeout=10,
+                shell=use_shell)
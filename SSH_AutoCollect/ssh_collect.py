@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Concurrent SSH collection for SSH_AutoCollect.
+
+Every NE in the list gets its own session on a bounded thread pool (the global
+limit), and a per-host limit keeps several NElist entries for the same device
+from opening more sessions at once than it accepts. Each session runs all the
+commands, each on its own exec channel, and the output is streamed into the
+NE's log file as it arrives. A summary CSV records per NE whether it worked,
+the error, the commands completed, the bytes collected and the connect/total
+durations.
+
+With --shell, each NE gets one interactive shell instead (for NEs that only
+allow those): it logs in once, turns the pager off ("screen-length 0
+temporary", with "---- More ----" still answered if that fails), then runs the
+commands one after the other, telling where each output ends by the
+<sysname>/[sysname] prompt. With --cycles, the collection is repeated every
+--interval seconds (each cycle appended to the log files); the shells are kept
+open in a pool between cycles, so a command costs one round trip.
+
+NElist format (as for SSH_AutoCollectV2/V3), one NE per line:
+    hostname,port,username,password
+
+Usage:
+    python ssh_collect.py NElist.txt -c "dis health" [-c "dis cpu-usage"] [--out logs]
+    python ssh_collect.py NElist.txt --commands commands.txt [--workers 64] [--per-host 1]
+    python ssh_collect.py NElist.txt --commands commands.txt --shell [--cycles 12 --interval 300]
+"""
+import os
+import re
+import csv
+import sys
+import time
+import logging
+import argparse
+import threading
+from contextlib import nullcontext
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import paramiko
+
+# Sessions open at the same time, in total and per host name
+DEFAULT_WORKERS = 32
+DEFAULT_PER_HOST = 1
+# Seconds allowed for connecting, and without any output while a command runs
+DEFAULT_TIMEOUT = 10
+READ_CHUNK = 32 * 1024
+DEFAULT_SUMMARY = "collect_summary.csv"
+# Interactive shells: pager switch, and a terminal wide enough that long lines are not wrapped
+PAGER_OFF = "screen-length 0 temporary"
+SHELL_WIDTH = 512
+# Bytes at the end of the shell output checked for a prompt
+PROMPT_TAIL = 512
+
+NE = namedtuple("NE", "hostname port username password")
+# status: "ok" or "failed"; commands: commands completed; durations in seconds
+Result = namedtuple("Result", "ne cycle status error commands bytes connect_s total_s path")
+
+# Any VRP prompt at the end of the output: <sysname>, [sysname], [~sysname-view]...
+_PROMPT = re.compile(rb"(?:^|(?<=\n))\r?[<\[][~*]?([^\s<>\[\]]+?)(?:-[^\r\n<>\[\]]*)?[>\]][ \t]*$")
+# The pager, when it is on; the "---- More ----" line is erased with escape sequences
+_MORE = re.compile(rb"-+ ?More ?-+[ \t]*$")
+_MORE_SUB = re.compile(rb"[ \t]*-+ ?More ?-+(?:\x1b\[\d*[A-Za-z]|[ \t])*")
+# Questions asked at login (e.g. password change) are answered N
+_CONFIRM = re.compile(rb"\[Y/N\]:?[ \t]*$", re.IGNORECASE)
+
+
+def load_nelist(path):
+    """NEs from a 'hostname,port,username,password' file; blank and '#' lines are skipped."""
+    nes = []
+    with open(path, encoding="utf-8-sig") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            # The password is the rest of the line, so it may contain commas
+            parts = [p.strip() for p in line.split(",", 3)]
+            if len(parts) != 4 or not parts[1].isdigit():
+                raise ValueError(f"{path}:{number}: expected 'hostname,port,username,password'")
+            nes.append(NE(parts[0], int(parts[1]), parts[2], parts[3]))
+    return nes
+
+
+def load_commands(path):
+    """Commands from a file, one per line; blank and '#' lines are skipped."""
+    with open(path, encoding="utf-8-sig") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def log_paths(nes, out_dir):
+    """
+    Log file per NE: <hostname>_logs.txt, <hostname>_<port>_logs.txt for repeated
+    host names, plus _2, _3... for repeated host names and ports.
+    """
+    counts = {}
+    for ne in nes:
+        counts[ne.hostname] = counts.get(ne.hostname, 0) + 1
+    paths = []
+    used = set()
+    for ne in nes:
+        stem = f"{ne.hostname}_{ne.port}" if counts[ne.hostname] > 1 else ne.hostname
+        name = stem
+        n = 1
+        while name in used:
+            n += 1
+            name = f"{stem}_{n}"
+        used.add(name)
+        paths.append(os.path.join(out_dir, f"{name}_logs.txt"))
+    return paths
+
+
+class HostLimiter:
+    """Per-host semaphores: at most limit sessions to the same host name at a time."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __call__(self, hostname):
+        with self._lock:
+            return self._semaphores.setdefault(hostname, threading.BoundedSemaphore(self.limit))
+
+
+def connect(ne, timeout=DEFAULT_TIMEOUT):
+    """A connected paramiko.SSHClient for ne (password login, unknown host keys accepted)."""
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect(ne.hostname, port=ne.port, username=ne.username, password=ne.password,
+                       timeout=timeout, banner_timeout=timeout, auth_timeout=timeout,
+                       look_for_keys=False, allow_agent=False)
+    except BaseException:
+        client.close()
+        raise
+    return client
+
+
+def run_exec(client, command, out, timeout=DEFAULT_TIMEOUT):
+    """
+    Run command on a new exec channel of client, writing its output (stdout and
+    stderr) to the binary file out as it arrives. Returns the bytes written.
+    """
+    channel = client.get_transport().open_session(timeout=timeout)
+    try:
+        channel.settimeout(timeout)
+        channel.set_combine_stderr(True)
+        channel.exec_command(command)
+        written = 0
+        while True:
+            data = channel.recv(READ_CHUNK)
+            if not data:
+                return written
+            out.write(data)
+            written += len(data)
+    finally:
+        channel.close()
+
+
+class ShellSession:
+    """
+    One interactive shell on an NE, logged in and with the pager off; run()
+    sends a command and returns its output once the prompt is back.
+    """
+
+    def __init__(self, ne, timeout=DEFAULT_TIMEOUT):
+        self.ne = ne
+        self.client = connect(ne, timeout)
+        try:
+            self.channel = self.client.invoke_shell(width=SHELL_WIDTH)
+            self.channel.settimeout(timeout)
+            # The first prompt gives the sysname, so output lines cannot pass for prompts later
+            self.prompt = _PROMPT
+            self.sysname = _PROMPT.search(self._read_until_prompt()[1]).group(1)
+            self.prompt = re.compile(rb"(?:^|(?<=\n))\r?[<\[][~*]?" + re.escape(self.sysname)
+                                     + rb"(?:-[^\r\n<>\[\]]*)?[>\]][ \t]*$")
+            self.run(PAGER_OFF)
+        except BaseException:
+            self.client.close()
+            raise
+
+    def alive(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active() and not self.channel.closed
+
+    def run(self, command):
+        """The output of command, without the echoed command line and the prompt."""
+        self.channel.sendall(command.encode("utf-8") + b"\n")
+        output, _prompt = self._read_until_prompt()
+        # The first line is the command echoed back
+        eol = output.find(b"\n")
+        return output[eol + 1:] if eol >= 0 else b""
+
+    def _read_until_prompt(self):
+        # (output, prompt line) once the output ends with a prompt; answers the pager on the way
+        buf = bytearray()
+        while True:
+            data = self.channel.recv(READ_CHUNK)
+            if not data:
+                raise EOFError("Shell closed by the NE")
+            buf += data
+            tail = bytes(buf[-PROMPT_TAIL:])
+            if _MORE.search(tail):
+                self.channel.sendall(b" ")
+                continue
+            if _CONFIRM.search(tail):
+                self.channel.sendall(b"N\n")
+                continue
+            m = self.prompt.search(tail)
+            if m:
+                cut = len(buf) - len(tail) + m.start()
+                return _MORE_SUB.sub(b"", bytes(buf[:cut])), tail[m.start():].strip()
+
+    def close(self):
+        self.client.close()
+
+
+class SessionPool:
+    """
+    Shell sessions kept open between collection cycles, one per NElist entry
+    (key). get() hands out the open session, or a new one if there is none or
+    it has dropped; release() takes it back. Only the keys in keep (all if
+    None) are kept open, the others are closed on release.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, keep=None):
+        self.timeout = timeout
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def get(self, key, ne):
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is not None and not session.alive():
+            session.close()
+            session = None
+        return session or ShellSession(ne, self.timeout)
+
+    def release(self, key, session):
+        if self.keep is not None and key not in self.keep:
+            session.close()
+            return
+        with self._lock:
+            self._sessions[key] = session
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+def collect_ne(ne, commands, path, timeout=DEFAULT_TIMEOUT, limiter=None, pool=None, key=None, cycle=None):
+    """
+    Connect to ne, run commands and stream their output to path; returns a
+    Result. With a SessionPool, the commands run on ne's pooled shell (key
+    names it in the pool). With a cycle number, the output gets a cycle header
+    and cycles after the first are appended to path.
+    """
+    connect_s = 0.0
+    done = 0
+    written = 0
+    with limiter(ne.hostname) if limiter else nullcontext():
+        started = time.perf_counter()
+        client = session = None
+        try:
+            if pool is not None:
+                session = pool.get(key, ne)
+            else:
+                client = connect(ne, timeout)
+            connect_s = time.perf_counter() - started
+            with open(path, "ab" if cycle and cycle > 1 else "wb") as out:
+                if cycle:
+                    out.write(f"##### Cycle {cycle} at {time.strftime('%Y-%m-%d %H:%M:%S')} #####\n".encode("utf-8"))
+                for command in commands:
+                    if len(commands) > 1:
+                        out.write(f"===== {command} =====\n".encode("utf-8"))
+                    if pool is not None:
+                        output = session.run(command)
+                        out.write(output)
+                        written += len(output)
+                    else:
+                        written += run_exec(client, command, out, timeout)
+                    out.flush()
+                    done += 1
+            if session is not None:
+                pool.release(key, session)
+                session = None
+        except Exception as e:
+            logging.error(f"Error collecting from {ne.hostname}:{ne.port}: {e or type(e).__name__}")
+            return Result(ne, cycle or 1, "failed", str(e) or type(e).__name__, done, written, connect_s,
+                          time.perf_counter() - started, path)
+        finally:
+            # A shell left by an error is in an unknown state, so it is not reused
+            if session is not None:
+                session.close()
+            if client is not None:
+                client.close()
+    logging.info(f"Collected {done} command(s), {written} bytes from {ne.hostname}:{ne.port}")
+    return Result(ne, cycle or 1, "ok", "", done, written, connect_s, time.perf_counter() - started, path)
+
+
+def write_summary(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Cycle", "Hostname", "Port", "Status", "Commands", "Bytes", "Connect (s)", "Total (s)", "Log", "Error"])
+        for r in results:
+            writer.writerow([r.cycle, r.ne.hostname, r.ne.port, r.status, r.commands, r.bytes,
+                             f"{r.connect_s:.2f}", f"{r.total_s:.2f}", r.path, r.error])
+
+
+def run_collect(nes, commands, out_dir=".", workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST,
+                timeout=DEFAULT_TIMEOUT, summary_path=DEFAULT_SUMMARY, log=print,
+                shell=False, cycles=1, interval=0):
+    """
+    Collect commands from every NE concurrently, cycles times, starting a cycle
+    every interval seconds. With shell, the commands run on interactive shells
+    that stay open between cycles. Results come back per cycle in NElist order
+    and are written to summary_path (if given).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    limiter = HostLimiter(per_host)
+    paths = log_paths(nes, out_dir)
+    pool = None
+    if shell:
+        # Idle shells count against the per-host limit, so they are kept open
+        # only for hosts with no more NElist entries than the limit
+        counts = {}
+        for ne in nes:
+            counts[ne.hostname] = counts.get(ne.hostname, 0) + 1
+        pool = SessionPool(timeout, {i for i, ne in enumerate(nes) if counts[ne.hostname] <= per_host})
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(nes) or 1))) as ex:
+            for cycle in range(1, cycles + 1):
+                if cycle > 1:
+                    time.sleep(max(0.0, started + (cycle - 1) * interval - time.perf_counter()))
+                cycle_results = [None] * len(nes)
+                futures = {ex.submit(collect_ne, ne, commands, path, timeout, limiter, pool, i,
+                                     cycle if cycles > 1 else None): i
+                           for i, (ne, path) in enumerate(zip(nes, paths))}
+                label = f"cycle {cycle}/{cycles} " if cycles > 1 else ""
+                for done, future in enumerate(as_completed(futures), 1):
+                    r = cycle_results[futures[future]] = future.result()
+                    detail = f"{r.total_s:.1f}s" if r.status == "ok" else r.error
+                    log(f"[{label}{done}/{len(nes)}] {r.ne.hostname}:{r.ne.port} {r.status} ({detail})")
+                results.extend(cycle_results)
+    finally:
+        if pool is not None:
+            pool.close()
+    if summary_path:
+        write_summary(summary_path, results)
+    failed = sum(r.status != "ok" for r in results)
+    runs = f"{len(results)} collection(s) ({len(nes)} NE(s) x {cycles} cycles)" if cycles > 1 else f"{len(nes)} NE(s)"
+    log(f"{len(results) - failed} of {runs} collected, {failed} failed, in {time.perf_counter() - started:.1f}s."
+        + (f" Summary saved to {summary_path}." if summary_path else ""))
+    return results
+
+
+def run_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Run commands on many NEs over SSH, concurrently.")
+    parser.add_argument("nelist", help="NE list (hostname,port,username,password per line).")
+    parser.add_argument("-c", "--command", action="append", default=[], help="Command to run (repeatable).")
+    parser.add_argument("--commands", help="File with one command per line.")
+    parser.add_argument("--out", default=".", help="Folder for the <hostname>_logs.txt files (default: current).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Sessions open at once (default: {DEFAULT_WORKERS}).")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST,
+                        help=f"Sessions open at once to the same host name (default: {DEFAULT_PER_HOST}).")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Connect timeout and longest silence of a command, in seconds (default: {DEFAULT_TIMEOUT}).")
+    parser.add_argument("--summary", default=DEFAULT_SUMMARY, help=f"Summary CSV (default: {DEFAULT_SUMMARY}).")
+    parser.add_argument("--shell", action="store_true",
+                        help="Run the commands on one interactive shell per NE (pager off, prompt detection).")
+    parser.add_argument("--cycles", type=int, default=1, help="Times to collect (default: 1).")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Seconds from the start of one cycle to the next (default: 0).")
+    args = parser.parse_args(argv)
+
+    try:
+        nes = load_nelist(args.nelist)
+        commands = args.command + (load_commands(args.commands) if args.commands else [])
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not commands:
+        print("No commands given (use -c or --commands).", file=sys.stderr)
+        return 2
+    logging.basicConfig(filename="automation.log", level=logging.INFO,
+                        format="%(asctime)s %(message)s", datefmt="%m/%d/%Y %I:%M:%S %p")
+    if args.cycles < 1:
+        print("--cycles must be at least 1.", file=sys.stderr)
+        return 2
+    results = run_collect(nes, commands, args.out, args.workers, args.per_host, args.timeout, args.summary,
+                          shell=args.shell, cycles=args.cycles, interval=args.interval)
+    return 1 if any(r.status != "ok" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_cli())